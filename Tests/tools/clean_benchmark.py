@@ -0,0 +1,113 @@
+"""
+Benchmark script to compare the previous medium_clean regex chain against the
+line-anchored text_cleanup stage on synthetic 1-20 MB emails
+
+The previous chain needs email_reply_parser (no longer a requirement) for its
+parse_reply step, which grows roughly cubically with input size; time it on
+small inputs, e.g. --sizes 0.025 0.05 0.1 0.2
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.text_cleanup import clean_document
+
+try:
+    from email_reply_parser import EmailReplyParser
+except ImportError:
+    EmailReplyParser = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# The medium_clean regex chain as it was in normalize.py
+FORWARD_RE = re.compile(r'(^|\n)__+ Forwarded message __+[\s\S]+', re.IGNORECASE)
+CID_RE = re.compile(r'\[cid:[^\]]+\]')
+SIGNATURE_RE = re.compile(r'(^|\n)--+\s*\n[\s\S]+$', re.MULTILINE)
+BOILERPLATE_RE = re.compile(
+    r'(©\s*\d{4}|This message was produced and distributed by|CAUTION: This email originated)[\s\S]+$',
+    re.IGNORECASE
+)
+
+DEFAULT_SIZES_MB = [1, 5, 10, 20]
+WORDS = ["vault", "terraform", "release", "security", "patch", "webinar", "cluster", "policy",
+         "on", "the", "from", "with", "update", "cloud", "storage", "agent", "version"]
+
+
+def previous_chain(subject, body, attachments_text):
+    """Old path: every stage runs over subject + body + attachments"""
+    text = subject + '\n' + body + '\n' + '\n'.join(attachments_text)
+    text = FORWARD_RE.sub('', text)
+    if EmailReplyParser is not None:
+        text = EmailReplyParser.parse_reply(text) or ''
+    text = CID_RE.sub('', text)
+    text = SIGNATURE_RE.sub('', text)
+    text = BOILERPLATE_RE.sub('', text)
+    return re.sub(r'\n{2,}', '\n\n', text).strip()
+
+
+def synthetic_email(size_bytes, seed=0):
+    """
+    A body of prose lines that often start with "On " (but never say "wrote:"),
+    whitespace-padded "©" marks without a year and dash-prefixed lines, plus a
+    large attachment text; roughly a third of the size is body
+    """
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size_bytes:
+        words = rng.choices(WORDS, k=rng.randint(4, 16))
+        kind = rng.random()
+        if kind < 0.2:
+            line = "On " + " ".join(words)
+        elif kind < 0.25:
+            line = "©" + " " * rng.randint(1, 40) + " ".join(words)
+        elif kind < 0.3:
+            line = "--" + " ".join(words)
+        elif kind < 0.32:
+            line = "> " + " ".join(words)
+        else:
+            line = " ".join(words) + " [cid:image001.png@01D7F1A2]" * (kind > 0.95)
+        lines.append(line)
+        total += len(line) + 1
+    split = len(lines) // 3
+    return "Synthetic load test", "\n".join(lines[:split]), ["\n".join(lines[split:])]
+
+
+def time_call(fn, *args):
+    start_time = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start_time, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email text cleanup on synthetic large inputs")
+    parser.add_argument("--sizes", type=float, nargs="+", default=DEFAULT_SIZES_MB, help="Input sizes in MB (fractions allowed)")
+    parser.add_argument("--max-chars", type=int, default=0, help="text_cleanup input guard (0 = off)")
+    args = parser.parse_args()
+
+    if EmailReplyParser is None:
+        logging.warning("email_reply_parser is not installed; previous chain is timed without parse_reply")
+
+    rows = []
+    for size_mb in args.sizes:
+        subject, body, attachments_text = synthetic_email(int(size_mb * 1024 * 1024), seed=int(size_mb * 1000))
+        previous_time, _ = time_call(previous_chain, subject, body, attachments_text)
+        new_time, cleaned = time_call(clean_document, subject, body, attachments_text, args.max_chars)
+        rows.append((size_mb, previous_time, new_time, len(cleaned)))
+        logging.info(f"{size_mb} MB: previous {previous_time:.3f}s, line scan {new_time:.3f}s")
+
+    print("\n===== BENCHMARK RESULTS =====")
+    print(f"{'Size':>6} {'Previous':>10} {'Line scan':>10} {'Speedup':>8} {'Output chars':>13}")
+    for size_mb, previous_time, new_time, output_chars in rows:
+        print(f"{size_mb:>5g}MB {previous_time:>9.3f}s {new_time:>9.3f}s {previous_time / new_time:>7.1f}x {output_chars:>13}")
+    print("=============================")
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 
 # Import required modules
 from src import llm_utils
+from src.archive import get_archive, read_clean_text
 from graph_db_consolidated import connect_to_graph, run_graph_query
 
 def export_chroma_data(output_dir="exports"):
@@ -157,6 +158,33 @@ def export_neo4j_data(output_dir="exports"):
         logging.error(f"Error exporting Neo4j data: {e}")
         return None, None
 
+def export_email_texts(output_dir="exports"):
+    """Export cleaned email texts (from the segment archive or data/clean_text) to CSV"""
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        config = llm_utils.load_config()
+
+        archive = get_archive(config, "clean_text")
+        email_ids = set(archive.ids()) if archive is not None else set()
+        clean_dir = os.path.join("data", "clean_text")
+        if os.path.isdir(clean_dir):
+            email_ids.update(f[:-len(".txt")] for f in os.listdir(clean_dir) if f.endswith(".txt"))
+
+        texts_path = os.path.join(output_dir, f"email_texts_{timestamp}.csv")
+        with open(texts_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["email_id", "clean_text"])
+            for email_id in sorted(email_ids):
+                writer.writerow([email_id, read_clean_text(email_id, config)])
+
+        logging.info(f"Exported {len(email_ids)} email texts to {texts_path}")
+        return texts_path
+
+    except Exception as e:
+        logging.error(f"Error exporting email texts: {e}")
+        return None
+
 def export_summary():
     """Export summary statistics"""
     try:
@@ -259,6 +287,9 @@ if __name__ == "__main__":
     # Export Neo4j data
     neo4j_nodes_path, neo4j_rels_path = export_neo4j_data()
     
+    # Export cleaned email texts
+    email_texts_path = export_email_texts()
+    
     # Export summary
     summary_path = export_summary()
     
@@ -272,5 +303,7 @@ if __name__ == "__main__":
         logging.info(f"- Neo4j nodes: {neo4j_nodes_path}")
     if neo4j_rels_path:
         logging.info(f"- Neo4j relationships: {neo4j_rels_path}")
+    if email_texts_path:
+        logging.info(f"- Email texts: {email_texts_path}")
     if summary_path:
         logging.info(f"- Summary: {summary_path}")
\ No newline at end of file
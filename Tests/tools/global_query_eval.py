@@ -6,15 +6,12 @@ import os
 import csv
 import logging
 from src import llm_utils
+from src.archive import read_clean_text
 
 
-def get_full_email_text(email_id: str) -> str:
-    """Fetch the full cleaned email text from disk if available."""
-    path = f"data/clean_text/{email_id}.txt"
-    if os.path.exists(path):
-        with open(path, encoding="utf-8") as f:
-            return f.read()
-    return ""
+def get_full_email_text(email_id: str, config=None) -> str:
+    """Fetch the full cleaned email text from the archive or disk if available."""
+    return read_clean_text(email_id, config)
 
 def run_global_eval():
     config = llm_utils.load_config()
@@ -43,7 +40,7 @@ def run_global_eval():
                     score = results["distances"][0][i] if show_conf else ""
                     email_id = meta.get("email_id", "")
                     chunk_index = meta.get("chunk_index", "")
-                    full_email = get_full_email_text(email_id)
+                    full_email = get_full_email_text(email_id, config)
 
                     writer.writerow([
                         query,
@@ -0,0 +1,138 @@
+"""
+Benchmark script to compare the regex-chain HTML stripping previously used by
+normalize.clean_email/medium_clean against html_to_text.
+
+Both sides get the same plain-text and HTML parts and produce the same kind of
+text: the chain is followed by the entity decoding and whitespace cleanup that
+html_to_text does itself (the chain alone, which left entities other than
+&nbsp; and all indentation in the text, is timed as well for reference), and
+plain-text parts lose their <url> link targets on both sides.
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+import html as html_lib
+from email import policy
+from email.parser import BytesParser
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.html_to_text import html_to_text, BLANK_LINES_RE
+from src.normalize import LINK_TARGET_RE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# The regex chain as it was in normalize.py
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+HTML_COMMENT_RE = re.compile(r'<!--([\s\S]*?)-->', re.MULTILINE)
+STYLE_TAG_RE = re.compile(r'<style[\s\S]+?</style>', re.IGNORECASE)
+
+DEFAULT_CORPUS = os.path.join("misc", "tst_emls")
+
+
+def regex_chain(plain_parts, html_parts):
+    """Per-part style/comment/tag passes, then the same passes again in medium_clean"""
+    body_text = ''.join(text.strip() + '\n' for text in plain_parts)
+    for html in html_parts:
+        html = STYLE_TAG_RE.sub('', html)
+        html = HTML_COMMENT_RE.sub('', html)
+        body_text += HTML_TAG_RE.sub('', html).strip() + '\n'
+    body_text = STYLE_TAG_RE.sub('', body_text)
+    body_text = HTML_COMMENT_RE.sub('', body_text)
+    body_text = body_text.replace('&nbsp;', ' ')
+    return HTML_TAG_RE.sub('', body_text)
+
+
+def regex_chain_equivalent(plain_parts, html_parts):
+    """The regex chain plus the entity decoding and whitespace cleanup html_to_text includes"""
+    text = html_lib.unescape(regex_chain(plain_parts, html_parts))
+    text = '\n'.join(' '.join(line.split()) for line in text.split('\n'))
+    return BLANK_LINES_RE.sub('\n\n', text).strip()
+
+
+def single_pass(plain_parts, html_parts):
+    """What normalize.extract_parts does: link targets cut from plain parts, one html_to_text per HTML part"""
+    body_text = ''.join(LINK_TARGET_RE.sub('', text).strip() + '\n' for text in plain_parts)
+    for html in html_parts:
+        body_text += html_to_text(html) + '\n'
+    return body_text
+
+
+def load_body_parts(corpus):
+    """Decoded (text/plain, text/html) bodies of every .eml with HTML under the corpus directory"""
+    messages = []
+    for dirpath, _, filenames in os.walk(corpus):
+        for filename in sorted(filenames):
+            if not filename.endswith(".eml"):
+                continue
+            with open(os.path.join(dirpath, filename), "rb") as f:
+                msg = BytesParser(policy=policy.default).parse(f)
+            plain_parts, html_parts = [], []
+            for part in msg.walk():
+                content_type = part.get_content_type()
+                if content_type not in ('text/plain', 'text/html') or part.get_content_disposition() == 'attachment':
+                    continue
+                try:
+                    content = part.get_content()
+                except Exception as e:
+                    logging.warning(f"Skipping undecodable {content_type} part in {filename}: {e}")
+                    continue
+                (html_parts if content_type == 'text/html' else plain_parts).append(content)
+            if html_parts:
+                messages.append((plain_parts, html_parts))
+    return messages
+
+
+def run_benchmark(messages, implementation, iterations):
+    """Best-of-N wall time for converting the whole corpus once"""
+    best = None
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        for plain_parts, html_parts in messages:
+            implementation(plain_parts, html_parts)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML-to-text implementations")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Directory of .eml files")
+    parser.add_argument("--iterations", type=int, default=20, help="Number of timed runs (best is reported)")
+    args = parser.parse_args()
+
+    messages = load_body_parts(args.corpus)
+    if not messages:
+        print(f"No HTML parts found under {args.corpus}")
+        sys.exit(1)
+    html_bytes = sum(len(html) for _, html_parts in messages for html in html_parts)
+    logging.info(f"Loaded {len(messages)} HTML emails ({html_bytes / 1024:.0f} KiB) from {args.corpus}")
+
+    implementations = [
+        ("Regex chain (as before, entities and indentation left in)", regex_chain),
+        ("Regex chain + entity decoding and whitespace cleanup", regex_chain_equivalent),
+        ("html_to_text", single_pass),
+    ]
+    results = []
+    for name, implementation in implementations:
+        elapsed = run_benchmark(messages, implementation, args.iterations)
+        chars = sum(len(implementation(*parts)) for parts in messages)
+        results.append((name, elapsed, chars))
+
+    print("\n===== BENCHMARK RESULTS =====")
+    print(f"Emails: {len(messages)}  HTML: {html_bytes / 1024:.0f} KiB  Iterations: {args.iterations}")
+    for name, elapsed, chars in results:
+        print(f"\n{name}:")
+        print(f"  Best time: {elapsed * 1000:.2f}ms  ({html_bytes / elapsed / 1e6:.1f} MB/s)")
+        print(f"  Output chars: {chars}")
+    single_time = results[-1][1]
+    print(f"\nSpeedup vs. equivalent chain: {results[1][1] / single_time:.2f}x")
+    print(f"Speedup vs. chain as before: {results[0][1] / single_time:.2f}x")
+    print("=============================")
+
+if __name__ == "__main__":
+    main()
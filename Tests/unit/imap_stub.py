@@ -0,0 +1,271 @@
+"""
+Tiny in-process IMAP server used by the harvester unit tests.
+
+Speaks just enough IMAP4rev1 over plain TCP for imaplib.IMAP4 to talk to it.
+"""
+
+import os
+import re
+import select
+import socketserver
+import threading
+
+
+class StubMailbox:
+    """Shared mailbox state for the stub server"""
+
+    def __init__(self, uidvalidity=1):
+        self.lock = threading.Lock()
+        self.uidvalidity = uidvalidity
+        self.uidnext = 1
+        self.messages = []  # list of dicts: uid, data, flags
+        self.logins = 0
+        self.body_fetches = 0
+        self.commands = []
+
+    def append(self, data, seen=False):
+        with self.lock:
+            uid = self.uidnext
+            self.uidnext += 1
+            self.messages.append({"uid": uid, "data": data, "flags": {"\\Seen"} if seen else set()})
+            return uid
+
+    def seen_uids(self):
+        with self.lock:
+            return [m["uid"] for m in self.messages if "\\Seen" in m["flags"]]
+
+
+def _parse_uid_set(uid_set, max_uid):
+    """Expand an IMAP sequence set such as '1,3:5,7:*' into a set of UIDs"""
+    uids = set()
+    for part in uid_set.split(","):
+        if ":" in part:
+            start, end = part.split(":")
+            start = max_uid if start == "*" else int(start)
+            end = max_uid if end == "*" else int(end)
+            if start > end:
+                start, end = end, start
+            uids.update(range(start, end + 1))
+        else:
+            uids.add(max_uid if part == "*" else int(part))
+    return uids
+
+
+def _header_fields(data, names):
+    """Return the requested header lines of a raw message plus the blank terminator"""
+    header_block = data.split(b"\r\n\r\n", 1)[0]
+    wanted = {n.upper().encode() for n in names}
+    lines = [l for l in header_block.split(b"\r\n") if l.split(b":", 1)[0].strip().upper() in wanted]
+    return b"\r\n".join(lines) + b"\r\n\r\n"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def send(self, line):
+        if isinstance(line, str):
+            line = line.encode()
+        self.wfile.write(line + b"\r\n")
+        self.wfile.flush()
+
+    def report_exists(self):
+        """Send "* n EXISTS" if messages arrived since this connection was last told the count"""
+        with self.server.mailbox.lock:
+            count = len(self.server.mailbox.messages)
+        if count != self.reported:
+            self.reported = count
+            self.send(f"* {count} EXISTS")
+
+    def handle(self):
+        mailbox = self.server.mailbox
+        # Message count last reported to this client; like a real server, new mail is
+        # announced once, in the response to whatever command runs next
+        self.reported = None
+        self.send(f"* OK [CAPABILITY {self.server.capabilities}] stub ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            line = line.rstrip(b"\r\n").decode()
+            if self.server.drop_next:
+                self.server.drop_next = False
+                return
+            tag, _, rest = line.partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            mailbox.commands.append(rest)
+
+            if command == "CAPABILITY":
+                self.send(f"* CAPABILITY {self.server.capabilities}")
+                self.send(f"{tag} OK CAPABILITY completed")
+            elif command == "LOGIN":
+                mailbox.logins += 1
+                self.send(f"{tag} OK LOGIN completed")
+            elif command in ("SELECT", "EXAMINE"):
+                with mailbox.lock:
+                    self.reported = len(mailbox.messages)
+                    self.send(f"* {self.reported} EXISTS")
+                    self.send(f"* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs valid")
+                    self.send(f"* OK [UIDNEXT {mailbox.uidnext}] Predicted next UID")
+                self.send(f"{tag} OK [READ-WRITE] SELECT completed")
+            elif command == "NOOP":
+                with mailbox.lock:
+                    self.reported = len(mailbox.messages)
+                    self.send(f"* {self.reported} EXISTS")
+                self.send(f"{tag} OK NOOP completed")
+            elif command == "IDLE" and "IDLE" in self.server.capabilities:
+                self.handle_idle(tag)
+            elif command == "UID":
+                self.handle_uid(tag, args)
+                self.report_exists()
+                self.send(self.completion)
+            elif command == "LOGOUT":
+                self.send("* BYE logging out")
+                self.send(f"{tag} OK LOGOUT completed")
+                return
+            else:
+                self.send(f"{tag} BAD unknown command {command}")
+
+    def handle_idle(self, tag):
+        mailbox = self.server.mailbox
+        with mailbox.lock:
+            known = len(mailbox.messages) if self.reported is None else self.reported
+        if self.server.exists_with_continuation:
+            self.wfile.write(f"+ idling\r\n* {known} EXISTS\r\n".encode())
+            self.wfile.flush()
+        else:
+            self.send("+ idling")
+        while True:
+            readable, _, _ = select.select([self.connection], [], [], 0.02)
+            if readable:
+                line = self.rfile.readline()
+                if not line or line.strip().upper() == b"DONE":
+                    break
+            with mailbox.lock:
+                count = len(mailbox.messages)
+            if count > known:
+                known = self.reported = count
+                self.send(f"* {count} EXISTS")
+        self.send(f"{tag} OK IDLE terminated")
+
+    def handle_uid(self, tag, args):
+        mailbox = self.server.mailbox
+        sub, _, rest = args.partition(" ")
+        sub = sub.upper()
+        with mailbox.lock:
+            max_uid = mailbox.messages[-1]["uid"] if mailbox.messages else 0
+
+            if sub == "SEARCH":
+                criteria = rest.upper()
+                matches = []
+                for msg in mailbox.messages:
+                    if "UNSEEN" in criteria and "\\Seen" in msg["flags"]:
+                        continue
+                    uid_match = re.search(r"UID (\S+)", criteria)
+                    if uid_match and msg["uid"] not in _parse_uid_set(uid_match.group(1), max_uid):
+                        continue
+                    matches.append(str(msg["uid"]))
+                self.send("* SEARCH " + " ".join(matches) if matches else "* SEARCH")
+                self.completion = f"{tag} OK SEARCH completed"
+
+            elif sub == "FETCH":
+                uid_set, _, items = rest.partition(" ")
+                items = items.upper()
+                wanted = _parse_uid_set(uid_set, max_uid)
+                for seq, msg in enumerate(mailbox.messages, 1):
+                    if msg["uid"] not in wanted:
+                        continue
+                    data = msg["data"]
+                    if "RFC822.SIZE" in items:
+                        prefix = f"* {seq} FETCH (UID {msg['uid']} RFC822.SIZE {len(data)}"
+                        fields = re.search(r"HEADER\.FIELDS \(([^)]*)\)", items)
+                        if fields:
+                            headers = _header_fields(data, fields.group(1).split())
+                            self.wfile.write(
+                                f"{prefix} BODY[HEADER.FIELDS ({fields.group(1)})] {{{len(headers)}}}\r\n".encode()
+                                + headers + b")\r\n"
+                            )
+                            self.wfile.flush()
+                        else:
+                            self.send(prefix + ")")
+                        continue
+                    mailbox.body_fetches += 1
+                    self.wfile.write(
+                        f"* {seq} FETCH (UID {msg['uid']} BODY[] {{{len(data)}}}\r\n".encode()
+                        + data + b")\r\n"
+                    )
+                    if "PEEK" not in items:
+                        msg["flags"].add("\\Seen")
+                self.wfile.flush()
+                self.completion = f"{tag} OK FETCH completed"
+
+            elif sub == "STORE":
+                uid_set, _, rest = rest.partition(" ")
+                wanted = _parse_uid_set(uid_set, max_uid)
+                for seq, msg in enumerate(mailbox.messages, 1):
+                    if msg["uid"] in wanted:
+                        if "\\SEEN" in rest.upper():
+                            msg["flags"].add("\\Seen")
+                        self.send(f"* {seq} FETCH (UID {msg['uid']} FLAGS ({' '.join(msg['flags'])}))")
+                self.completion = f"{tag} OK STORE completed"
+
+            else:
+                self.completion = f"{tag} BAD unknown UID command {sub}"
+
+
+class StubIMAPServer(socketserver.ThreadingTCPServer):
+    """Threaded stub IMAP server bound to an ephemeral localhost port"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox=None, capabilities="IMAP4rev1 IDLE"):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.mailbox = mailbox or StubMailbox()
+        self.capabilities = capabilities
+        self.drop_next = False
+        # Send "* n EXISTS" in the same write as the IDLE continuation
+        self.exists_with_continuation = False
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def make_config(server, state_dir, **email_overrides):
+    """Build a minimal pipeline config pointing at the stub server, with sync state under state_dir"""
+    email_config = {
+        "imap_server": "127.0.0.1",
+        "imap_port": server.port,
+        "use_ssl": False,
+        "email_address": "bot@example.com",
+        "email_password": "secret",
+        "folder": "INBOX",
+        "mark_as_read": True,
+        "sync_state_file": os.path.join(state_dir, "imap_sync_state.json"),
+        "seen_index_file": os.path.join(state_dir, "seen_message_ids.txt"),
+    }
+    email_config.update(email_overrides)
+    return {"email": email_config}
+
+
+def make_message(subject, message_id=None, body="Hello"):
+    """Build raw RFC822 bytes for a simple test email"""
+    message_id = message_id or f"<{abs(hash(subject))}@example.com>"
+    return (
+        f"From: Vendor <news@vendor.com>\r\n"
+        f"To: bot@example.com\r\n"
+        f"Subject: {subject}\r\n"
+        f"Message-ID: {message_id}\r\n"
+        f"Date: Mon, 01 Jan 2024 12:00:00 +0000\r\n"
+        f"\r\n"
+        f"{body}\r\n"
+    ).encode()
@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import shutil
+import tempfile
+import unittest
+from src.archive import SegmentArchive, pack_directory
+from src.raw_store import get_raw_store, read_raw_email
+
+class TestSegmentArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_random_access_after_reload(self):
+        """Records are readable by id from a freshly loaded index"""
+        archive = SegmentArchive(self.root)
+        for i in range(20):
+            archive.put(f"email-{i}", f"body {i} ".encode() * 50)
+
+        reloaded = SegmentArchive(self.root)
+        self.assertEqual(len(reloaded), 20)
+        self.assertEqual(reloaded.get("email-7"), b"body 7 " * 50)
+        self.assertIsNone(reloaded.get("missing"))
+
+    def test_segments_roll_over_and_compress(self):
+        """Segments are capped in size and store compressed bytes"""
+        archive = SegmentArchive(self.root, segment_max_bytes=200)
+        for i in range(10):
+            archive.put(f"email-{i}", b"newsletter footer " * 100)
+
+        segments = [f for f in os.listdir(self.root) if f.startswith("segment-")]
+        self.assertGreater(len(segments), 1)
+        stats = archive.stats()
+        self.assertLess(stats["stored_bytes"], stats["bytes"])
+
+    def test_put_is_append_only(self):
+        """Existing ids are kept unless a replacement is requested"""
+        archive = SegmentArchive(self.root)
+        self.assertTrue(archive.put("a", b"v1"))
+        self.assertFalse(archive.put("a", b"v2"))
+        self.assertEqual(archive.get("a"), b"v1")
+
+        archive.put("a", b"v2", replace=True)
+        self.assertEqual(SegmentArchive(self.root).get("a"), b"v2")
+
+    def test_unchanged_replacement_is_not_appended(self):
+        """Replacing a record with identical bytes writes nothing, so reprocessing does not grow the archive"""
+        archive = SegmentArchive(self.root)
+        archive.put("a", b"clean text " * 20)
+        segment = os.path.join(self.root, "segment-000000.z")
+        size = os.path.getsize(segment)
+
+        self.assertFalse(archive.put("a", b"clean text " * 20, replace=True))
+        self.assertFalse(SegmentArchive(self.root).put("a", b"clean text " * 20, replace=True))
+        self.assertEqual(os.path.getsize(segment), size)
+        self.assertTrue(archive.put("a", b"new clean text", replace=True))
+        self.assertEqual(SegmentArchive(self.root).get("a"), b"new clean text")
+
+    def test_raw_store_reads_through_archive(self):
+        """Raw emails stored in the archive resolve from their reference"""
+        config = {"storage": {
+            "raw_email_dir": os.path.join(self.root, "raw_emails"),
+            "archive": {"enabled": True, "directory": self.root},
+        }}
+        data = b"Subject: hi\r\n\r\nbody\r\n"
+        email_id, ref, _ = get_raw_store(config).put(data)
+
+        self.assertEqual(ref, f"archive:{email_id}")
+        self.assertFalse(os.path.exists(get_raw_store(config).path_for(email_id)))
+        self.assertEqual(read_raw_email(ref, config), data)
+
+    def test_pack_directory_moves_loose_files(self):
+        """Loose files are migrated into the archive and removed"""
+        loose = os.path.join(self.root, "clean_text")
+        os.makedirs(loose)
+        for i in range(3):
+            with open(os.path.join(loose, f"id{i}.txt"), "w") as f:
+                f.write(f"text {i}")
+
+        archive = SegmentArchive(os.path.join(self.root, "archive"))
+        self.assertEqual(pack_directory(loose, archive, ".txt"), 3)
+        self.assertEqual(os.listdir(loose), [])
+        self.assertEqual(archive.get("id1"), b"text 1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import time
+import shutil
+import tempfile
+import unittest
+from src.attachments import AttachmentExtractor, AttachmentTextCache, get_attachment_extractor
+
+
+def read_file(path):
+    """Stand-in extractor: returns the file name and contents"""
+    with open(path, 'rb') as f:
+        return f'{os.path.basename(path)}:{f.read().decode()}'
+
+
+def slow_or_read(path):
+    """Hangs on files named slow*, like a huge scanned PDF"""
+    if os.path.basename(path).startswith('slow'):
+        time.sleep(30)
+    return read_file(path)
+
+
+def fail(path):
+    raise RuntimeError("extractor should not run")
+
+
+def ignore_alarm(path):
+    """Blocks signals the way a stuck native call would, so only the parent can stop it"""
+    import signal
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    time.sleep(30)
+    return 'never'
+
+
+class TestAttachmentExtractor(unittest.TestCase):
+
+    def make_extractor(self, extract_fn=read_file, **kwargs):
+        extractor = AttachmentExtractor(workers=2, extract_fn=extract_fn, **kwargs)
+        self.addCleanup(extractor.close)
+        return extractor
+
+    def test_same_filename_does_not_clobber(self):
+        """Attachments sharing a filename are extracted from separate temp files"""
+        extractor = self.make_extractor()
+        results = extractor.extract_many([("report.pdf", b"first"), ("report.pdf", b"second")])
+        self.assertEqual(results, ["report.pdf:first", "report.pdf:second"])
+
+    def test_unsafe_filename_stays_in_temp_dir(self):
+        """Path components in attachment filenames are stripped"""
+        extractor = self.make_extractor()
+        self.assertEqual(extractor.extract("../../etc/passwd", b"x"), "passwd:x")
+
+    def test_size_and_text_limits(self):
+        """Oversized attachments are skipped and long text is truncated"""
+        extractor = self.make_extractor(max_bytes=10, max_text_chars=8)
+        results = extractor.extract_many([("big.pdf", b"x" * 11), ("a.txt", b"0123456789")])
+        self.assertEqual(results, [None, "a.txt:01"])
+
+    def test_timeout_does_not_block_other_attachments(self):
+        """A stalled attachment times out while the others are still extracted"""
+        extractor = self.make_extractor(extract_fn=slow_or_read, timeout_seconds=1)
+        start = time.monotonic()
+        results = extractor.extract_many([("slow.pdf", b"x"), ("fast.txt", b"y")])
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(results, [None, "fast.txt:y"])
+
+    def test_stuck_worker_is_killed_and_pool_recovers(self):
+        """Workers that ignore the alarm are killed after the grace period"""
+        extractor = self.make_extractor(extract_fn=ignore_alarm, timeout_seconds=1)
+        self.assertEqual(extractor.extract_many([("stuck.pdf", b"x")]), [None])
+        extractor.extract_fn = read_file
+        self.assertEqual(extractor.extract("ok.txt", b"z"), "ok.txt:z")
+
+    def test_shared_extractor_reads_config(self):
+        """Settings come from the attachments section of the config"""
+        config = {"attachments": {"workers": 3, "timeout_seconds": 5, "max_bytes": 100, "cache": False}}
+        extractor = get_attachment_extractor(config)
+        self.assertIs(extractor, get_attachment_extractor(config))
+        self.assertEqual((extractor.workers, extractor.timeout_seconds, extractor.max_bytes), (3, 5, 100))
+        self.assertIsNone(extractor.cache)
+
+
+class TestAttachmentTextCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def make_extractor(self, extract_fn, cache):
+        extractor = AttachmentExtractor(workers=2, extract_fn=extract_fn, cache=cache)
+        self.addCleanup(extractor.close)
+        return extractor
+
+    def test_cached_text_skips_extraction(self):
+        """A later run reuses the text without starting the extractor"""
+        first = self.make_extractor(read_file, AttachmentTextCache(self.root))
+        self.assertEqual(first.extract("datasheet.pdf", b"specs"), "datasheet.pdf:specs")
+
+        second = self.make_extractor(fail, AttachmentTextCache(self.root))
+        # Same bytes under another name still hit the cache
+        self.assertEqual(second.extract("copy.pdf", b"specs"), "datasheet.pdf:specs")
+        self.assertIsNone(second._pool)
+        self.assertEqual(second.cache.hits, 1)
+
+    def test_duplicates_in_one_email_are_extracted_once(self):
+        """Identical attachments in the same batch share one extraction"""
+        cache = AttachmentTextCache(self.root)
+        extractor = self.make_extractor(read_file, cache)
+        results = extractor.extract_many([("a.pdf", b"legal"), ("b.pdf", b"legal")])
+        self.assertEqual(results, ["a.pdf:legal", "a.pdf:legal"])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_extractor_version_change_invalidates(self):
+        """Text cached by another extractor version is extracted again"""
+        old = self.make_extractor(read_file, AttachmentTextCache(self.root, extractor_version="old"))
+        old.extract("a.pdf", b"v1")
+
+        cache = AttachmentTextCache(self.root, extractor_version="new")
+        self.assertIsNone(cache.get(next(iter(cache.archive.ids()))))
+        self.assertEqual(self.make_extractor(read_file, cache).extract("b.pdf", b"v1"), "b.pdf:v1")
+
+if __name__ == '__main__':
+    unittest.main()
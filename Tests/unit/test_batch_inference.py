@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import json
+import tempfile
+import unittest
+from unittest import mock
+from src import batch_inference
+from src.batch_inference import BatchJobRunner, LocalBatchBackend, classify_batch, embed_batch, record_id
+
+MODEL = "anthropic.claude-3-haiku-20240307-v1:0"
+CONFIG = {
+    "bedrock": {"classification_model": MODEL},
+    "embedding": {"model": "amazon.titan-embed-text-v2:0"},
+    "classification": {"mode": "combined"},
+    "type_classification": {"labels": {"security": ["patch"], "marketing": ["webinar"]}},
+    "product_classification": {"vendors": {"hashicorp": ["vault"]}},
+}
+
+
+def claude_output(reply):
+    return {"content": [{"type": "text", "text": json.dumps(reply)}]}
+
+
+class TestBatchInference(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fixtures = os.path.join(self.tmp.name, "fixtures")
+        os.makedirs(self.fixtures)
+        self.sleeps = []
+        self.runner = BatchJobRunner(LocalBatchBackend(self.fixtures, polls_until_complete=2),
+                                     work_dir=os.path.join(self.tmp.name, "work"), min_records=0,
+                                     max_records_per_job=2, poll_seconds=5, sleep=self.sleeps.append)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_fixtures(self, records):
+        with open(os.path.join(self.fixtures, "outputs.jsonl"), "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def test_runner_splits_jobs_polls_and_merges(self):
+        """Requests are split into jobs, polled until complete and merged by record id"""
+        self.write_fixtures([{"recordId": "a#1", "modelOutput": {"n": 1}},
+                             {"recordId": "*", "modelId": "m", "modelOutput": {"n": 0}}])
+        outputs = self.runner.run("test", "m", [("a#1", {}), ("b#1", {}), ("c#1", {})])
+        self.assertEqual(outputs, {"a#1": {"n": 1}, "b#1": {"n": 0}, "c#1": {"n": 0}})
+        self.assertEqual(len(self.runner.backend.jobs), 2)
+        self.assertEqual(self.sleeps, [5, 5])
+
+    def test_classify_batch_merges_by_email_id(self):
+        """Job outputs are validated per email; failed records are classified on-demand"""
+        self.write_fixtures([{"recordId": record_id("e1", "classify"), "modelOutput": claude_output(
+            {"types": ["patch"], "products": ["vault"], "event_date": None,
+             "registration_deadline": None, "expiration_date": None})}])
+        emails = {"e1": {"vendor": "hashicorp", "text": "Vault patch", "received_at": "2025-01-01"},
+                  "e2": {"vendor": "hashicorp", "text": "Something else"}}
+        fallback = {"type": ["webinar"], "product": []}
+        with mock.patch.object(batch_inference, "label_content", return_value=fallback) as on_demand:
+            results = classify_batch(emails, CONFIG, self.runner)
+        self.assertEqual((results["e1"]["type"], results["e1"]["product"]), (["patch"], ["vault"]))
+        self.assertEqual(results["e1"]["date"], "2025-01-01")
+        self.assertIs(results["e2"], fallback)
+        on_demand.assert_called_once_with(emails["e2"], CONFIG)
+
+    def test_embed_batch_fills_failed_records(self):
+        self.write_fixtures([{"recordId": record_id("e1", "chunk-0"), "modelOutput": {"embedding": [0.1, 0.2]}}])
+        chunks = {"e1": [{"chunk_id": "chunk-0", "text": "a"}, {"chunk_id": "chunk-1", "text": "b"}]}
+        with mock.patch.object(batch_inference.embedder, "embed_chunks", return_value=[[0.3, 0.4]]) as on_demand:
+            embeddings = embed_batch(chunks, CONFIG, self.runner)
+        self.assertEqual(embeddings, {"e1": [[0.1, 0.2], [0.3, 0.4]]})
+        on_demand.assert_called_once_with([chunks["e1"][1]], CONFIG)
+
+if __name__ == '__main__':
+    unittest.main()
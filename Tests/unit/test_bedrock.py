@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import io
+import unittest
+from unittest import mock
+from src import bedrock
+
+CONFIG = {"bedrock": {"region": "eu-west-1", "max_pool_connections": 4}}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def invoke_model(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"body": io.BytesIO(b'{"embedding": [0.1]}')}
+
+
+class TestBedrock(unittest.TestCase):
+
+    def test_shared_client_and_request_stats(self):
+        """Calls reuse the registered client for the config and record latency per model"""
+        client = FakeClient()
+        stats = bedrock.BedrockStats()
+        with mock.patch.dict(bedrock._clients, {bedrock.client_settings(CONFIG): client}), \
+                mock.patch.object(bedrock, "stats", stats):
+            for _ in range(3):
+                self.assertEqual(bedrock.invoke_model("titan", '{"inputText": "x"}', CONFIG), '{"embedding": [0.1]}')
+        self.assertEqual(len(client.calls), 3)
+        self.assertEqual(client.calls[0]["modelId"], "titan")
+        self.assertEqual(stats.summary()["requests"]["titan"]["count"], 3)
+        self.assertEqual(stats.summary()["clients_created"], 0)
+
+    def test_settings_key_includes_region_override(self):
+        """A region override selects a separate client; other settings come from config"""
+        self.assertEqual(bedrock.client_settings(CONFIG)[:2], ("eu-west-1", 4))
+        self.assertEqual(bedrock.client_settings(CONFIG, "us-east-1")[0], "us-east-1")
+
+if __name__ == '__main__':
+    unittest.main()
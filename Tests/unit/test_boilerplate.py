@@ -0,0 +1,66 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import shutil
+import tempfile
+import unittest
+from src.boilerplate import BoilerplateIndex, normalize_line
+from src.normalize import clean_message
+
+FOOTER = "You received this email because you subscribed to HashiCorp updates.\nView this email in your browser (issue 12)"
+PRODUCTS = ["vault", "terraform", "consul", "nomad", "packer", "boundary", "waypoint", "sentinel", "vagrant", "otto"]
+
+
+def newsletter(i):
+    return f"New {PRODUCTS[i]} release is available today\n{FOOTER.replace('12', str(i))}"
+
+
+class TestBoilerplateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "boilerplate_index.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_normalize_line_masks_numbers_and_case(self):
+        self.assertEqual(normalize_line("  View  in Browser (Issue 42) "), normalize_line("view in browser (issue 7)"))
+
+    def test_repeated_lines_are_stripped_after_min_emails(self):
+        """Footers shared by most of a vendor's emails are dropped, unique content stays"""
+        index = BoilerplateIndex(self.path, threshold=0.5, min_emails=3)
+        index.observe("hashicorp", newsletter(1))
+        self.assertEqual(index.strip("hashicorp", newsletter(1)), newsletter(1))
+
+        for i in range(2, 5):
+            index.observe("hashicorp", newsletter(i))
+        self.assertEqual(index.strip("hashicorp", newsletter(5)), "New boundary release is available today")
+        # Other vendors are unaffected
+        self.assertEqual(index.strip("snyk", newsletter(5)), newsletter(5))
+
+    def test_index_persists_and_reports_savings(self):
+        """Counts survive a reload and the report shows tokens and chunks saved"""
+        index = BoilerplateIndex(self.path, min_emails=2, chunk_size=40, chunk_overlap=0)
+        for i in range(3):
+            index.observe("hashicorp", newsletter(i))
+        index.save()
+
+        reloaded = BoilerplateIndex(self.path, min_emails=2, chunk_size=40, chunk_overlap=0)
+        reloaded.strip("hashicorp", newsletter(9))
+        row = reloaded.report()[0]
+        self.assertEqual((row["vendor"], row["emails"], row["emails_stripped"]), ("hashicorp", 3, 1))
+        self.assertEqual(row["tokens_saved"], (len(newsletter(9)) - len("New otto release is available today")) // 4)
+        self.assertGreater(row["chunks_saved"], 0)
+
+    def test_clean_message_strips_vendor_boilerplate(self):
+        """Only the body is filtered; the subject line is kept even if it repeats"""
+        config = {"boilerplate": {"enabled": True, "index_file": self.path, "min_emails": 2}}
+        for i in range(3):
+            raw = f"Subject: HashiCorp monthly newsletter\r\n\r\n{newsletter(i)}\r\n".encode()
+            cleaned = clean_message(raw, config, vendor="hashicorp")
+        self.assertEqual(cleaned, "HashiCorp monthly newsletter\nNew consul release is available today")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from src.classification_schema import parse_json_object, validate_classification
+
+CONFIG = {"type_classification": {"labels": {"marketing": ["webinar", "promo"], "security": ["patch"]}}}
+
+class TestClassificationSchema(unittest.TestCase):
+
+    def test_parse_json_object_ignores_fences_and_text(self):
+        """The object is found inside code fences or surrounding prose"""
+        self.assertEqual(parse_json_object('```json\n{"types": ["patch"]}\n```'), {"types": ["patch"]})
+        self.assertEqual(parse_json_object('Here you go: {"a": 1} Thanks'), {"a": 1})
+        self.assertIsNone(parse_json_object('["patch"]'))
+        self.assertIsNone(parse_json_object('{"a": '))
+
+    def test_valid_response(self):
+        """Labels are matched case-insensitively to the configured ones; unknown labels are dropped"""
+        fields, invalid = validate_classification({
+            "types": ["Webinar", "newsletter"], "products": ["Vault ", ""],
+            "event_date": "2025-06-03", "registration_deadline": None, "expiration_date": None,
+        }, CONFIG)
+        self.assertEqual(invalid, [])
+        self.assertEqual(fields, {"type": ["webinar"], "product": ["Vault"], "event_date": "2025-06-03",
+                                  "registration_deadline": None, "expiration_date": None})
+
+    def test_invalid_fields_are_reported_individually(self):
+        """Only malformed or missing fields need a per-field fallback"""
+        fields, invalid = validate_classification({
+            "types": ["newsletter"], "products": "Vault", "event_date": "June 3rd", "registration_deadline": None,
+        }, CONFIG)
+        self.assertEqual(invalid, ["type", "product", "event_date", "expiration_date"])
+        self.assertEqual(fields, {"registration_deadline": None})
+        self.assertEqual(len(validate_classification(None, CONFIG)[1]), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import io
+import json
+import time
+import random
+import unittest
+from unittest import mock
+from src import bedrock, classify
+from src.classify_executor import ClassificationExecutor, RequestGate, TokenBucket
+
+
+class ThrottlingException(Exception):
+    pass
+
+
+class ClientError(Exception):
+    """Stand-in for botocore's ClientError, which carries the parsed error response"""
+
+    def __init__(self, code, status):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+
+
+class TestClassifyExecutor(unittest.TestCase):
+
+    def test_token_bucket_waits_for_budget(self):
+        """Requests beyond the per-minute budget wait for the bucket to refill"""
+        now = [0.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(600, clock=lambda: now[0], sleep=sleep)
+        bucket.acquire(600)
+        self.assertEqual(waits, [])
+        bucket.acquire(100)
+        self.assertAlmostEqual(sum(waits), 10.0)
+
+    def test_gate_backs_off_on_throttling(self):
+        """Throttled requests are retried and halve the concurrency limit; other errors propagate"""
+        sleeps = []
+        gate = RequestGate(concurrency=8, tokens_per_minute=0, sleep=sleeps.append)
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ThrottlingException("Too many requests")
+            return "ok"
+
+        self.assertEqual(gate.call(flaky, 100), "ok")
+        self.assertEqual((len(sleeps), gate.throttles, gate.limit.limit), (2, 2, 2))
+        with self.assertRaises(ValueError):
+            gate.call(lambda: int("x"), 100)
+
+    def test_gate_retries_transient_errors(self):
+        """5xx responses, timeouts and dropped connections are retried without lowering concurrency"""
+        sleeps = []
+        gate = RequestGate(concurrency=8, tokens_per_minute=0, sleep=sleeps.append)
+        errors = [ClientError("InternalServerException", 500), ConnectionResetError("reset"), TimeoutError("read")]
+
+        def flaky():
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        self.assertEqual(gate.call(flaky, 100), "ok")
+        self.assertEqual((len(sleeps), gate.transient_errors, gate.throttles, gate.limit.limit), (3, 3, 0, 8))
+
+        def invalid():
+            raise ClientError("ValidationException", 400)
+
+        # Client errors are not retried
+        with self.assertRaises(ClientError):
+            gate.call(invalid, 100)
+        self.assertEqual(len(sleeps), 3)
+
+    def test_throttle_reaches_gate_on_first_attempt(self):
+        """Classification uses a client without botocore retries, so the gate sees the first throttle"""
+        config = {"bedrock": {"retry_mode": "adaptive", "max_attempts": 5}}
+        calls = []
+
+        class Client:
+            def invoke_model(self, **kwargs):
+                calls.append(kwargs)
+                if len(calls) == 1:
+                    raise ThrottlingException("Too many requests")
+                return {"body": io.BytesIO(b'{"ok": true}')}
+
+        key = bedrock.client_settings(config, retries=bedrock.NO_RETRIES)
+        self.assertEqual(key[-2:], ("standard", 1))
+        gate = RequestGate(concurrency=4, tokens_per_minute=0, sleep=lambda seconds: None)
+        with mock.patch.dict(bedrock._clients, {key: Client()}), \
+                mock.patch.object(classify, "get_request_gate", return_value=gate):
+            self.assertEqual(classify.invoke_bedrock("claude", {"temperature": 0.0}, config), '{"ok": true}')
+        self.assertEqual((len(calls), gate.throttles, gate.limit.limit), (2, 1, 2))
+
+    def test_product_mention_hint_is_opt_in(self):
+        """Known product names found in the email are only listed in the prompt when enabled"""
+        config = {"bedrock": {"classification_model": "m"},
+                  "type_classification": {"labels": {"security": ["patch"]}},
+                  "product_classification": {"vendors": {"hashicorp": ["vault"]}}}
+        data = {"vendor": "hashicorp", "text": "Vault 1.19 patch"}
+        hint = "These known product names appear in the email: vault"
+        self.assertNotIn(hint, json.dumps(classify.combined_request(data, config)[1]))
+        config["classification"] = {"product_mention_hint": True}
+        self.assertIn(hint, json.dumps(classify.combined_request(data, config)[1]))
+
+    def test_results_stay_attached_to_their_email(self):
+        """Futures return each email's own result whatever order the calls finish in"""
+        def classify_fn(data, config):
+            time.sleep(random.uniform(0, 0.01))
+            return {"type": [f"label-{data['id']}"]}
+
+        executor = ClassificationExecutor({"classification": {"concurrency": 4}}, classify_fn)
+        futures = {i: executor.submit({"id": i}) for i in range(20)}
+        executor.close()
+        for i, future in futures.items():
+            self.assertEqual(future.result(), {"type": [f"label-{i}"]})
+
+if __name__ == '__main__':
+    unittest.main()
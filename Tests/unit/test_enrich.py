@@ -4,7 +4,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')
 
 import unittest
 from unittest.mock import MagicMock
-from src.enrich import extract_metadata, infer_vendor
+from src.enrich import extract_metadata, extract_vendor_from_content, infer_vendor
+from src.vendor_domains import PublicSuffixList, VendorResolver
 
 class TestEnrich(unittest.TestCase):
     
@@ -29,6 +30,13 @@ class TestEnrich(unittest.TestCase):
         result = infer_vendor(email)
         self.assertEqual(result, "hashicorp")
     
+    def test_content_vendor_needs_a_vendor_name(self):
+        """Forwarded content is attributed to vendors it names, not to generic product phrases"""
+        config = {"product_classification": {"vendors": {"aws": ["lambda"], "gcp": ["cloud storage"]}}}
+        self.assertIsNone(extract_vendor_from_content({"subject": "Python lambda tips",
+                                                       "body": "Cloud storage pricing"}, config))
+        self.assertEqual(extract_vendor_from_content({"subject": "Fwd: AWS Lambda tips", "body": ""}, config), "aws")
+
     def test_extract_metadata_basic(self):
         """Test basic metadata extraction"""
         # Create mock email object
@@ -52,5 +60,26 @@ class TestEnrich(unittest.TestCase):
         self.assertIn("received_at", result)
         self.assertIn("language", result)
 
+    def test_suffix_list_multi_label_and_wildcard_rules(self):
+        """Registered domains follow the bundled suffix list, including *. and ! rules"""
+        suffixes = PublicSuffixList()
+        self.assertNotEqual(suffixes.version, "unknown")
+        self.assertEqual(suffixes.split("updates.marketing.vmware.co.uk"), ("updates.marketing", "vmware", "co.uk"))
+        self.assertEqual(suffixes.split("shop.example.ck")[1:], ("shop", "example.ck"))
+        self.assertEqual(suffixes.split("www.ck")[1:], ("www", "ck"))
+        self.assertEqual(suffixes.split("host.notatld"), ("host", "notatld", ""))
+
+    def test_aliases_and_memo(self):
+        """Aliases win over the registered domain and resolved hosts are memoized"""
+        resolver = VendorResolver({"reply.hashicorp.com": "HashiCorp", "amazonaws.com": "aws"})
+        self.assertEqual(resolver.vendor_for_host("reply.hashicorp.com"), "hashicorp")
+        self.assertEqual(resolver.vendor_for_host("s3.eu-west-1.amazonaws.com"), "aws")
+        self.assertEqual(resolver.vendor_for_host("mail.google.com"), "google")
+        resolver.vendor_for_host("mail.google.com")
+        self.assertEqual(resolver.vendor_for_host.cache_info().hits, 1)
+
+        config = {"vendor_inference": {"aliases": {"news.vmware.com": "broadcom"}}}
+        self.assertEqual(infer_vendor("VMware <news@news.vmware.com>", config=config), "broadcom")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from unittest import mock
+from src import classify
+from src.fast_classifier import FastPathClassifier, extract_dates_locally
+
+CONFIG = {
+    "classification": {"mode": "combined", "fast_path": {"enabled": True, "threshold": 0.8}},
+    "type_classification": {"labels": {"marketing": ["webinar", "promo"], "security": ["vulnerability", "patch"]}},
+    "product_classification": {"vendors": {"hashicorp": ["vault", "terraform"]}},
+}
+
+
+class TestFastClassifier(unittest.TestCase):
+
+    def test_keyword_and_cve_rules(self):
+        """Label-prefixed subjects and CVE ids settle the type with full confidence"""
+        fast_path = FastPathClassifier(CONFIG)
+        fields, confidence = fast_path.classify({"subject": "Fwd: Webinar: Vault secrets", "vendor": "hashicorp",
+                                                 "text": "Webinar: Vault secrets\nJoin our webinar about Vault."})
+        self.assertEqual((fields["type"], fields["product"]), (["webinar"], ["vault"]))
+        self.assertEqual(confidence["type"], 1.0)
+
+        fields, confidence = fast_path.classify({"subject": "Security bulletin", "vendor": "hashicorp",
+                                                 "text": "Terraform fixes CVE-2025-12345."})
+        self.assertIn("vulnerability", fields["type"])
+        self.assertEqual(confidence["type"], 1.0)
+
+    def test_unclear_email_has_low_confidence(self):
+        """No keywords and no known products leave the decision to the LLM"""
+        _, confidence = FastPathClassifier(CONFIG).classify({"subject": "Quarterly note", "text": "Hello team"})
+        self.assertEqual((confidence["type"], confidence["product"]), (0.0, 0.0))
+
+    def test_local_dates(self):
+        """Dates are assigned from their sentence; dates without a year lower the confidence"""
+        dates, confidence = extract_dates_locally("Join the live webinar on June 3, 2025. Register by 2025-05-30!")
+        self.assertEqual(dates, {"event_date": "2025-06-03", "registration_deadline": "2025-05-30", "expiration_date": None})
+        self.assertEqual(confidence, 0.9)
+        self.assertEqual(extract_dates_locally("No dates here")[1], 1.0)
+        self.assertEqual(extract_dates_locally("See you on June 13")[1], 0.3)
+
+    def test_label_content_skips_llm_when_confident(self):
+        """A confident fast path returns without any Bedrock call and counts the saved call"""
+        data = {"subject": "Webinar: Terraform at scale", "vendor": "hashicorp", "received_at": "2025-05-01",
+                "text": "Webinar: Terraform at scale\nJoin the webinar on June 3, 2025."}
+        with mock.patch.object(classify, "invoke_bedrock", side_effect=AssertionError("LLM called")):
+            result = classify.label_content(data, CONFIG)
+        self.assertEqual((result["type"], result["product"], result["event_date"]), (["webinar"], ["terraform"], "2025-06-03"))
+        stats = classify.get_fast_classifier(CONFIG).stats
+        self.assertEqual((stats.fast_path_emails, stats.llm_calls_saved), (1, 1))
+
+    def test_label_content_calls_llm_for_unsure_parts_only(self):
+        """A confident type and date leave only the product to Bedrock, with one per-field call"""
+        config = dict(CONFIG, classification={"mode": "per_field", "fast_path": {"enabled": True, "threshold": 0.8}})
+        data = {"subject": "Webinar: platform engineering", "vendor": "hashicorp", "received_at": "2025-05-01",
+                "text": "Webinar: platform engineering\nJoin the webinar on June 3, 2025."}
+        # A fresh shared classifier, so the stats start at zero
+        with mock.patch.dict("src.fast_classifier._classifiers", clear=True), \
+                mock.patch.object(classify, "classify_message_type", side_effect=AssertionError("type called")), \
+                mock.patch.object(classify, "extract_dates", side_effect=AssertionError("dates called")), \
+                mock.patch.object(classify, "classify_message_products", return_value=["packer"]) as products:
+            result = classify.label_content(data, config)
+            stats = classify.get_fast_classifier(config).stats
+        products.assert_called_once()
+        self.assertEqual((result["type"], result["product"], result["event_date"]), (["webinar"], ["packer"], "2025-06-03"))
+        self.assertEqual((stats.fast_path_emails, stats.llm_calls_saved), (1, 2))
+
+if __name__ == '__main__':
+    unittest.main()
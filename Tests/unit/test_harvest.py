@@ -0,0 +1,319 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+sys.path.append(os.path.dirname(__file__))
+
+import json
+import tempfile
+import threading
+import time
+import unittest
+from src.harvest import IMAPHarvester
+from imap_stub import StubIMAPServer, make_config, make_message
+
+class TestIMAPHarvester(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.server = StubIMAPServer().__enter__()
+        self.mailbox = self.server.mailbox
+        for i in range(5):
+            self.mailbox.append(make_message(f"Update {i}"))
+        self.mailbox.append(make_message("Already read"), seen=True)
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_single_session_for_fetch_and_mark(self):
+        """Fetching and marking reuse one authenticated session"""
+        with IMAPHarvester(make_config(self.server, self.tmp.name, mark_batch_size=100)) as harvester:
+            emails = harvester.fetch_unread_emails()
+            self.assertEqual(len(emails), 5)
+            for uid, _ in emails:
+                harvester.mark_seen(uid)
+
+        self.assertEqual(self.mailbox.logins, 1)
+        self.assertEqual(len(self.mailbox.seen_uids()), 6)
+
+    def test_fetch_does_not_set_seen(self):
+        """Messages stay unread until explicitly committed"""
+        with IMAPHarvester(make_config(self.server, self.tmp.name)) as harvester:
+            harvester.fetch_unread_emails()
+            self.assertEqual(self.mailbox.seen_uids(), [6])
+
+    def test_flags_are_stored_in_batches(self):
+        """Seen flags are committed as UID-set STORE commands"""
+        with IMAPHarvester(make_config(self.server, self.tmp.name, mark_batch_size=2)) as harvester:
+            for uid, _ in harvester.fetch_unread_emails():
+                harvester.mark_seen(uid)
+
+        stores = [c for c in self.mailbox.commands if c.upper().startswith("UID STORE")]
+        self.assertEqual(len(stores), 3)
+        self.assertTrue(stores[0].startswith("UID STORE 1,2 "))
+
+    def test_mark_as_read_disabled(self):
+        """No STORE is issued when mark_as_read is off"""
+        with IMAPHarvester(make_config(self.server, self.tmp.name, mark_as_read=False)) as harvester:
+            for uid, _ in harvester.fetch_unread_emails():
+                harvester.mark_seen(uid)
+
+        self.assertEqual(self.mailbox.seen_uids(), [6])
+
+    def test_reconnects_after_dropped_connection(self):
+        """A dropped connection is re-established transparently"""
+        with IMAPHarvester(make_config(self.server, self.tmp.name)) as harvester:
+            self.server.drop_next = True
+            emails = harvester.fetch_unread_emails()
+
+        self.assertEqual(len(emails), 5)
+        self.assertEqual(self.mailbox.logins, 2)
+
+
+class TestStreamingFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.server = StubIMAPServer().__enter__()
+        self.mailbox = self.server.mailbox
+        for i in range(6):
+            self.mailbox.append(make_message(f"Update {i}", body="x" * 1000))
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_iter_new_emails_is_lazy(self):
+        """Bodies are downloaded batch by batch as the generator advances"""
+        config = make_config(self.server, self.tmp.name, fetch_batch_size=2)
+        with IMAPHarvester(config) as harvester:
+            stream = harvester.iter_new_emails()
+            uid, msg = next(stream)
+            self.assertEqual(uid, b"1")
+            self.assertEqual(msg["Subject"], "Update 0")
+            self.assertEqual(self.mailbox.body_fetches, 2)
+            self.assertEqual(len(list(stream)), 5)
+
+    def test_inflight_bytes_are_capped(self):
+        """Body fetch groups never exceed max_inflight_bytes"""
+        size = max(len(m["data"]) for m in self.mailbox.messages)
+        config = make_config(self.server, self.tmp.name, fetch_batch_size=6, max_inflight_bytes=size * 2)
+        with IMAPHarvester(config) as harvester:
+            uids = [int(uid) for uid, _ in harvester.iter_new_emails()]
+
+        self.assertEqual(uids, [1, 2, 3, 4, 5, 6])
+        body_fetches = [c for c in self.mailbox.commands if "BODY.PEEK[]" in c.upper()]
+        self.assertEqual([c.split()[2] for c in body_fetches], ["1,2", "3,4", "5,6"])
+
+    def test_oversized_message_is_fetched_alone(self):
+        """A message larger than the cap is still delivered"""
+        config = make_config(self.server, self.tmp.name, max_inflight_bytes=10)
+        with IMAPHarvester(config) as harvester:
+            self.assertEqual(len(list(harvester.iter_new_emails())), 6)
+
+
+class TestMessageIdDedup(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.server = StubIMAPServer().__enter__()
+        self.mailbox = self.server.mailbox
+        self.config = make_config(self.server, self.tmp.name)
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def harvest(self):
+        with IMAPHarvester(self.config) as harvester:
+            emails = list(harvester.iter_new_emails())
+            for uid, _ in emails:
+                harvester.commit(uid)
+        return [int(uid) for uid, _ in emails]
+
+    def test_known_message_id_skips_body_download(self):
+        """A copy of an already processed Message-ID is never downloaded"""
+        self.mailbox.append(make_message("Launch", message_id="<launch@vendor.com>"))
+        self.assertEqual(self.harvest(), [1])
+
+        self.mailbox.append(make_message("Fwd: Launch", message_id="<launch@vendor.com>"))
+        self.mailbox.body_fetches = 0
+        self.assertEqual(self.harvest(), [])
+        self.assertEqual(self.mailbox.body_fetches, 0)
+        # The duplicate is still committed so it is not offered again
+        self.assertEqual(self.mailbox.seen_uids(), [1, 2])
+
+    def test_duplicates_within_one_run(self):
+        """Only the first copy of a Message-ID in a run is downloaded"""
+        self.mailbox.append(make_message("Launch", message_id="<launch@vendor.com>"))
+        self.mailbox.append(make_message("Launch (alias)", message_id="<launch@vendor.com>"))
+        self.mailbox.append(make_message("Other", message_id="<other@vendor.com>"))
+        self.assertEqual(self.harvest(), [1, 3])
+        # Deferred copy is resolved against the index on the next run
+        self.assertEqual(self.harvest(), [])
+        self.assertEqual(self.mailbox.seen_uids(), [1, 2, 3])
+
+    def test_header_fields_are_peeked(self):
+        """Headers are fetched with BODY.PEEK so nothing is flagged by the probe"""
+        self.mailbox.append(make_message("Launch"))
+        with IMAPHarvester(self.config) as harvester:
+            envelopes = harvester.fetch_envelopes([1])
+        self.assertEqual(envelopes[1][1], f"<{abs(hash('Launch'))}@example.com>")
+        self.assertEqual(self.mailbox.seen_uids(), [])
+
+
+class TestWatchMode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def run_watch(self, server, **overrides):
+        """Run watch() in a thread, deliver one new email and return arrival latency"""
+        config = make_config(server, self.tmp.name, idle_timeout_seconds=5, noop_interval_seconds=0.05, **overrides)
+        received = []
+        arrived = threading.Event()
+        stop = threading.Event()
+        harvester = IMAPHarvester(config)
+
+        def handle_email(uid, msg):
+            received.append(msg["Subject"])
+            harvester.commit(uid)
+            arrived.set()
+
+        self.batches = []
+        watcher = threading.Thread(target=harvester.watch, args=(handle_email, stop, lambda: self.batches.append(1)),
+                                   daemon=True)
+        watcher.start()
+        time.sleep(0.2)
+
+        start = time.monotonic()
+        server.mailbox.append(make_message("Security advisory"))
+        self.assertTrue(arrived.wait(3), "new email was not delivered")
+        latency = time.monotonic() - start
+
+        stop.set()
+        watcher.join(3)
+        harvester.close()
+        self.assertEqual(received, ["Security advisory"])
+        return latency
+
+    def test_idle_delivers_new_mail(self):
+        """New mail is pushed to the handler via IDLE well before the timeout"""
+        with StubIMAPServer() as server:
+            latency = self.run_watch(server)
+            self.assertTrue(any(c.upper() == "IDLE" for c in server.mailbox.commands))
+        self.assertLess(latency, 2)
+        # Housekeeping ran after the batch with the new email
+        self.assertTrue(self.batches)
+
+    def test_exists_buffered_with_continuation(self):
+        """An EXISTS that arrives in the same packet as "+ idling" ends IDLE right away"""
+        with StubIMAPServer() as server:
+            server.exists_with_continuation = True
+            harvester = IMAPHarvester(make_config(server, self.tmp.name))
+            start = time.monotonic()
+            self.assertTrue(harvester.idle(5))
+            elapsed = time.monotonic() - start
+            harvester.close()
+        self.assertLess(elapsed, 2)
+
+    def test_mail_arriving_during_batch_is_picked_up(self):
+        """An EXISTS the server sends during the batch's FETCH/STORE does not wait for the IDLE timeout"""
+        with StubIMAPServer() as server:
+            server.mailbox.append(make_message("First"))
+            harvester = IMAPHarvester(make_config(server, self.tmp.name, idle_timeout_seconds=5))
+            received = []
+            done = threading.Event()
+            stop = threading.Event()
+
+            def handle_email(uid, msg):
+                received.append(msg["Subject"])
+                if len(received) == 1:
+                    server.mailbox.append(make_message("During batch"))
+                harvester.commit(uid)
+                if len(received) == 2:
+                    done.set()
+
+            watcher = threading.Thread(target=harvester.watch, args=(handle_email, stop), daemon=True)
+            watcher.start()
+            delivered = done.wait(3)
+            stop.set()
+            watcher.join(6)
+            harvester.close()
+        self.assertTrue(delivered, "mail that arrived during the batch waited for the IDLE timeout")
+        self.assertEqual(received, ["First", "During batch"])
+
+    def test_noop_fallback_without_idle(self):
+        """Servers without IDLE are polled with NOOP"""
+        with StubIMAPServer(capabilities="IMAP4rev1") as server:
+            self.run_watch(server)
+            self.assertIn("NOOP", [c.upper() for c in server.mailbox.commands])
+            self.assertNotIn("IDLE", [c.upper() for c in server.mailbox.commands])
+
+
+class TestIncrementalSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.server = StubIMAPServer().__enter__()
+        self.mailbox = self.server.mailbox
+        self.config = make_config(
+            self.server,
+            self.tmp.name,
+            sync_mode="incremental",
+            initial_sync="all",
+            sync_state_file=os.path.join(self.tmp.name, "state.json"),
+        )
+        for i in range(3):
+            self.mailbox.append(make_message(f"Update {i}"))
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def harvest(self, commit=True):
+        with IMAPHarvester(self.config) as harvester:
+            emails = harvester.fetch_new_emails()
+            if commit:
+                for uid, _ in emails:
+                    harvester.commit(uid)
+        return [int(uid) for uid, _ in emails]
+
+    def test_only_new_uids_are_fetched(self):
+        """Later runs fetch only UIDs above the checkpoint, even if already read"""
+        self.assertEqual(self.harvest(), [1, 2, 3])
+        self.mailbox.append(make_message("New"), seen=True)
+        self.assertEqual(self.harvest(), [4])
+        self.assertEqual(self.harvest(), [])
+
+    def test_unchanged_uidnext_skips_search(self):
+        """No SEARCH is issued when UIDNEXT did not move"""
+        self.harvest()
+        self.mailbox.commands.clear()
+        self.harvest()
+        self.assertFalse(any(c.upper().startswith("UID SEARCH") for c in self.mailbox.commands))
+
+    def test_uncommitted_uids_are_retried(self):
+        """Fetched but uncommitted UIDs stay pending for the next run"""
+        self.assertEqual(self.harvest(commit=False), [1, 2, 3])
+        self.assertEqual(self.harvest(), [1, 2, 3])
+        self.assertEqual(self.harvest(), [])
+
+    def test_uidvalidity_change_forces_resync(self):
+        """A new UIDVALIDITY discards the checkpoint and resyncs the folder"""
+        self.harvest()
+        self.mailbox.uidvalidity = 2
+        self.mailbox.commands.clear()
+        self.harvest()
+        # The resync searches the whole folder again; known Message-IDs are skipped
+        self.assertIn("UID SEARCH ALL", self.mailbox.commands)
+
+        with open(self.config["email"]["sync_state_file"]) as f:
+            state = json.load(f)
+        checkpoint = list(state.values())[0]
+        self.assertEqual(checkpoint["uidvalidity"], 2)
+        self.assertEqual(checkpoint["last_uid"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
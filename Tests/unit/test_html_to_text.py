@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from src.html_to_text import html_to_text
+
+class TestHtmlToText(unittest.TestCase):
+
+    def test_removes_style_script_and_comments(self):
+        """Style/script blocks and comments produce no text"""
+        html = "Before<style>body { color: red; }</style><!-- note --><SCRIPT>if (a<b) {}</SCRIPT>After"
+        self.assertEqual(html_to_text(html), "BeforeAfter")
+
+    def test_block_tags_become_line_breaks(self):
+        """Block-level elements and <br> start new lines, inline tags vanish"""
+        html = "<h1>Vault 1.19</h1><p>Now <b>available</b>.</p><ul><li>One</li><li>Two</li></ul>Line<br>break"
+        self.assertEqual(html_to_text(html), "Vault 1.19\nNow available.\nOne\nTwo\nLine\nbreak")
+
+    def test_table_cells_are_space_separated(self):
+        """Cells in a row are kept apart on one line"""
+        html = "<table><tr><td>Product</td><td>Version</td></tr><tr><td>Consul</td><td>1.20</td></tr></table>"
+        self.assertEqual(html_to_text(html), "Product Version\nConsul 1.20")
+
+    def test_decodes_entities(self):
+        """Named, numeric and hex entities are decoded; unknown ones are kept"""
+        html = "AT&amp;T&nbsp;&#8220;news&#x201D; &copy; &bogus;"
+        self.assertEqual(html_to_text(html), "AT&T “news” © &bogus;")
+
+    def test_query_strings_are_kept(self):
+        """'&name' without ';' is only decoded for legacy names, and never before '='"""
+        url = "https://example.com/?a=1&lang=en&region=us&not=1&sub=2"
+        self.assertEqual(html_to_text(f"<a href='{url}'>{url}</a>"), url)
+        self.assertEqual(html_to_text("AT&amp T &copy 2025 &lang"), "AT& T © 2025 &lang")
+
+    def test_collapses_whitespace(self):
+        """Indentation and blank lines between tags do not leak into the text"""
+        html = "<div>\n    Hello\n    <span>world</span>\n</div>\n\n\n\n<div>Bye</div>"
+        self.assertEqual(html_to_text(html), "Hello\nworld\nBye")
+
+    def test_plain_text_is_left_alone(self):
+        """Text without markup (including a stray '<') passes through"""
+        self.assertEqual(html_to_text("x < y and a<b"), "x < y and a<b")
+        self.assertEqual(html_to_text(""), "")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from src.language import LanguageDetector, register_backend, sample_text
+
+class TestLanguage(unittest.TestCase):
+
+    def test_sample_text_keeps_head_and_tail(self):
+        """Long text is reduced to its beginning and end"""
+        text = "a" * 100 + "b" * 10000 + "c" * 100
+        self.assertEqual(sample_text(text, 200), "a" * 100 + "\n" + "c" * 100)
+        self.assertEqual(sample_text("short", 200), "short")
+
+    def test_backend_sees_bounded_sample_with_seed(self):
+        """Pluggable backends get the seed and only the sampled window"""
+        seen = []
+        register_backend("recording", lambda seed: lambda text: seen.append((seed, len(text))) or "en")
+        detector = LanguageDetector("recording", window_chars=1000, seed=7)
+        language, seconds = detector.detect("x" * 5_000_000)
+        self.assertEqual(language, "en")
+        self.assertEqual(seen, [(7, 1001)])
+        self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(detector.summary()["calls"], 1)
+
+    def test_script_backend(self):
+        """The dependency-free backend tells Hebrew from Latin text"""
+        detector = LanguageDetector("script")
+        self.assertEqual(detector.detect("שלום לכולם, עדכון גרסה")[0], "he")
+        self.assertEqual(detector.detect("Vault 1.19 release notes")[0], "en")
+        self.assertEqual(detector.detect("1234 !!")[0], "unknown")
+
+    def test_failures_are_unknown(self):
+        """Missing backends and detection errors yield 'unknown'"""
+        self.assertEqual(LanguageDetector("no-such-backend").detect("hello")[0], "unknown")
+        register_backend("failing", lambda seed: lambda text: 1 / 0)
+        self.assertEqual(LanguageDetector("failing").detect("hello")[0], "unknown")
+
+if __name__ == '__main__':
+    unittest.main()
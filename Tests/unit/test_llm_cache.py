@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import shutil
+import tempfile
+import unittest
+from src.llm_cache import LLMResponseCache
+
+MODEL = "anthropic.claude-3-haiku-20240307-v1:0"
+
+
+def body(prompt, max_tokens=300):
+    return {"anthropic_version": "bedrock-2023-05-31", "max_tokens": max_tokens, "temperature": 0.0,
+            "messages": [{"role": "user", "content": prompt}]}
+
+
+class TestLLMCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "llm_cache.sqlite")
+        self.now = 1000000.0
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def cache(self, **kwargs):
+        return LLMResponseCache(self.path, clock=lambda: self.now, **kwargs)
+
+    def test_hits_survive_reopen_and_key_covers_params(self):
+        """Same model, prompt and params hit, also after reopening; other params miss"""
+        cache = self.cache()
+        self.assertIsNone(cache.get(MODEL, body("Classify")))
+        cache.put(MODEL, body("Classify"), '{"content": []}')
+        cache.close()
+
+        cache = self.cache()
+        self.assertEqual(cache.get(MODEL, body("Classify")), '{"content": []}')
+        self.assertIsNone(cache.get(MODEL, body("Classify", max_tokens=500)))
+        self.assertIsNone(cache.get("other-model", body("Classify")))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "entries": 1})
+
+    def test_age_eviction(self):
+        """Entries older than max_age_days are not returned"""
+        cache = self.cache(max_age_days=1)
+        cache.put(MODEL, body("old"), "answer")
+        self.now += 2 * 86400
+        self.assertIsNone(cache.get(MODEL, body("old")))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_size_eviction_keeps_recently_used(self):
+        """Past max_entries the least recently used entries are dropped"""
+        cache = self.cache(max_entries=2)
+        for prompt in ["a", "b", "c"]:
+            self.now += 1
+            cache.put(MODEL, body(prompt), prompt)
+            if prompt == "b":
+                self.now += 1
+                cache.get(MODEL, body("a"))
+        cache.evict()
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertIsNone(cache.get(MODEL, body("b")))
+        self.assertEqual(cache.get(MODEL, body("a")), "a")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import mailbox
+import shutil
+import tempfile
+import unittest
+from email import message_from_bytes
+from src.local_loader import iter_backfill_emails, iter_message_sources, load_local_emails
+from src.raw_store import content_hash, raw_bytes
+
+def make_message(subject):
+    return (
+        f"From: news@vendor.com\r\nSubject: {subject}\r\n"
+        f"Message-ID: <{subject.replace(' ', '-')}@vendor.com>\r\n\r\nBody of {subject}\r\n"
+    ).encode()
+
+class TestBackfillLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write_eml(self, relpath, data):
+        path = os.path.join(self.root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def test_mixed_tree(self):
+        """.eml files, mbox files and Maildirs in one tree are all imported"""
+        self.write_eml("a/one.eml", make_message("one"))
+        self.write_eml("a/b/two.eml", make_message("two"))
+
+        box = mailbox.mbox(os.path.join(self.root, "archive.mbox"))
+        for subject in ("three", "four"):
+            box.add(message_from_bytes(make_message(subject)))
+        box.close()
+
+        maildir = mailbox.Maildir(os.path.join(self.root, "maildir"))
+        maildir.add(message_from_bytes(make_message("five")))
+        maildir.close()
+
+        subjects = sorted(msg["Subject"] for _, msg in iter_backfill_emails(self.root, workers=2, max_pending=2))
+        self.assertEqual(subjects, ["five", "four", "one", "three", "two"])
+
+    def test_ids_are_content_hashes(self):
+        """Emails with the same subject get distinct ids; identical copies share one"""
+        self.write_eml("x.eml", make_message("Webinar"))
+        self.write_eml("y.eml", make_message("Webinar").replace(b"Body", b"Other body"))
+        self.write_eml("z.eml", make_message("Webinar"))
+
+        ids = [email_id for email_id, _ in iter_backfill_emails(self.root, workers=2)]
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(set(ids)), 2)
+        self.assertTrue(all(len(i) == 64 for i in ids))
+        self.assertEqual(sorted(i for i, _ in load_local_emails(self.root)), sorted(ids))
+
+    def test_ids_hash_the_file_bytes(self):
+        """Ids hash the bytes read, not the re-serialized message (policy.default refolds long headers)"""
+        data = make_message("word " * 40)
+        self.write_eml("long.eml", data)
+        (email_id, msg), = load_local_emails(self.root)
+        self.assertNotEqual(msg.as_bytes(), data)
+        self.assertEqual(email_id, content_hash(data))
+        self.assertEqual(raw_bytes(msg), data)
+        self.assertEqual([i for i, _ in iter_backfill_emails(self.root, workers=1)], [email_id])
+
+    def test_sources_are_streamed(self):
+        """The source walker is lazy and hands out paths, not parsed messages"""
+        for i in range(3):
+            self.write_eml(f"{i}.eml", make_message(str(i)))
+        sources = iter_message_sources(self.root)
+        self.assertEqual(next(sources)[0], "file")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from src.enrich import extract_vendor_from_content
+from src.mentions import AhoCorasick, MentionIndex, VendorProductMatcher
+
+VENDORS = {
+    "hashicorp": ["vault", "terraform", "terraform cloud"],
+    "aws": ["s3", "ec2"],
+    "broadcom": ["VMWare", "vSphere"],
+}
+
+class TestMentions(unittest.TestCase):
+
+    def test_automaton_finds_overlapping_terms_on_word_boundaries(self):
+        """Every occurrence of every term is found in one scan; partial words are not matches"""
+        automaton = AhoCorasick(["terraform", "terraform cloud", "s3"])
+        found = [(m.start, m.term) for m in automaton.iter_matches("terraform cloud, s3 and s3cure terraforming")]
+        self.assertEqual(sorted(found), [(0, "terraform"), (0, "terraform cloud"), (17, "s3")])
+
+    def test_vendors_and_products_in_text(self):
+        """Product mentions imply their vendor; results follow the order of first mention"""
+        matcher = VendorProductMatcher(VENDORS)
+        text = "New vSphere 8 release; store backups in S3. HashiCorp Vault 1.19 is out"
+        self.assertEqual(matcher.vendors_in(text), ["broadcom", "aws", "hashicorp"])
+        self.assertEqual(matcher.vendors_in(text, implied=False), ["hashicorp"])
+        self.assertEqual(matcher.products_in(text), ["vsphere", "s3", "vault"])
+        self.assertEqual(matcher.products_in(text, vendor="aws"), ["s3"])
+        self.assertEqual(matcher.vendors_for_product("VMware"), {"broadcom"})
+
+    def test_mention_index_positions(self):
+        """Lines and sentences of mentions come from the same single scan"""
+        index = MentionIndex("Vault is great.\nTerraform too", ["vault", "terraform"])
+        self.assertEqual(index.line_of(index.find("Terraform")[0].start), 1)
+        self.assertNotEqual(index.sentence_of(index.find("vault")[0].start),
+                            index.sentence_of(index.find("terraform")[0].start))
+
+    def test_extract_vendor_from_content_uses_config(self):
+        """Subject mentions win over the body; config vendors count, their products alone do not"""
+        config = {"product_classification": {"vendors": VENDORS}}
+        self.assertEqual(extract_vendor_from_content({"subject": "Fwd: Broadcom webinar", "body": "Oracle"}, config), "broadcom")
+        self.assertEqual(extract_vendor_from_content({"subject": "Fwd: vSphere 8 webinar", "body": "Oracle"}, config), "oracle")
+        self.assertEqual(extract_vendor_from_content({"subject": "Fwd: webinar", "body": "Join Oracle"}, config), "oracle")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,8 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 import unittest
-from src.normalize import medium_clean
+from email import policy, message_from_bytes
+from src.normalize import medium_clean, clean_message
 
 class TestNormalize(unittest.TestCase):
     
@@ -55,5 +56,23 @@ class TestNormalize(unittest.TestCase):
         cleaned = medium_clean(text_with_newlines)
         self.assertEqual(cleaned, "Line 1\n\nLine 2")
 
+    def test_clean_message_accepts_message_or_bytes(self):
+        """In-memory messages and raw bytes clean to the same text without touching disk"""
+        raw = (b"Subject: Terraform 1.12\r\nContent-Type: text/html; charset=utf-8\r\n\r\n"
+               b"<p>New&nbsp;release</p><style>p {}</style>")
+        expected = "Terraform 1.12\nNew release"
+        self.assertEqual(clean_message(raw, {}), expected)
+        self.assertEqual(clean_message(message_from_bytes(raw, policy=policy.default), {}), expected)
+        # compat32 messages are reparsed with the modern policy
+        self.assertEqual(clean_message(message_from_bytes(raw), {}), expected)
+
+    def test_plain_part_link_targets_are_dropped(self):
+        """Angle-bracket URLs and addresses in text/plain parts are removed, the link text stays"""
+        raw = (b"Subject: Webinar\r\nContent-Type: text/plain; charset=utf-8\r\n\r\n"
+               b"Register now <https://click.example.com/?id=1&u=2> or write to Jane <jane@example.com>\n"
+               b"Vault < 1.19 is affected")
+        self.assertEqual(clean_message(raw, {}),
+                         "Webinar\nRegister now  or write to Jane \nVault < 1.19 is affected")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from src.normalize import clean_message
+from src.normalize_cache import NormalizeCache, normalizer_versions
+
+PLAIN = b"Subject: Vault 1.19\n\nNew release\n--\nJohn\n"
+HTML = b"Subject: Consul 1.21\r\nContent-Type: text/html\r\n\r\n<p>New&nbsp;release</p>"
+
+
+class TestNormalizeCache(unittest.TestCase):
+
+    def setUp(self):
+        # clean_message saves cleaned text under data/clean_text relative to the working directory
+        self.cwd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        os.chdir(self.root)
+        self.config = {"data_processing": {"normalize_cache": True,
+                                           "normalize_cache_dir": os.path.join(self.root, "normalize_cache")}}
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root)
+
+    def test_cache_hit_skips_parsing(self):
+        """The same content reuses the cleaned parts without parsing, whatever id it is stored under"""
+        self.assertEqual(clean_message(PLAIN, self.config, email_id="plain"), "Vault 1.19\nNew release")
+        with mock.patch("src.normalize.extract_parts", side_effect=AssertionError("parsed")):
+            self.assertEqual(clean_message(PLAIN, self.config, email_id="legacy-uuid"), "Vault 1.19\nNew release")
+
+    def test_cache_is_keyed_by_content(self):
+        """An id reused for different content does not get the other email's cleaned text"""
+        clean_message(PLAIN, self.config, email_id="reused")
+        self.assertEqual(clean_message(HTML, self.config, email_id="reused"), "Consul 1.21\nNew release")
+
+    def test_version_bump_invalidates_only_affected_entries(self):
+        """Bumping the HTML converter version recomputes HTML emails, plain-text ones stay cached"""
+        cache = NormalizeCache(os.path.join(self.root, "cache"))
+        versions = normalizer_versions({})
+        cache.put("plain", versions, {"parser", "cleanup"}, "Vault", "body", [])
+        cache.put("html", versions, {"parser", "cleanup", "html"}, "Consul", "body", [])
+
+        with mock.patch("src.normalize_cache.HTML_TO_TEXT_VERSION", "bumped"):
+            bumped = normalizer_versions({})
+        self.assertEqual(cache.get("plain", bumped), ("Vault", "body", []))
+        self.assertIsNone(cache.get("html", bumped))
+        self.assertEqual(cache.get("html", versions), ("Consul", "body", []))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_cleanup_settings_change_version(self):
+        """Settings that change cleanup output are part of its version"""
+        self.assertNotEqual(normalizer_versions({})["cleanup"],
+                            normalizer_versions({"data_processing": {"max_clean_chars": 10}})["cleanup"])
+
+    def test_html_email_recomputed_after_bump(self):
+        """A stale entry is replaced by freshly cleaned text"""
+        clean_message(HTML, self.config, email_id="html")
+        with mock.patch("src.normalize_cache.HTML_TO_TEXT_VERSION", "bumped"):
+            self.assertEqual(clean_message(HTML, self.config, email_id="html"), "Consul 1.21\nNew release")
+            with mock.patch("src.normalize.extract_parts", side_effect=AssertionError("parsed")):
+                self.assertEqual(clean_message(HTML, self.config, email_id="html"), "Consul 1.21\nNew release")
+
+if __name__ == '__main__':
+    unittest.main()
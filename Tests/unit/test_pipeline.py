@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    import main
+except ImportError:  # pipeline dependencies (dotenv, py2neo, chromadb, langchain) not installed
+    main = None
+
+EMAIL = "From: news@hashicorp.com\nTo: me@example.com\nSubject: {subject}\n\n{subject} body\n"
+
+
+@unittest.skipIf(main is None, "pipeline dependencies not installed")
+class TestRunPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.folder = os.path.join(self.tmp.name, "emails")
+        os.makedirs(self.folder)
+        for i in range(2):
+            with open(os.path.join(self.folder, f"{i}.eml"), "w") as f:
+                f.write(EMAIL.format(subject=f"Update {i}"))
+        self.config = {
+            "debug": {"enabled": False},
+            "storage": {"raw_email_dir": os.path.join(self.tmp.name, "raw")},
+            "classification": {"concurrency": 2},
+        }
+
+    def run_local(self, *extra_args, email_id=None):
+        """run_pipeline over the local folder with every external service patched out"""
+        def prepare(eid, email_obj, config, harvester=None):
+            return {"email_id": email_id or eid, "raw_path": None, "clean_text": "text",
+                    "enriched_data": {"text": "text", "subject": str(email_obj["subject"])}}
+
+        with mock.patch.object(sys, "argv", ["main.py", "--local", "--folder", self.folder, *extra_args]):
+            main.args = main.parse_args()
+        complete = mock.MagicMock(return_value=True)
+        with mock.patch.multiple(main, load_config=mock.DEFAULT, setup_logging=mock.DEFAULT,
+                                 connect_to_graph=mock.MagicMock(return_value=None), prepare_email=prepare,
+                                 complete_email=complete, get_graph_summary=mock.DEFAULT,
+                                 get_vendor_products_by_confidence=mock.DEFAULT, process_search_query=mock.DEFAULT,
+                                 unified_search=mock.MagicMock(return_value={"documents": []}),
+                                 check_health=mock.DEFAULT, log_metrics=mock.DEFAULT,
+                                 send_pipeline_summary_email=mock.DEFAULT) as patched, \
+                mock.patch.object(main.llm_utils, "get_chroma_collection"), \
+                mock.patch("src.classify.label_content", return_value={"type": ["update"], "text": "text"}):
+            patched["load_config"].return_value = self.config
+            main.run_pipeline()
+        return complete
+
+    def test_local_run_without_batch(self):
+        """Without --batch every email goes through the concurrent classifier and is completed"""
+        complete = self.run_local()
+        self.assertEqual(complete.call_count, 2)
+        self.assertEqual(sorted(call.args[3]["type"][0] for call in complete.call_args_list), ["update", "update"])
+
+    def test_in_flight_duplicates_are_classified_once(self):
+        """A copy of an email still being classified is not submitted a second time"""
+        from src.classify_executor import ClassificationExecutor
+        with mock.patch.object(ClassificationExecutor, "submit", autospec=True,
+                               side_effect=ClassificationExecutor.submit) as submit:
+            complete = self.run_local(email_id="same-content")
+        self.assertEqual((submit.call_count, complete.call_count), (1, 1))
+
+    def test_failed_batch_window_falls_back_to_on_demand(self):
+        """A batch job failure completes the window on-demand; copies of one email are completed once"""
+        self.config["batch_inference"] = {"backend": "local", "work_dir": os.path.join(self.tmp.name, "batch")}
+        with mock.patch("src.batch_inference.classify_batch", side_effect=RuntimeError("job expired")):
+            complete = self.run_local("--batch", email_id="same-content")
+        self.assertEqual(complete.call_count, 1)
+        self.assertEqual(complete.call_args.args[3]["type"], ["update"])
+
+    def test_batch_windows_are_capped_by_text_size(self):
+        """A window is run once its cleaned text reaches max_window_mb and keeps only the subject"""
+        self.config["batch_inference"] = {"backend": "local", "work_dir": os.path.join(self.tmp.name, "batch"),
+                                          "max_window_mb": 1 / (1024 * 1024)}
+
+        def classify_batch(emails, config, runner):
+            return {email_id: {"type": ["update"], "text": "text"} for email_id in emails}
+
+        with mock.patch("src.batch_inference.classify_batch", side_effect=classify_batch) as batch, \
+                mock.patch("src.batch_inference.embed_batch",
+                           side_effect=lambda chunks, config, runner: {email_id: [] for email_id in chunks}), \
+                mock.patch.object(main.chunker, "chunk_text", return_value=[]):
+            complete = self.run_local("--batch")
+        self.assertEqual(batch.call_count, 2)
+        self.assertEqual(sorted(call.args[1]["Subject"] for call in complete.call_args_list), ["Update 0", "Update 1"])
+        self.assertTrue(all(isinstance(call.args[1], dict) for call in complete.call_args_list))
+
+if __name__ == '__main__':
+    unittest.main()
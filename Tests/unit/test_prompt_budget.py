@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from src.prompt_budget import PromptBudget, OMITTED, estimate_tokens, prompt_text
+
+CONFIG = {"product_classification": {"vendors": {"hashicorp": ["vault", "terraform"]}}}
+
+FILLER = "Our community keeps growing and we thank everyone for reading this newsletter. " * 20
+
+
+class TestPromptBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.budget = PromptBudget(CONFIG, budgets={"type": 200}, lead_paragraphs=2)
+
+    def test_short_text_unchanged(self):
+        data = {"subject": "Hello", "text": "Hello\nShort email about Vault."}
+        self.assertEqual(self.budget.email_text(data, "type"), data["text"])
+
+    def test_long_text_keeps_lead_and_signal_sentences(self):
+        """Subject, lead paragraphs and product/date sentences survive; filler is replaced by a marker"""
+        text = "\n\n".join([
+            "Monthly newsletter",
+            "Welcome to the monthly update.",
+            FILLER,
+            "Terraform 1.9 is now available. " + FILLER,
+            FILLER + "The summit takes place on June 3, 2025.",
+        ])
+        data = {"subject": "Quarterly digest", "text": text}
+        result = self.budget.email_text(data, "type")
+
+        self.assertLessEqual(estimate_tokens(result), 200)
+        self.assertTrue(result.startswith("Quarterly digest\nMonthly newsletter\nWelcome to the monthly update."))
+        self.assertIn("Terraform 1.9 is now available.", result)
+        self.assertIn("The summit takes place on June 3, 2025.", result)
+        self.assertIn(OMITTED, result)
+        self.assertNotIn("thank everyone", result)
+
+        prompts, trimmed, original_tokens, sent_tokens = self.budget.stats.tasks["type"]
+        self.assertEqual((prompts, trimmed), (1, 1))
+        self.assertGreater(original_tokens, sent_tokens)
+
+    def test_disabled_budget_keeps_legacy_text(self):
+        data = {"text": "x" * 3000}
+        self.assertEqual(prompt_text(data, CONFIG, "type"), data["text"])
+        self.assertEqual(len(prompt_text(data, CONFIG, "dates", max_chars=2000)), 2000)
+
+if __name__ == '__main__':
+    unittest.main()
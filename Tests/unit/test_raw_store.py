@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import shutil
+import tempfile
+import unittest
+from src.raw_store import RawEmailStore, content_hash
+
+class TestRawEmailStore(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data = b"Subject: Vault 1.19 released\r\n\r\nBody\r\n"
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_put_uses_sharded_content_hash_path(self):
+        """Raw emails are stored under their SHA-256 in a sharded layout"""
+        store = RawEmailStore(self.root)
+        email_id, path, created = store.put(self.data)
+
+        digest = content_hash(self.data)
+        self.assertEqual(email_id, digest)
+        self.assertEqual(path, os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.eml"))
+        self.assertTrue(created)
+        self.assertEqual(store.get(email_id), self.data)
+
+    def test_identical_content_is_stored_once(self):
+        """Re-ingesting the same bytes is a no-op"""
+        store = RawEmailStore(self.root)
+        first = store.put(self.data)
+        second = store.put(self.data)
+
+        self.assertEqual(first[:2], second[:2])
+        self.assertFalse(second[2])
+        with open(store.index_path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_processed_marks_survive_reload(self):
+        """Processed state is persisted in the index and can be cleared"""
+        store = RawEmailStore(self.root)
+        email_id, _, _ = store.put(self.data)
+        store.mark_processed(email_id)
+
+        reloaded = RawEmailStore(self.root)
+        self.assertIn(email_id, reloaded)
+        self.assertTrue(reloaded.is_processed(email_id))
+
+        reloaded.clear_processed()
+        self.assertFalse(RawEmailStore(self.root).is_processed(email_id))
+
+    def test_put_async_writes_in_background(self):
+        """put_async returns the id up front; reads and processed marks wait for the write"""
+        store = RawEmailStore(self.root)
+        email_id, path = store.put_async(self.data)
+
+        self.assertEqual(email_id, content_hash(self.data))
+        self.assertEqual(path, store.path_for(email_id))
+        self.assertEqual(store.get(email_id), self.data)
+        store.mark_processed(email_id)
+        store.flush()
+
+        reloaded = RawEmailStore(self.root)
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(reloaded.is_processed(email_id))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import time
+import unittest
+from src.text_cleanup import clean_body, clean_document
+
+class TestTextCleanup(unittest.TestCase):
+
+    def test_cuts_at_reply_header(self):
+        """Everything from a wrapped "On ... wrote:" header down is dropped"""
+        body = "Thanks, see below.\n\nOn Tue, Jun 3, 2025 at 10:00 AM Jane Doe\n<jane@example.com> wrote:\n> Earlier text"
+        self.assertEqual(clean_body(body), "Thanks, see below.")
+
+    def test_cuts_at_outlook_headers_and_forwards(self):
+        """Outlook reply headers and forwarded blocks end the body"""
+        self.assertEqual(clean_body("Top\nFrom: Vendor\nSent: Monday\nOld"), "Top")
+        self.assertEqual(clean_body("Top\n---------- Forwarded message ---------\nFrom: x"), "Top")
+        self.assertEqual(clean_body("Top\n__ Forwarded message __\nFrom: x"), "Top")
+
+    def test_drops_quoted_lines(self):
+        """Inline quoted lines are removed, the reply text stays"""
+        self.assertEqual(clean_body("> quoted\nMy answer\n> more quoted"), "My answer")
+
+    def test_boilerplate_cut_mid_line(self):
+        """Footers are cut where the marker starts"""
+        self.assertEqual(clean_body("Release notes. © 2025 HashiCorp\nUnsubscribe"), "Release notes.")
+
+    def test_signature_only_applies_to_body(self):
+        """Attachment text keeps content after a '--' line"""
+        cleaned = clean_document("Subject", "Body\n--\nJohn", ["Table\n--\nRow 2 [cid:x@y]"])
+        self.assertEqual(cleaned, "Subject\nBody\nTable\n--\nRow 2")
+
+    def test_max_chars_guard(self):
+        """Oversized input is truncated before scanning"""
+        self.assertEqual(clean_body("abcdefghij", max_chars=4), "abcd")
+
+    def test_pathological_input_is_linear(self):
+        """Many "On ..." lines without "wrote:" and long dash lines do not blow up"""
+        body = ("On " + "x" * 500 + "\n" + "-" * 2000 + "x\n") * 2000
+        start = time.monotonic()
+        clean_body(body, max_chars=0)
+        self.assertLess(time.monotonic() - start, 2)
+
+if __name__ == '__main__':
+    unittest.main()
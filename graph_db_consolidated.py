@@ -7,6 +7,7 @@ import os
 import yaml
 import re
 from src import llm_utils
+from src.mentions import MentionIndex, get_vendor_product_matcher
 from py2neo import Graph, Node, Relationship
 
 # Configure logging
@@ -17,6 +18,11 @@ CONFIDENCE_HIGH = "high"
 CONFIDENCE_MEDIUM = "medium"
 CONFIDENCE_LOW = "low"
 
+# Words linking a vendor and a product mention on one line
+RELEASE_VERB_RE = re.compile(r"announces|releases|offers|launches")
+OFFERED_BY_RE = re.compile(r"by|from|offered by")
+POSSESSIVE_RE = re.compile(r"'s")
+
 def connect_to_graph():
     """Connect to Neo4j database"""
     try:
@@ -73,18 +79,21 @@ def load_vendor_products():
         logging.error(f"Error loading config: {e}")
         return {}
 
+_config_matcher = None
+
+def get_config_matcher():
+    """Vendor/product matcher for product_classification.vendors, built once"""
+    global _config_matcher
+    if _config_matcher is None:
+        _config_matcher = get_vendor_product_matcher({"product_classification": {"vendors": load_vendor_products()}})
+    return _config_matcher
+
 def validate_vendor_product(vendor, product):
     """Validate if a vendor-product relationship is known in the config or through common patterns"""
-    # First check config-based mappings
-    vendor_products = load_vendor_products()
-    
-    # Case-insensitive vendor matching from config
-    for known_vendor, products in vendor_products.items():
-        if vendor.lower() in known_vendor.lower() or known_vendor.lower() in vendor.lower():
-            # Case-insensitive product matching
-            for known_product in products:
-                if product.lower() == known_product.lower():
-                    return CONFIDENCE_HIGH
+    # First check config-based mappings: vendors listing this exact product (case-insensitive)
+    for known_vendor in get_config_matcher().vendors_for_product(product):
+        if vendor.lower() in known_vendor or known_vendor in vendor.lower():
+            return CONFIDENCE_HIGH
     
     # If not found in config, check for well-known vendor-product associations
     known_associations = {
@@ -118,28 +127,41 @@ def validate_vendor_product(vendor, product):
         
     return CONFIDENCE_LOW
 
-def analyze_text_for_relationships(text, vendor, product):
-    """Analyze text to determine confidence in vendor-product relationship"""
-    text_lower = text.lower()
-    vendor_lower = vendor.lower()
-    product_lower = product.lower()
-    
-    # Look for strong relationship indicators
-    strong_patterns = [
-        rf"{vendor_lower}.*?(?:announces|releases|offers|launches).*?{product_lower}",
-        rf"{product_lower}.*?(?:by|from|offered by).*?{vendor_lower}",
-        rf"{vendor_lower}'s.*?{product_lower}"
-    ]
-    
-    for pattern in strong_patterns:
-        if re.search(pattern, text_lower):
-            return CONFIDENCE_MEDIUM
+def analyze_text_for_relationships(text, vendor, product, mentions=None):
+    """
+    Analyze text to determine confidence in vendor-product relationship.
+
+    mentions is a MentionIndex of the text covering vendor and product; pass
+    one built for all of an email's products to scan the text only once.
+    """
+    if mentions is None:
+        mentions = MentionIndex(text, [vendor, product])
+    vendor_hits = mentions.find(vendor)
+    product_hits = mentions.find(product)
+    if not vendor_hits or not product_hits:
+        return None  # No relationship found in text
+
+    # Look for strong relationship indicators on the same line:
+    # "<vendor> announces/releases/offers/launches <product>",
+    # "<product> by/from/offered by <vendor>" and "<vendor>'s <product>"
+    def linked(first_hits, second_hits, connector_re, anchored=False):
+        connector = connector_re.match if anchored else connector_re.search
+        for first in first_hits:
+            for second in second_hits:
+                if second.start < first.end or mentions.line_of(first.start) != mentions.line_of(second.start):
+                    continue
+                if connector(mentions.text, first.end, second.start):
+                    return True
+        return False
+
+    if (linked(vendor_hits, product_hits, RELEASE_VERB_RE) or linked(product_hits, vendor_hits, OFFERED_BY_RE)
+            or linked(vendor_hits, product_hits, POSSESSIVE_RE, anchored=True)):
+        return CONFIDENCE_MEDIUM
     
     # Check if they appear in the same sentence
-    sentences = re.split(r'[.!?]', text_lower)
-    for sentence in sentences:
-        if vendor_lower in sentence and product_lower in sentence:
-            return CONFIDENCE_LOW
+    vendor_sentences = {mentions.sentence_of(hit.start) for hit in vendor_hits}
+    if any(mentions.sentence_of(hit.start) in vendor_sentences for hit in product_hits):
+        return CONFIDENCE_LOW
     
     return None  # No relationship found in text
 
@@ -178,6 +200,9 @@ def add_email_to_graph(graph, email_id, metadata, email_text=None):
             # Fallback
             products = [str(product_str)]
         
+        # One scan of the email text finds the vendor and every product
+        mentions = MentionIndex(email_text, [vendor] + products) if email_text else None
+
         for product in products:
             if product:
                 # Create product node
@@ -189,7 +214,7 @@ def add_email_to_graph(graph, email_id, metadata, email_text=None):
                 
                 # If we have email text, analyze it for additional confidence
                 if email_text and confidence != CONFIDENCE_HIGH:
-                    text_confidence = analyze_text_for_relationships(email_text, vendor, product)
+                    text_confidence = analyze_text_for_relationships(email_text, vendor, product, mentions)
                     if text_confidence:
                         # Use the higher confidence level
                         confidence = text_confidence if text_confidence == CONFIDENCE_MEDIUM else confidence
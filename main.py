@@ -4,10 +4,12 @@ Enhanced main script for VendorUpdater_Bot that uses the new enhanced functions
 
 import os
 import sys
+import shutil
 import logging
 import argparse
 import time
 import json
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -53,6 +55,10 @@ def parse_args():
     parser.add_argument("--reset-db", action="store_true", help="Reset databases before starting")
     parser.add_argument("--emptydatafolders", action="store_true", help="Delete all files in data folders before running")
     parser.add_argument("--noevaluation", action="store_true", help="Skip evaluation step")
+    parser.add_argument("--watch", action="store_true", help="Keep running and ingest new emails as they arrive (IMAP IDLE)")
+    parser.add_argument("--backfill", type=str, help="Bulk import an mbox file, Maildir or tree of .eml files")
+    parser.add_argument("--batch", action="store_true", help="Classify and embed through batch inference jobs (for backfills; always uses combined classification)")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for --backfill (default: CPU count)")
     return parser.parse_args()
 
 def setup_logging(debug_mode=False):
@@ -118,6 +124,14 @@ def clean_data_folders():
                 if os.path.isfile(file_path):
                     os.remove(file_path)
                     logging.info(f"Removed file: {file_path}")
+                elif os.path.isdir(file_path):
+                    # Content-addressed shard directories
+                    shutil.rmtree(file_path)
+                    logging.info(f"Removed directory: {file_path}")
+
+        if os.path.exists("data/archive"):
+            shutil.rmtree("data/archive")
+            logging.info("Removed segment archive: data/archive")
 
         if not os.path.exists("data/eval"):
             os.makedirs("data/eval")
@@ -153,6 +167,13 @@ def reset_databases():
     except Exception as e:
         logging.error(f"Failed to reset Neo4j database: {e}")
 
+    # Stored raw emails must be processed again to repopulate the databases
+    try:
+        from src.raw_store import RawEmailStore
+        RawEmailStore().clear_processed()
+    except Exception as e:
+        logging.error(f"Failed to clear processed marks in raw email store: {e}")
+
 def log_metrics(metrics_dict):
     """Log metrics to file"""
     try:
@@ -170,14 +191,255 @@ def log_metrics(metrics_dict):
     except Exception as e:
         logging.error(f"Failed to log metrics: {e}")
 
+def prepare_email(eid, email_obj, config, harvester=None):
+    """
+    Steps 1-3 (save, normalize, enrich). Returns what classification and
+    the later steps need, or None if the email was skipped or stopped.
+    """
+    # Import human debugging
+    from src.human_debug import wait_for_user_input
+    human_debug_enabled = config.get("debug", {}).get("human_in_the_middle", False)
+    
+    # Step 1: Save raw email (content-addressed, so re-ingested copies share one id).
+    # The write happens in the background; later steps use the in-memory message.
+    from src.harvest import get_raw_store
+    from src.raw_store import raw_bytes
+    raw_store = get_raw_store(config)
+    email_id, raw_path = raw_store.put_async(raw_bytes(email_obj))
+    if raw_store.is_processed(email_id):
+        logging.info(f"Email {email_id} was already processed, skipping")
+        if harvester:
+            harvester.commit(eid)
+        return None
+    logging.info(f"Processing email {email_id}")
+    
+    if human_debug_enabled:
+        if not wait_for_user_input("1_save_raw_email", {"email_obj": "Email object"}, {"email_id": email_id, "raw_path": raw_path}, email_id):
+            return None
+    
+    # Step 2: Normalize email
+    # The sender's vendor selects the learned boilerplate to strip
+    sender_vendor = enrich.infer_vendor(str(email_obj.get("from", "")), email_obj, config)
+    clean_text = normalize.clean_message(email_obj, config, do_medium_clean=True, email_id=email_id, vendor=sender_vendor)
+    logging.info(f"Normalized email {email_id}")
+    
+    if human_debug_enabled:
+        if not wait_for_user_input("2_normalize_email", {"raw_path": raw_path}, {"clean_text": clean_text[:500] + "..." if len(clean_text) > 500 else clean_text}, email_id):
+            return None
+    
+    # Step 3: Enrich with metadata
+    enriched_data = enrich.extract_metadata(clean_text, email_obj, config)
+    logging.info(f"Enriched email {email_id} with metadata")
+    
+    if human_debug_enabled:
+        if not wait_for_user_input("3_extract_metadata", {"clean_text": clean_text[:200] + "..."}, enriched_data, email_id):
+            return None
+
+    return {"email_id": email_id, "raw_path": raw_path, "clean_text": clean_text, "enriched_data": enriched_data}
+
+def complete_email(eid, email_obj, prepared, classified_data, config, collection, graph, tracker, harvester=None,
+                   chunks=None, embeddings=None):
+    """
+    Steps 4-10 for an email whose classification (step 4) is done: chunk,
+    embed, index, graph, then commit it to the harvester. Chunks and
+    embeddings already produced by a batch job can be passed in.
+
+    Returns True if the email was fully processed, False if it was stopped.
+    """
+    from src.human_debug import wait_for_user_input
+    human_debug_enabled = config.get("debug", {}).get("human_in_the_middle", False)
+    from src.harvest import get_raw_store
+    raw_store = get_raw_store(config)
+    email_id = prepared["email_id"]
+    clean_text = prepared["clean_text"]
+    enriched_data = prepared["enriched_data"]
+
+    # Step 4: Classify content (done by the caller, possibly concurrently with other emails)
+    logging.info(f"Classified email {email_id} as {classified_data.get('type', 'unknown')}")
+    
+    # Track processed email for notifications
+    tracker.add_processed_email(email_obj, classified_data)
+    
+    if human_debug_enabled:
+        if not wait_for_user_input("4_classify_content", enriched_data, classified_data, email_id):
+            return False
+    
+    # Step 5: Chunk text
+    if chunks is None:
+        chunks = chunker.chunk_text(classified_data["text"], config)
+    logging.info(f"Split email {email_id} into {len(chunks)} chunks")
+    
+    if human_debug_enabled:
+        chunk_summary = {"chunk_count": len(chunks), "chunks": [{"id": c["id"], "text": c["text"][:100] + "..."} for c in chunks[:3]]}
+        if not wait_for_user_input("5_chunk_text", {"text_length": len(classified_data["text"])}, chunk_summary, email_id):
+            return False
+    
+    # Step 6: Generate embeddings
+    if embeddings is None:
+        embeddings = embedder.embed_chunks(chunks, config)
+    logging.info(f"Generated embeddings for email {email_id}")
+    
+    if human_debug_enabled:
+        embedding_summary = {"embedding_count": len(embeddings), "embedding_dimensions": len(embeddings[0]) if embeddings else 0}
+        if not wait_for_user_input("6_generate_embeddings", {"chunk_count": len(chunks)}, embedding_summary, email_id):
+            return False
+
+    # Prepare metadata for indexing
+    metadatas = [
+        {
+            "vendor": ensure_primitive(classified_data.get("vendor", "unknown")),
+            "product": ensure_primitive(classified_data.get("product", "unknown")),
+            "type": ensure_primitive(classified_data.get("type", "unknown")),
+            "date": ensure_primitive(classified_data.get("date", "1970-01-01")),
+            "chunk_index": chunk["position"],
+            "email_id": email_id 
+        }
+        for chunk in chunks
+    ]
+
+    # Step 7: Index in local storage
+    indexer.index(
+        chunks,
+        embeddings,
+        metadatas,
+        config
+    )
+    logging.info(f"Indexed email {email_id} in local storage")
+    
+    if human_debug_enabled:
+        index_summary = {"chunks_indexed": len(chunks), "metadata_sample": metadatas[0] if metadatas else {}}
+        if not wait_for_user_input("7_index_local", {"chunks": len(chunks), "embeddings": len(embeddings)}, index_summary, email_id):
+            return False
+
+    # Record in manifest
+    manifest.record_entry(email_id, chunks, classified_data, config)
+    logging.info(f"Recorded email {email_id} in manifest")
+
+    # Step 8: Run evaluation if enabled
+    if not args.noevaluation and config["debug"]["evaluation"]["enabled"]:
+        try:
+            evaluate.run_rag_test(email_id, chunks, config)
+            logging.info(f"Evaluated RAG performance for email {email_id}")
+        except Exception as eval_error:
+            logging.error(f"Evaluation failed for email {email_id}: {str(eval_error)}")
+
+    # Merge embeddings into chunks
+    for i, chunk in enumerate(chunks):
+        chunk["embedding"] = embeddings[i]
+
+        # Always ensure metadata is set
+        if "metadata" not in chunk:
+            chunk["metadata"] = {
+                "vendor": ensure_primitive(classified_data.get("vendor", "unknown")),
+                "product": ensure_primitive(classified_data.get("product", "unknown")),
+                "type": ensure_primitive(classified_data.get("type", "unknown")),
+                "date": ensure_primitive(classified_data.get("date", "1970-01-01"))
+            }
+
+    # Filter valid chunks
+    valid_chunks = [
+        c for c in chunks
+        if c.get("embedding") and isinstance(c.get("metadata"), dict)
+    ]
+
+    # Step 9: Index into ChromaDB
+    if valid_chunks:
+        collection.add(
+            documents=[c["text"] for c in valid_chunks],
+            metadatas=[c["metadata"] for c in valid_chunks],
+            ids=[c["chunk_id"] for c in valid_chunks],
+            embeddings=[c["embedding"] for c in valid_chunks]
+        )
+        logging.info(f"✅ Embedded and stored {len(valid_chunks)} chunks for email ID {email_id}")
+        for i, chunk in enumerate(valid_chunks):
+            try:
+                json.dumps(chunk["metadata"])
+            except Exception as e:
+                logging.error(f"Invalid metadata in chunk {i}: {chunk['metadata']}, error: {str(e)}")
+    else:
+        logging.warning(f"⚠️ No valid chunks for email ID {email_id}")
+    
+    # Step 10: Store in Neo4j with enhanced validation
+    if graph:
+        if add_email_to_graph(graph, email_id, classified_data, clean_text):
+            logging.info(f"✅ Added email {email_id} to Neo4j graph database with enhanced validation")
+            
+            if human_debug_enabled:
+                graph_summary = {"email_id": email_id, "vendor": classified_data.get("vendor"), "products": classified_data.get("product")}
+                if not wait_for_user_input("8_store_neo4j", classified_data, graph_summary, email_id):
+                    return False
+        else:
+            logging.warning(f"⚠️ Failed to add email {email_id} to Neo4j")
+    
+    # Commit email: queue read flag and advance sync checkpoint (flushed in batches)
+    raw_store.mark_processed(email_id)
+    if harvester:
+        harvester.commit(eid)
+
+    doc_count = collection.count()
+    logging.info(f"ChromaDB now contains {doc_count} total documents.")
+    logging.info(f"Completed processing email {email_id}")
+    return True
+
+def run_housekeeping(config, concurrency):
+    """
+    Persist what must survive the process (background raw email writes,
+    learned boilerplate) and log the run summaries. Runs at the end of a run
+    and, in watch mode, after every batch of new mail.
+    """
+    from src.classify_executor import get_request_gate
+    gate = get_request_gate(config)
+    logging.info(f"Classification ran with concurrency {concurrency}; Bedrock throttled {gate.throttles} "
+                 f"requests, {gate.transient_errors} more were retried after transient errors")
+    from src.fast_classifier import get_fast_classifier
+    fast_path = get_fast_classifier(config)
+    if fast_path is not None:
+        fast_path.stats.log_summary()
+    from src.prompt_budget import get_prompt_budget
+    prompt_budget = get_prompt_budget(config)
+    if prompt_budget is not None:
+        prompt_budget.stats.log_summary()
+
+    # Wait for background raw email writes (duplicates skipped early are never marked processed)
+    from src.raw_store import get_raw_store
+    get_raw_store(config).flush()
+
+    # Persist what the boilerplate learner saw this run and log what stripping saved
+    from src.boilerplate import get_boilerplate_index
+    boilerplate = get_boilerplate_index(config)
+    if boilerplate is not None:
+        boilerplate.save()
+        report = boilerplate.report()
+        logging.info(f"Boilerplate stripping saved ~{sum(r['tokens_saved'] for r in report)} tokens "
+                     f"and {sum(r['chunks_saved'] for r in report)} chunks so far (python -m src.boilerplate for details)")
+
+    # Log what language detection cost this run
+    from src.language import get_language_detector
+    detection = get_language_detector(config).summary()
+    if detection["calls"]:
+        logging.info(f"Language detection ({detection['backend']}): {detection['calls']} emails, "
+                     f"{detection['total_seconds']:.2f}s total, {detection['average_ms']:.1f} ms average")
+
+    # Log how many classification calls the LLM response cache answered
+    from src.llm_cache import get_llm_cache
+    llm_cache = get_llm_cache(config)
+    if llm_cache is not None:
+        stats = llm_cache.stats()
+        logging.info(f"LLM response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+
+    # Log Bedrock client creation and request latency
+    from src import bedrock
+    bedrock.log_summary()
+
 def run_pipeline():
-    """Main pipeline function that processes emails sequentially"""
+    """Main pipeline function: emails are processed in arrival order, with classification calls overlapping"""
     start_time = time.time()
     emails_processed = 0
     
     # Initialize notification tracker
     tracker = PipelineTracker()
     tracker.start_run()
+    harvester = None
     
     try:
         config = load_config()
@@ -204,181 +466,152 @@ def run_pipeline():
         else:
             logging.warning("Failed to connect to Neo4j, graph database features will be disabled")
 
+        # Classification of several emails runs concurrently while later emails are
+        # normalized; each email is finished (embed, index, graph) once its result is in.
+        # Watch mode and human-in-the-middle debugging finish every email right away.
+        from src.classify_executor import ClassificationExecutor
+        classifier = ClassificationExecutor(config)
+        sequential = args.watch or config.get("debug", {}).get("human_in_the_middle", False)
+        max_in_flight = 0 if sequential else classifier.max_in_flight
+        in_flight = deque()  # (eid, email_obj, prepared, future, eids of duplicate copies)
+        in_flight_ids = {}  # email id -> its in_flight entry
+
+        def finish_email(eid, email_obj, prepared, future, duplicate_eids):
+            nonlocal emails_processed
+            in_flight_ids.pop(prepared["email_id"], None)
+            try:
+                if complete_email(eid, email_obj, prepared, future.result(), config, collection, graph, tracker, harvester):
+                    emails_processed += 1
+                    logging.info(f"{emails_processed} emails processed so far")
+                    if harvester:
+                        for duplicate_eid in duplicate_eids:
+                            harvester.commit(duplicate_eid)
+            except Exception as e:
+                logging.error(f"Error processing email: {str(e)}")
+
+        # Batch mode collects a window of prepared emails, classifies and embeds it
+        # with batch inference jobs, then finishes the window in arrival order
+        batch_runner = None
+        emails_per_window = max_window_chars = None
+        if args.batch:
+            if sequential:
+                raise ValueError("--batch does not support --watch or human-in-the-middle debugging")
+            from src import batch_inference
+            batch_runner = batch_inference.get_batch_runner(config)
+            batch_settings = config.get("batch_inference", {})
+            emails_per_window = batch_settings.get("emails_per_window", batch_inference.DEFAULT_EMAILS_PER_WINDOW)
+            max_window_chars = batch_settings.get("max_window_mb", batch_inference.DEFAULT_MAX_WINDOW_MB) * 1024 * 1024
+        # Windows hold thousands of emails, so they keep the prepared text and the subject
+        # (for the run tracker), not the messages with their raw bytes and attachments
+        window = {}  # email id -> (eid, headers, prepared, eids of duplicate copies)
+        window_chars = 0
+
+        def finish_window():
+            nonlocal emails_processed, window_chars
+            try:
+                emails = {email_id: prepared["enriched_data"] for email_id, (_, _, prepared, _) in window.items()}
+                classified = batch_inference.classify_batch(emails, config, batch_runner)
+                chunks = {email_id: chunker.chunk_text(classified_data["text"], config)
+                          for email_id, classified_data in classified.items()}
+                embeddings = batch_inference.embed_batch(chunks, config, batch_runner)
+            except Exception as e:
+                # A failed job or S3 error costs the window its batch run, not its emails
+                logging.error(f"Batch inference failed for {len(window)} emails, processing them on-demand: {str(e)}")
+                classified = chunks = embeddings = None
+            for email_id, (eid, headers, prepared, duplicate_eids) in window.items():
+                try:
+                    if classified is None:
+                        done = complete_email(eid, headers, prepared,
+                                              classify.label_content(prepared["enriched_data"], config),
+                                              config, collection, graph, tracker, harvester)
+                    else:
+                        done = complete_email(eid, headers, prepared, classified[email_id], config, collection,
+                                              graph, tracker, harvester, chunks[email_id], embeddings[email_id])
+                    if done:
+                        emails_processed += 1
+                        logging.info(f"{emails_processed} emails processed so far")
+                        if harvester:
+                            for duplicate_eid in duplicate_eids:
+                                harvester.commit(duplicate_eid)
+                except Exception as e:
+                    logging.error(f"Error processing email: {str(e)}")
+            window.clear()
+            window_chars = 0
+
+        def handle_email(eid, email_obj):
+            nonlocal window_chars
+            try:
+                prepared = prepare_email(eid, email_obj, config, harvester)
+                if prepared is not None:
+                    if args.batch:
+                        # Copies of an email already in the window are committed along with it
+                        if prepared["email_id"] in window:
+                            window[prepared["email_id"]][3].append(eid)
+                        else:
+                            headers = {"Subject": str(email_obj.get("Subject", "N/A"))}
+                            window[prepared["email_id"]] = (eid, headers, prepared, [])
+                            window_chars += len(prepared["clean_text"])
+                    elif prepared["email_id"] in in_flight_ids:
+                        # Same content as an email still being classified: committed along with it
+                        in_flight_ids[prepared["email_id"]][4].append(eid)
+                    else:
+                        entry = (eid, email_obj, prepared, classifier.submit(prepared["enriched_data"]), [])
+                        in_flight.append(entry)
+                        in_flight_ids[prepared["email_id"]] = entry
+            except Exception as e:
+                logging.error(f"Error processing email: {str(e)}")
+            while len(in_flight) > max_in_flight:
+                finish_email(*in_flight.popleft())
+            if args.batch and (len(window) >= emails_per_window or window_chars >= max_window_chars):
+                finish_window()
+
         # Harvest emails
-        if args.local:
+        if args.backfill:
+            from src.local_loader import iter_backfill_emails
+            backfill_config = config.get("backfill", {})
+            emails = iter_backfill_emails(
+                args.backfill,
+                workers=args.workers or backfill_config.get("workers"),
+                max_pending=backfill_config.get("max_pending", 64)
+            )
+            logging.info(f"Backfilling emails from {args.backfill}")
+        elif args.local:
             if not args.folder:
                 raise ValueError("--folder is required when using --local mode")
+            if args.watch:
+                raise ValueError("--watch is only supported in IMAP mode")
             from src.local_loader import load_local_emails
             emails = load_local_emails(args.folder)
             logging.info(f"Fetched {len(emails)} new emails from local files")
         else:
-            from src.harvest import fetch_unread_emails
-            emails = fetch_unread_emails(config)
-            logging.info(f"Fetched {len(emails)} new emails from server")
+            from src.harvest import IMAPHarvester
+            harvester = IMAPHarvester(config)
+            if args.watch:
+                # Push mode: IMAP IDLE (or NOOP polling) feeds new mail straight into the pipeline
+                # Housekeeping runs after every batch of new mail, since a watch never reaches the end of run
+                harvester.watch(handle_email, after_batch=lambda: run_housekeeping(config, classifier.concurrency))
+                emails = []
+            else:
+                # Stream emails in bounded batches so processing starts while later ones download
+                emails = harvester.iter_new_emails()
+                logging.info("Streaming new emails from server")
 
-        # Process each email sequentially
+        # Process each email; classification overlaps across emails
         for eid, email_obj in emails:
-            try:
-                # Import human debugging
-                from src.human_debug import wait_for_user_input
-                human_debug_enabled = config.get("debug", {}).get("human_in_the_middle", False)
-                
-                # Step 1: Save raw email
-                from src.harvest import save_raw_email
-                email_id, raw_path = save_raw_email(email_obj, config)
-                logging.info(f"Processing email {email_id}")
-                
-                if human_debug_enabled:
-                    if not wait_for_user_input("1_save_raw_email", {"email_obj": "Email object"}, {"email_id": email_id, "raw_path": raw_path}, email_id):
-                        continue
-                
-                # Step 2: Normalize email
-                clean_text = normalize.clean_email(raw_path, config, do_medium_clean=True)
-                logging.info(f"Normalized email {email_id}")
-                
-                if human_debug_enabled:
-                    if not wait_for_user_input("2_normalize_email", {"raw_path": raw_path}, {"clean_text": clean_text[:500] + "..." if len(clean_text) > 500 else clean_text}, email_id):
-                        continue
-                
-                # Step 3: Enrich with metadata
-                enriched_data = enrich.extract_metadata(clean_text, email_obj, config)
-                logging.info(f"Enriched email {email_id} with metadata")
-                
-                if human_debug_enabled:
-                    if not wait_for_user_input("3_extract_metadata", {"clean_text": clean_text[:200] + "..."}, enriched_data, email_id):
-                        continue
-                
-                # Step 4: Classify content
-                classified_data = classify.label_content(enriched_data, config)
-                logging.info(f"Classified email {email_id} as {classified_data.get('type', 'unknown')}")
-                
-                # Track processed email for notifications
-                tracker.add_processed_email(email_obj, classified_data)
-                
-                if human_debug_enabled:
-                    if not wait_for_user_input("4_classify_content", enriched_data, classified_data, email_id):
-                        continue
-                
-                # Step 5: Chunk text
-                chunks = chunker.chunk_text(classified_data["text"], config)
-                logging.info(f"Split email {email_id} into {len(chunks)} chunks")
-                
-                if human_debug_enabled:
-                    chunk_summary = {"chunk_count": len(chunks), "chunks": [{"id": c["id"], "text": c["text"][:100] + "..."} for c in chunks[:3]]}
-                    if not wait_for_user_input("5_chunk_text", {"text_length": len(classified_data["text"])}, chunk_summary, email_id):
-                        continue
-                
-                # Step 6: Generate embeddings
-                embeddings = embedder.embed_chunks(chunks, config)
-                logging.info(f"Generated embeddings for email {email_id}")
-                
-                if human_debug_enabled:
-                    embedding_summary = {"embedding_count": len(embeddings), "embedding_dimensions": len(embeddings[0]) if embeddings else 0}
-                    if not wait_for_user_input("6_generate_embeddings", {"chunk_count": len(chunks)}, embedding_summary, email_id):
-                        continue
-
-                # Prepare metadata for indexing
-                metadatas = [
-                    {
-                        "vendor": ensure_primitive(classified_data.get("vendor", "unknown")),
-                        "product": ensure_primitive(classified_data.get("product", "unknown")),
-                        "type": ensure_primitive(classified_data.get("type", "unknown")),
-                        "date": ensure_primitive(classified_data.get("date", "1970-01-01")),
-                        "chunk_index": chunk["position"],
-                        "email_id": email_id 
-                    }
-                    for chunk in chunks
-                ]
-
-                # Step 7: Index in local storage
-                indexer.index(
-                    chunks,
-                    embeddings,
-                    metadatas,
-                    config
-                )
-                logging.info(f"Indexed email {email_id} in local storage")
-                
-                if human_debug_enabled:
-                    index_summary = {"chunks_indexed": len(chunks), "metadata_sample": metadatas[0] if metadatas else {}}
-                    if not wait_for_user_input("7_index_local", {"chunks": len(chunks), "embeddings": len(embeddings)}, index_summary, email_id):
-                        continue
-
-                # Record in manifest
-                manifest.record_entry(email_id, chunks, classified_data, config)
-                logging.info(f"Recorded email {email_id} in manifest")
-
-                # Step 8: Run evaluation if enabled
-                if not args.noevaluation and config["debug"]["evaluation"]["enabled"]:
-                    try:
-                        evaluate.run_rag_test(email_id, chunks, config)
-                        logging.info(f"Evaluated RAG performance for email {email_id}")
-                    except Exception as eval_error:
-                        logging.error(f"Evaluation failed for email {email_id}: {str(eval_error)}")
-
-                # Merge embeddings into chunks
-                for i, chunk in enumerate(chunks):
-                    chunk["embedding"] = embeddings[i]
-
-                    # Always ensure metadata is set
-                    if "metadata" not in chunk:
-                        chunk["metadata"] = {
-                            "vendor": ensure_primitive(classified_data.get("vendor", "unknown")),
-                            "product": ensure_primitive(classified_data.get("product", "unknown")),
-                            "type": ensure_primitive(classified_data.get("type", "unknown")),
-                            "date": ensure_primitive(classified_data.get("date", "1970-01-01"))
-                        }
-
-                # Filter valid chunks
-                valid_chunks = [
-                    c for c in chunks
-                    if c.get("embedding") and isinstance(c.get("metadata"), dict)
-                ]
-
-                # Step 9: Index into ChromaDB
-                if valid_chunks:
-                    collection.add(
-                        documents=[c["text"] for c in valid_chunks],
-                        metadatas=[c["metadata"] for c in valid_chunks],
-                        ids=[c["chunk_id"] for c in valid_chunks],
-                        embeddings=[c["embedding"] for c in valid_chunks]
-                    )
-                    logging.info(f"✅ Embedded and stored {len(valid_chunks)} chunks for email ID {email_id}")
-                    for i, chunk in enumerate(valid_chunks):
-                        try:
-                            json.dumps(chunk["metadata"])
-                        except Exception as e:
-                            logging.error(f"Invalid metadata in chunk {i}: {chunk['metadata']}, error: {str(e)}")
-                else:
-                    logging.warning(f"⚠️ No valid chunks for email ID {email_id}")
-                
-                # Step 10: Store in Neo4j with enhanced validation
-                if graph:
-                    if add_email_to_graph(graph, email_id, classified_data, clean_text):
-                        logging.info(f"✅ Added email {email_id} to Neo4j graph database with enhanced validation")
-                        
-                        if human_debug_enabled:
-                            graph_summary = {"email_id": email_id, "vendor": classified_data.get("vendor"), "products": classified_data.get("product")}
-                            if not wait_for_user_input("8_store_neo4j", classified_data, graph_summary, email_id):
-                                continue
-                    else:
-                        logging.warning(f"⚠️ Failed to add email {email_id} to Neo4j")
-                
-                # Mark email as read if using IMAP
-                if not args.local:
-                    from src.harvest import mark_email_as_read
-                    mark_email_as_read(eid, config)
-                    
-                doc_count = collection.count()
-                logging.info(f"ChromaDB now contains {doc_count} total documents.")
-                
-                emails_processed += 1
-                logging.info(f"Completed processing email {email_id} ({emails_processed}/{len(emails)})")
-                
-            except Exception as e:
-                logging.error(f"Error processing email: {str(e)}")
-                continue
-        
+            handle_email(eid, email_obj)
+        while in_flight:
+            finish_email(*in_flight.popleft())
+        if window:
+            finish_window()
+        classifier.close()
+
+        # Commit remaining read flags and close the IMAP session
+        if harvester:
+            harvester.close()
+            harvester = None
+
+        run_housekeeping(config, classifier.concurrency)
+
         # Clean up incorrect relationships if requested
         if args.cleanup:
             logging.info("Cleaning up incorrect relationships")
@@ -464,6 +697,12 @@ def run_pipeline():
         })
         raise
     finally:
+        if harvester:
+            try:
+                harvester.close()
+            except Exception as e:
+                logging.error(f"Failed to close IMAP session: {e}")
+
         # Send notification email regardless of success/failure
         try:
             summary = tracker.get_summary()
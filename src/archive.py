@@ -0,0 +1,190 @@
+"""
+Append-only compressed segment archive.
+
+Records (raw emails, cleaned text) are zlib-compressed individually and
+appended to segment files of bounded size; a JSONL offset index maps each
+record id to (segment, offset, length) for random access. This replaces one
+small file per email with a handful of large files.
+"""
+
+import os
+import json
+import zlib
+import logging
+import threading
+
+DEFAULT_ARCHIVE_DIR = os.path.join("data", "archive")
+DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+INDEX_FILENAME = "index.jsonl"
+
+
+class SegmentArchive:
+    """Compressed, append-only record archive with an offset index"""
+
+    def __init__(self, root, segment_max_bytes=DEFAULT_SEGMENT_MAX_BYTES, compression_level=6):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self.compression_level = compression_level
+        self.index_path = os.path.join(root, INDEX_FILENAME)
+        self.index = {}
+        self.active_segment = 0
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn write from an interrupted append
+                    continue
+                self.index[entry["id"]] = entry
+                self.active_segment = max(self.active_segment, entry["segment"])
+
+    def _segment_path(self, segment):
+        return os.path.join(self.root, f"segment-{segment:06d}.z")
+
+    def __contains__(self, record_id):
+        return record_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def ids(self):
+        return list(self.index.keys())
+
+    def put(self, record_id, data: bytes, replace=False):
+        """
+        Append a record; returns False if the id is already archived. With
+        replace=True a new version is appended and supersedes the old one,
+        unless the bytes are unchanged (then nothing is written), so
+        reprocessing does not grow the segments.
+        """
+        checksum = zlib.crc32(data)
+        with self._lock:
+            if record_id in self.index and (not replace or self._unchanged(self.index[record_id], data, checksum)):
+                return False
+
+            os.makedirs(self.root, exist_ok=True)
+            segment_path = self._segment_path(self.active_segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.segment_max_bytes:
+                self.active_segment += 1
+                segment_path = self._segment_path(self.active_segment)
+
+            compressed = zlib.compress(data, self.compression_level)
+            with open(segment_path, "ab") as f:
+                offset = f.tell()
+                f.write(compressed)
+
+            entry = {
+                "id": record_id,
+                "segment": self.active_segment,
+                "offset": offset,
+                "length": len(compressed),
+                "size": len(data),
+                "crc32": checksum,
+            }
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.index[record_id] = entry
+            return True
+
+    def _unchanged(self, entry, data, checksum):
+        if entry["size"] != len(data):
+            return False
+        if "crc32" in entry:
+            return entry["crc32"] == checksum
+        # Entries written before checksums were recorded: compare the stored bytes
+        with open(self._segment_path(entry["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            return zlib.decompress(f.read(entry["length"])) == data
+
+    def get(self, record_id):
+        """Return the decompressed record bytes, or None if not archived"""
+        entry = self.index.get(record_id)
+        if entry is None:
+            return None
+        with open(self._segment_path(entry["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            return zlib.decompress(f.read(entry["length"]))
+
+    def stats(self):
+        """Record count, original bytes and stored bytes of live records"""
+        raw = sum(e["size"] for e in self.index.values())
+        stored = sum(e["length"] for e in self.index.values())
+        return {"records": len(self.index), "bytes": raw, "stored_bytes": stored}
+
+
+_archives = {}
+
+def archive_enabled(config):
+    return bool((config or {}).get("storage", {}).get("archive", {}).get("enabled", False))
+
+def get_archive(config, name):
+    """
+    Return the shared archive for a record kind ("raw" or "clean_text"),
+    or None when archiving is disabled in config
+    """
+    if not archive_enabled(config):
+        return None
+    archive_config = config["storage"]["archive"]
+    root = os.path.join(archive_config.get("directory", DEFAULT_ARCHIVE_DIR), name)
+    if root not in _archives:
+        _archives[root] = SegmentArchive(
+            root,
+            segment_max_bytes=archive_config.get("segment_max_bytes", DEFAULT_SEGMENT_MAX_BYTES),
+            compression_level=archive_config.get("compression_level", 6),
+        )
+    return _archives[root]
+
+
+def read_clean_text(email_id, config=None, clean_dir=os.path.join("data", "clean_text")):
+    """Cleaned text for an email id from the archive, falling back to data/clean_text/<id>.txt"""
+    archive = get_archive(config, "clean_text")
+    if archive is not None and email_id in archive:
+        return archive.get(email_id).decode("utf-8")
+    path = os.path.join(clean_dir, f"{email_id}.txt")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    return ""
+
+
+def pack_directory(directory, archive, suffix):
+    """
+    Move loose files (e.g. data/clean_text/*.txt) into an archive, keyed by
+    filename without the suffix. Files are removed once archived.
+    """
+    packed = 0
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if not filename.endswith(suffix):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, "rb") as f:
+                archive.put(filename[:-len(suffix)], f.read())
+            os.remove(path)
+            packed += 1
+    logging.info(f"Packed {packed} files from {directory} into {archive.root}")
+    return packed
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from src import llm_utils
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    config = llm_utils.load_config()
+    if not archive_enabled(config):
+        print("storage.archive.enabled is false in config; nothing to pack")
+        sys.exit(1)
+
+    # Migrate existing loose files into the archive
+    pack_directory(os.path.join("data", "raw_emails"), get_archive(config, "raw"), ".eml")
+    pack_directory(os.path.join("data", "clean_text"), get_archive(config, "clean_text"), ".txt")
+    for name in ("raw", "clean_text"):
+        print(name, get_archive(config, name).stats())
@@ -0,0 +1,232 @@
+"""
+Attachment text extraction in a bounded worker process pool.
+
+textract (and the pdftotext/tesseract tools behind it) runs in separate
+processes so one huge scanned PDF cannot stall the pipeline: every
+attachment has a byte limit and a time limit, attachments of one email are
+extracted concurrently, and each one gets its own temporary directory so
+attachments with the same filename cannot clobber each other.
+
+Extracted text is cached by the SHA-256 of the attachment bytes, so the
+same datasheet attached to many emails is only extracted once.
+"""
+
+import os
+import json
+import math
+import signal
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from src.archive import SegmentArchive
+from src.raw_store import content_hash
+
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+DEFAULT_MAX_TEXT_CHARS = 200000
+# Extra time the parent allows on top of the worker's own alarm before it kills the pool
+KILL_GRACE_SECONDS = 5
+DEFAULT_CACHE_DIR = os.path.join("data", "attachment_cache")
+# Bump when extraction changes so cached text from the old extractor is redone
+EXTRACTOR_VERSION = "textract-1"
+
+
+class AttachmentTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise AttachmentTimeout()
+
+
+def textract_file(path):
+    """Default extractor: textract on a file path (imported in the worker only)"""
+    import textract
+    return textract.process(path).decode('utf-8', errors='ignore')
+
+
+def _safe_filename(filename):
+    """Basename without path components, keeping the extension textract dispatches on"""
+    name = os.path.basename(filename.replace('\\', '/')).strip() or 'attachment'
+    return name.lstrip('.') or 'attachment'
+
+
+def _extract_in_worker(filename, data, extract_fn, timeout, tesseract_path):
+    """Runs in a pool process: write to a private temp dir and extract with an alarm"""
+    if tesseract_path:
+        os.environ['TESSERACT_PATH'] = tesseract_path
+        os.environ['PATH'] = os.pathsep.join([tesseract_path, os.environ.get('PATH', '')])
+
+    # SIGALRM does not exist on Windows; the parent's hard timeout still applies there
+    use_alarm = timeout and hasattr(signal, 'SIGALRM')
+    with tempfile.TemporaryDirectory(prefix='attachment-') as tmp_dir:
+        path = os.path.join(tmp_dir, _safe_filename(filename))
+        with open(path, 'wb') as f:
+            f.write(data)
+        if use_alarm:
+            previous = signal.signal(signal.SIGALRM, _on_alarm)
+            signal.alarm(max(1, math.ceil(timeout)))
+        try:
+            return extract_fn(path)
+        finally:
+            if use_alarm:
+                signal.alarm(0)
+                signal.signal(signal.SIGALRM, previous)
+
+
+class AttachmentTextCache:
+    """
+    Persistent attachment text cache: SHA-256 of the attachment bytes ->
+    extracted text and extractor version, kept in a compressed segment archive
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, extractor_version=EXTRACTOR_VERSION):
+        self.archive = SegmentArchive(root)
+        self.extractor_version = extractor_version
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        """Cached text for a content hash, or None if missing or from another extractor version"""
+        record = self.archive.get(digest)
+        if record is not None:
+            entry = json.loads(record)
+            if entry.get("extractor_version") == self.extractor_version:
+                self.hits += 1
+                return entry["text"]
+        self.misses += 1
+        return None
+
+    def put(self, digest, text):
+        entry = {"extractor_version": self.extractor_version, "text": text}
+        self.archive.put(digest, json.dumps(entry).encode("utf-8"), replace=True)
+
+
+class AttachmentExtractor:
+    """Bounded process pool that extracts text from attachments with limits"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, timeout_seconds=DEFAULT_TIMEOUT_SECONDS,
+                 max_bytes=DEFAULT_MAX_BYTES, max_text_chars=DEFAULT_MAX_TEXT_CHARS,
+                 tesseract_path=None, extract_fn=textract_file, cache=None):
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.max_bytes = max_bytes
+        self.max_text_chars = max_text_chars
+        self.tesseract_path = tesseract_path
+        self.extract_fn = extract_fn
+        self.cache = cache
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _kill_pool(self):
+        """Terminate workers stuck past their deadline; a fresh pool is created on next use"""
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def extract_many(self, attachments):
+        """
+        Extract text from a list of (filename, bytes) concurrently. Returns a
+        list aligned with the input holding the text, or None for attachments
+        that were too large, timed out or failed.
+        """
+        results = [None] * len(attachments)
+        # Identical attachments (within the email or cached from earlier ones) are extracted once
+        pending = {}
+        for i, (filename, data) in enumerate(attachments):
+            if not data:
+                continue
+            if self.max_bytes and len(data) > self.max_bytes:
+                logging.warning(f'Skipping attachment {filename}: {len(data)} bytes exceeds limit of {self.max_bytes}')
+                continue
+            digest = content_hash(data)
+            if digest in pending:
+                pending[digest][0].append(i)
+                continue
+            text = self.cache.get(digest) if self.cache is not None else None
+            if text is not None:
+                results[i] = self._limit(text)
+                continue
+            pending[digest] = ([i], filename, data)
+
+        if not pending:
+            return results
+
+        pool = self._get_pool()
+        futures = {}
+        for digest, (indexes, filename, data) in pending.items():
+            future = pool.submit(_extract_in_worker, filename, data, self.extract_fn,
+                                 self.timeout_seconds, self.tesseract_path)
+            futures[future] = (digest, indexes, filename)
+
+        # Queued attachments only start once a worker frees up, so the deadline
+        # covers as many rounds of the time limit as the pool needs
+        deadline = None
+        if self.timeout_seconds:
+            rounds = math.ceil(len(futures) / max(1, self.workers or os.cpu_count() or 1))
+            deadline = rounds * self.timeout_seconds + KILL_GRACE_SECONDS
+        done, not_done = wait(futures, timeout=deadline)
+
+        for future in done:
+            digest, indexes, filename = futures[future]
+            try:
+                text = future.result()
+            except AttachmentTimeout:
+                logging.warning(f'Timed out extracting attachment {filename} after {self.timeout_seconds}s')
+                continue
+            except Exception as e:
+                logging.warning(f'Failed to extract attachment {filename}: {e}')
+                continue
+            text = text or ''
+            if self.cache is not None:
+                self.cache.put(digest, text)
+            for i in indexes:
+                results[i] = self._limit(text)
+
+        if not_done:
+            for future in not_done:
+                logging.warning(f'Killed extraction of attachment {futures[future][2]} after {deadline}s')
+            self._kill_pool()
+        return results
+
+    def _limit(self, text):
+        if self.max_text_chars and len(text) > self.max_text_chars:
+            return text[:self.max_text_chars]
+        return text
+
+    def extract(self, filename, data):
+        return self.extract_many([(filename, data)])[0]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+_extractors = {}
+
+def get_attachment_extractor(config):
+    """Return the shared attachment extractor for this config"""
+    config = config or {}
+    settings = config.get('attachments', {})
+    cache_dir = settings.get('cache_dir', DEFAULT_CACHE_DIR) if settings.get('cache', True) else None
+    key = (
+        settings.get('workers', DEFAULT_WORKERS),
+        settings.get('timeout_seconds', DEFAULT_TIMEOUT_SECONDS),
+        settings.get('max_bytes', DEFAULT_MAX_BYTES),
+        settings.get('max_text_chars', DEFAULT_MAX_TEXT_CHARS),
+        config.get('ocr', {}).get('tesseract_path'),
+    )
+    if (key, cache_dir) not in _extractors:
+        cache = AttachmentTextCache(cache_dir) if cache_dir else None
+        _extractors[(key, cache_dir)] = AttachmentExtractor(*key, cache=cache)
+    return _extractors[(key, cache_dir)]
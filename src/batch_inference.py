@@ -0,0 +1,324 @@
+"""
+Offline batch inference for backfills.
+
+For tens of thousands of emails, one synchronous invoke_model per email is
+the slowest and most throttled way to use Bedrock. With `--batch`, emails
+are normalized and enriched as usual, then classified and embedded a
+window at a time: the requests of a window are written to JSONL files
+({"recordId": ..., "modelInput": ...} per line), submitted as batch jobs,
+polled until they finish, and the outputs are merged back by record id
+(`<email id>#<part>`).
+
+Backends:
+  - bedrock: uploads the request file to S3 and runs a Bedrock model
+    invocation job (batch_inference.s3_uri, batch_inference.role_arn)
+  - local: a stand-in that "completes" jobs from fixture files, so the
+    whole flow runs without AWS
+
+Classification always uses the combined request (one record per email),
+whatever classification.mode says; per_field would triple the records.
+Emails the fast path settles and requests already in the LLM response
+cache never enter a job; records a job fails on are redone on-demand.
+"""
+
+import os
+import glob
+import json
+import time
+import logging
+
+from src import embedder
+from src.classify import (combined_request, fast_path_settles, fields_from_combined_reply, label_content,
+                          label_result, reply_text)
+from src.fast_classifier import get_fast_classifier
+from src.llm_cache import get_llm_cache
+
+DEFAULT_WORK_DIR = os.path.join("data", "batch")
+DEFAULT_EMAILS_PER_WINDOW = 5000
+# A window is also run once the cleaned text it holds reaches this size
+DEFAULT_MAX_WINDOW_MB = 256
+# Bedrock rejects jobs below its minimum record count; smaller windows run on-demand
+DEFAULT_MIN_RECORDS = 100
+DEFAULT_MAX_RECORDS_PER_JOB = 50000
+DEFAULT_POLL_SECONDS = 60
+DEFAULT_TIMEOUT_HOURS = 24
+
+RECORD_SEPARATOR = "#"
+COMPLETED_STATUSES = ("Completed", "PartiallyCompleted")
+FAILED_STATUSES = ("Failed", "Stopped", "Expired")
+
+
+def record_id(email_id, part):
+    return f"{email_id}{RECORD_SEPARATOR}{part}"
+
+
+def write_requests(path, requests):
+    """Write (record id, model input) pairs as a JSONL batch request file"""
+    with open(path, "w", encoding="utf-8") as f:
+        for rid, model_input in requests:
+            f.write(json.dumps({"recordId": rid, "modelInput": model_input}) + "\n")
+
+
+def read_outputs(path):
+    """recordId -> modelOutput of a batch output file; records that failed map to None"""
+    outputs = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "error" in record:
+                logging.warning(f"Batch record {record.get('recordId')} failed: {record['error']}")
+                outputs[record["recordId"]] = None
+            else:
+                outputs[record["recordId"]] = record.get("modelOutput")
+    return outputs
+
+
+class BedrockBatchBackend:
+    """Bedrock model invocation jobs with request and output files in S3"""
+
+    def __init__(self, config):
+        settings = config.get("batch_inference", {})
+        self.s3_uri = settings["s3_uri"].rstrip("/")
+        self.role_arn = settings["role_arn"]
+        self.timeout_hours = settings.get("timeout_hours", DEFAULT_TIMEOUT_HOURS)
+        self.region = config.get("bedrock", {}).get("region")
+        self._bedrock = None
+        self._s3 = None
+
+    def _clients(self):
+        if self._bedrock is None:
+            import boto3
+            self._bedrock = boto3.client("bedrock", region_name=self.region)
+            self._s3 = boto3.client("s3", region_name=self.region)
+        return self._bedrock, self._s3
+
+    def _split(self, key):
+        bucket, _, prefix = self.s3_uri[len("s3://"):].partition("/")
+        return bucket, f"{prefix}/{key}" if prefix else key
+
+    def submit(self, name, model_id, input_path):
+        bedrock, s3 = self._clients()
+        bucket, key = self._split(f"input/{os.path.basename(input_path)}")
+        s3.upload_file(input_path, bucket, key)
+        response = bedrock.create_model_invocation_job(
+            jobName=name,
+            roleArn=self.role_arn,
+            modelId=model_id,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{bucket}/{key}", "s3InputFormat": "JSONL"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"{self.s3_uri}/output/"}},
+            timeoutDurationInHours=self.timeout_hours,
+        )
+        return response["jobArn"]
+
+    def status(self, job_id):
+        """(status, message) of a job"""
+        bedrock, _ = self._clients()
+        response = bedrock.get_model_invocation_job(jobIdentifier=job_id)
+        return response["status"], response.get("message")
+
+    def fetch_output(self, job_id, input_path, output_path):
+        # Outputs land in <output prefix>/<job id>/<input file name>.out
+        _, s3 = self._clients()
+        bucket, key = self._split(f"output/{job_id.rsplit('/', 1)[-1]}/{os.path.basename(input_path)}.out")
+        s3.download_file(bucket, key, output_path)
+
+
+class LocalBatchBackend:
+    """
+    Stand-in that completes jobs from fixture files: every *.jsonl file in
+    fixtures_dir holds {"recordId", "modelOutput"} records. A record with
+    recordId "*" and a "modelId" answers every record of that model without
+    its own fixture; records with neither come back as errors.
+    """
+
+    def __init__(self, fixtures_dir, polls_until_complete=1):
+        self.fixtures_dir = fixtures_dir
+        self.polls_until_complete = polls_until_complete
+        self.jobs = {}  # job id -> [model id, remaining polls]
+
+    def _fixtures(self):
+        outputs, defaults = {}, {}
+        for path in sorted(glob.glob(os.path.join(self.fixtures_dir, "*.jsonl"))):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        if record["recordId"] == "*":
+                            defaults[record.get("modelId")] = record["modelOutput"]
+                        else:
+                            outputs[record["recordId"]] = record["modelOutput"]
+        return outputs, defaults
+
+    def submit(self, name, model_id, input_path):
+        self.jobs[name] = [model_id, self.polls_until_complete]
+        return name
+
+    def status(self, job_id):
+        job = self.jobs[job_id]
+        if job[1] > 0:
+            job[1] -= 1
+            return "InProgress", None
+        return "Completed", None
+
+    def fetch_output(self, job_id, input_path, output_path):
+        model_id = self.jobs[job_id][0]
+        outputs, defaults = self._fixtures()
+        with open(input_path, encoding="utf-8") as f, open(output_path, "w", encoding="utf-8") as out:
+            for line in f:
+                record = json.loads(line)
+                output = outputs.get(record["recordId"], defaults.get(model_id))
+                if output is None:
+                    record["error"] = {"errorMessage": "no fixture for record"}
+                else:
+                    record["modelOutput"] = output
+                out.write(json.dumps(record) + "\n")
+
+
+class BatchJobRunner:
+    """Writes request files, submits them as jobs, polls them and merges the outputs"""
+
+    def __init__(self, backend, work_dir=DEFAULT_WORK_DIR, min_records=DEFAULT_MIN_RECORDS,
+                 max_records_per_job=DEFAULT_MAX_RECORDS_PER_JOB, poll_seconds=DEFAULT_POLL_SECONDS,
+                 timeout_hours=DEFAULT_TIMEOUT_HOURS, sleep=time.sleep, clock=time.monotonic):
+        self.backend = backend
+        self.work_dir = work_dir
+        self.min_records = min_records
+        self.max_records_per_job = max_records_per_job
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_hours * 3600
+        self.sleep = sleep
+        self.clock = clock
+        self.jobs_submitted = 0
+
+    def run(self, name, model_id, requests):
+        """
+        recordId -> modelOutput for (record id, model input) requests, in jobs
+        of at most max_records_per_job. Records of failed jobs are missing.
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        jobs = []
+        for start in range(0, len(requests), self.max_records_per_job):
+            # Job names must be unique per account
+            job_name = f"{name}-{stamp}-{self.jobs_submitted}"
+            self.jobs_submitted += 1
+            input_path = os.path.join(self.work_dir, f"{job_name}.jsonl")
+            write_requests(input_path, requests[start:start + self.max_records_per_job])
+            jobs.append((self.backend.submit(job_name, model_id, input_path), input_path))
+            logging.info(f"Submitted batch job {job_name} with {min(self.max_records_per_job, len(requests) - start)} records")
+
+        outputs = {}
+        pending = list(jobs)
+        deadline = self.clock() + self.timeout_seconds
+        while pending:
+            for job in list(pending):
+                job_id, input_path = job
+                status, message = self.backend.status(job_id)
+                if status in COMPLETED_STATUSES:
+                    output_path = input_path + ".out"
+                    self.backend.fetch_output(job_id, input_path, output_path)
+                    outputs.update(read_outputs(output_path))
+                    pending.remove(job)
+                    logging.info(f"Batch job {job_id} {status.lower()}")
+                elif status in FAILED_STATUSES:
+                    pending.remove(job)
+                    logging.error(f"Batch job {job_id} {status.lower()}: {message}")
+            if pending:
+                if self.clock() > deadline:
+                    logging.error(f"Gave up waiting for {len(pending)} batch jobs")
+                    break
+                self.sleep(self.poll_seconds)
+        return outputs
+
+
+def classify_batch(emails, config, runner):
+    """
+    email id -> label_content result for email id -> enriched data, with the
+    combined classification calls run as a batch job (regardless of classification.mode)
+    """
+    results = {}
+    requests, pending = [], {}
+    cache = get_llm_cache(config)
+    model_id = None
+    for email_id, data in emails.items():
+        if fast_path_settles(data, config):
+            results[email_id] = label_content(data, config)
+            continue
+        model_id, body = combined_request(data, config)
+        cached = cache.get(model_id, body) if cache is not None else None
+        if cached is not None:
+            results[email_id] = label_result(data, fields_from_combined_reply(data, config, reply_text(json.loads(cached))))
+            continue
+        requests.append((record_id(email_id, "classify"), body))
+        pending[email_id] = body
+
+    if len(requests) < runner.min_records:
+        for email_id in pending:
+            results[email_id] = label_content(emails[email_id], config)
+        return results
+
+    outputs = runner.run("classify", model_id, requests)
+    fast_path = get_fast_classifier(config)
+    for email_id, body in pending.items():
+        output = outputs.get(record_id(email_id, "classify"))
+        if output is None:
+            # Failed records are classified on-demand
+            results[email_id] = label_content(emails[email_id], config)
+            continue
+        if cache is not None:
+            cache.put(model_id, body, json.dumps(output))
+        if fast_path is not None:
+            fast_path.stats.record(1, 1)
+        try:
+            reply = reply_text(output)
+        except ValueError as e:
+            logging.error(f"❌ Combined classification failed: {str(e)}")
+            reply = None
+        results[email_id] = label_result(emails[email_id], fields_from_combined_reply(emails[email_id], config, reply))
+    logging.info(f"Batch classified {len(pending)} emails ({len(emails) - len(pending)} settled without a job)")
+    return results
+
+
+def embed_batch(chunks_by_email, config, runner):
+    """email id -> embeddings (as embedder.embed_chunks returns them) for email id -> chunks, as a batch job"""
+    requests = [(record_id(email_id, chunk["chunk_id"]), {"inputText": chunk["text"]})
+                for email_id, chunks in chunks_by_email.items() for chunk in chunks]
+    if len(requests) < runner.min_records:
+        return {email_id: embedder.embed_chunks(chunks, config) for email_id, chunks in chunks_by_email.items()}
+
+    outputs = runner.run("embed", config["embedding"]["model"], requests)
+    embeddings = {}
+    for email_id, chunks in chunks_by_email.items():
+        vectors = [(outputs.get(record_id(email_id, chunk["chunk_id"])) or {}).get("embedding") for chunk in chunks]
+        # Failed records are embedded on-demand
+        missing = [i for i, vector in enumerate(vectors) if not vector]
+        if missing:
+            for i, vector in zip(missing, embedder.embed_chunks([chunks[i] for i in missing], config)):
+                vectors[i] = vector
+        embeddings[email_id] = vectors
+    logging.info(f"Batch embedded {len(requests)} chunks of {len(chunks_by_email)} emails")
+    return embeddings
+
+
+_runners = {}
+
+def get_batch_runner(config):
+    """Return the shared batch job runner for the batch_inference settings in config"""
+    settings = config.get("batch_inference", {})
+    key = json.dumps(settings, sort_keys=True)
+    if key not in _runners:
+        if settings.get("backend", "bedrock") == "local":
+            backend = LocalBatchBackend(settings.get("fixtures_dir", os.path.join("data", "batch_fixtures")))
+        else:
+            backend = BedrockBatchBackend(config)
+        _runners[key] = BatchJobRunner(
+            backend,
+            work_dir=settings.get("work_dir", DEFAULT_WORK_DIR),
+            min_records=settings.get("min_records", DEFAULT_MIN_RECORDS),
+            max_records_per_job=settings.get("max_records_per_job", DEFAULT_MAX_RECORDS_PER_JOB),
+            poll_seconds=settings.get("poll_seconds", DEFAULT_POLL_SECONDS),
+            timeout_hours=settings.get("timeout_hours", DEFAULT_TIMEOUT_HOURS),
+        )
+    return _runners[key]
@@ -0,0 +1,131 @@
+"""
+Process-wide Bedrock runtime clients.
+
+Creating a boto3 client resolves credentials, discovers the endpoint and
+sets up a connection pool, so clients are created once per configuration
+and shared by every caller (and thread) in the process. Pool size,
+timeouts and retry mode come from the `bedrock` section of config.yaml.
+
+Client creation time and request latency are recorded separately so the
+run summary shows what connection reuse saves.
+"""
+
+import time
+import logging
+import threading
+
+DEFAULT_REGION = "eu-west-1"
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+DEFAULT_RETRY_MODE = "adaptive"
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Retry settings for callers that do their own throttling backoff (classification's RequestGate)
+NO_RETRIES = {"mode": "standard", "max_attempts": 1}
+
+_clients = {}
+_lock = threading.Lock()
+
+
+class BedrockStats:
+    """Counters for client creation and invoke_model latency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.client_seconds = 0.0
+        self.requests = {}  # model id -> [count, seconds]
+
+    def record_client(self, seconds):
+        with self._lock:
+            self.clients_created += 1
+            self.client_seconds += seconds
+
+    def record_request(self, model_id, seconds):
+        with self._lock:
+            entry = self.requests.setdefault(model_id, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def summary(self):
+        with self._lock:
+            return {
+                "clients_created": self.clients_created,
+                "client_seconds": self.client_seconds,
+                "requests": {model_id: {"count": count, "seconds": seconds,
+                                        "average_ms": seconds / count * 1000 if count else 0.0}
+                             for model_id, (count, seconds) in self.requests.items()},
+            }
+
+
+stats = BedrockStats()
+
+
+def client_settings(config, region=None, retries=None):
+    settings = (config or {}).get("bedrock", {})
+    retries = retries or {}
+    return (
+        region or settings.get("region", DEFAULT_REGION),
+        settings.get("max_pool_connections", DEFAULT_MAX_POOL_CONNECTIONS),
+        settings.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        settings.get("read_timeout", DEFAULT_READ_TIMEOUT),
+        retries.get("mode", settings.get("retry_mode", DEFAULT_RETRY_MODE)),
+        retries.get("max_attempts", settings.get("max_attempts", DEFAULT_MAX_ATTEMPTS)),
+    )
+
+
+def get_bedrock_client(config=None, region=None, retries=None):
+    """
+    Return the shared bedrock-runtime client for this config (and region or
+    retry settings, if overridden)
+    """
+    key = client_settings(config, region, retries)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _clients:
+            import boto3
+            from botocore.config import Config
+
+            region_name, max_pool_connections, connect_timeout, read_timeout, retry_mode, max_attempts = key
+            start_time = time.perf_counter()
+            _clients[key] = boto3.client(
+                "bedrock-runtime",
+                region_name=region_name,
+                config=Config(
+                    max_pool_connections=max_pool_connections,
+                    connect_timeout=connect_timeout,
+                    read_timeout=read_timeout,
+                    retries={"mode": retry_mode, "max_attempts": max_attempts},
+                ),
+            )
+            elapsed = time.perf_counter() - start_time
+            stats.record_client(elapsed)
+            logging.info(f"Created Bedrock client for {region_name} in {elapsed * 1000:.0f} ms")
+        return _clients[key]
+
+
+def invoke_model(model_id, body, config=None, region=None, retries=None):
+    """invoke_model on the shared client; returns the response body as text"""
+    client = get_bedrock_client(config, region, retries)
+    start_time = time.perf_counter()
+    try:
+        response = client.invoke_model(
+            modelId=model_id,
+            body=body,
+            contentType="application/json",
+            accept="application/json"
+        )
+        return response["body"].read().decode()
+    finally:
+        stats.record_request(model_id, time.perf_counter() - start_time)
+
+
+def log_summary():
+    summary = stats.summary()
+    logging.info(f"Bedrock clients: {summary['clients_created']} created in {summary['client_seconds'] * 1000:.0f} ms")
+    for model_id, entry in summary["requests"].items():
+        logging.info(f"Bedrock {model_id}: {entry['count']} requests, {entry['seconds']:.2f}s total, "
+                     f"{entry['average_ms']:.0f} ms average")
@@ -0,0 +1,179 @@
+"""
+Learned per-vendor boilerplate stripping.
+
+Every cleaned email contributes its distinct normalized lines (hashed) to a
+per-vendor frequency index. Lines that appear in more than a threshold share
+of a vendor's emails - footers, legal text, "view in browser" banners - are
+dropped from that vendor's emails once enough of them have been seen. The
+index also keeps counters of what stripping saved, for the report.
+"""
+
+import os
+import re
+import json
+import math
+import hashlib
+import logging
+
+DEFAULT_INDEX_FILE = os.path.join("data", "boilerplate_index.json")
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_MIN_EMAILS = 5
+DEFAULT_MIN_LINE_CHARS = 12
+# Lines seen only once are pruned when a vendor's table grows past this size
+MAX_LINES_PER_VENDOR = 50000
+CHARS_PER_TOKEN = 4
+
+DIGITS_RE = re.compile(r'\d+')
+
+
+def normalize_line(line):
+    """Case/whitespace-insensitive form with numbers masked, so dates and counters still match"""
+    return DIGITS_RE.sub('#', ' '.join(line.lower().split()))
+
+
+def line_hash(normalized):
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def estimate_chunks(text, chunk_size, chunk_overlap=0):
+    """Approximate chunk count for the character-based splitter in chunker.py"""
+    if not text:
+        return 0
+    step = max(1, chunk_size - chunk_overlap)
+    return max(1, math.ceil((len(text) - chunk_overlap) / step))
+
+
+class BoilerplateIndex:
+    """Per-vendor line frequency index persisted as JSON"""
+
+    def __init__(self, path=DEFAULT_INDEX_FILE, threshold=DEFAULT_THRESHOLD, min_emails=DEFAULT_MIN_EMAILS,
+                 min_line_chars=DEFAULT_MIN_LINE_CHARS, chunk_size=512, chunk_overlap=20):
+        self.path = path
+        self.threshold = threshold
+        self.min_emails = min_emails
+        self.min_line_chars = min_line_chars
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.vendors = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.vendors = json.load(f).get("vendors", {})
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"vendors": self.vendors}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def _vendor(self, vendor):
+        return self.vendors.setdefault(vendor, {"emails": 0, "lines": {}, "stats": {}})
+
+    def _hashes(self, text):
+        """(line, hash or None) for each line; short lines are never treated as boilerplate"""
+        for line in text.split('\n'):
+            normalized = normalize_line(line)
+            yield line, line_hash(normalized) if len(normalized) >= self.min_line_chars else None
+
+    def observe(self, vendor, text):
+        """Count each distinct line of one email for its vendor"""
+        entry = self._vendor(vendor)
+        entry["emails"] += 1
+        lines = entry["lines"]
+        for digest in {digest for _, digest in self._hashes(text) if digest}:
+            lines[digest] = lines.get(digest, 0) + 1
+        if len(lines) > MAX_LINES_PER_VENDOR:
+            entry["lines"] = {digest: count for digest, count in lines.items() if count > 1}
+        self.dirty = True
+
+    def strip(self, vendor, text):
+        """Drop lines seen in more than `threshold` of the vendor's emails"""
+        entry = self.vendors.get(vendor)
+        if not entry or entry["emails"] < self.min_emails:
+            return text
+
+        limit = entry["emails"] * self.threshold
+        lines = entry["lines"]
+        kept = [line for line, digest in self._hashes(text) if not digest or lines.get(digest, 0) <= limit]
+        stripped = re.sub(r'\n{3,}', '\n\n', '\n'.join(kept)).strip()
+
+        stats = entry["stats"]
+        stats["emails_stripped"] = stats.get("emails_stripped", 0) + 1
+        stats["chars_before"] = stats.get("chars_before", 0) + len(text)
+        stats["chars_after"] = stats.get("chars_after", 0) + len(stripped)
+        stats["chunks_before"] = stats.get("chunks_before", 0) + estimate_chunks(text, self.chunk_size, self.chunk_overlap)
+        stats["chunks_after"] = stats.get("chunks_after", 0) + estimate_chunks(stripped, self.chunk_size, self.chunk_overlap)
+        self.dirty = True
+        return stripped
+
+    def report(self):
+        """Per-vendor savings: estimated tokens (~4 chars each) and chunks not embedded/indexed"""
+        rows = []
+        for vendor, entry in sorted(self.vendors.items()):
+            stats = entry["stats"]
+            chars_saved = stats.get("chars_before", 0) - stats.get("chars_after", 0)
+            rows.append({
+                "vendor": vendor,
+                "emails": entry["emails"],
+                "emails_stripped": stats.get("emails_stripped", 0),
+                "tokens_saved": chars_saved // CHARS_PER_TOKEN,
+                "chunks_saved": stats.get("chunks_before", 0) - stats.get("chunks_after", 0),
+                "chunks_before": stats.get("chunks_before", 0),
+            })
+        return rows
+
+
+_indexes = {}
+
+def boilerplate_enabled(config):
+    return bool((config or {}).get("boilerplate", {}).get("enabled", False))
+
+def get_boilerplate_index(config):
+    """Return the shared boilerplate index, or None when disabled in config"""
+    if not boilerplate_enabled(config):
+        return None
+    settings = config["boilerplate"]
+    path = settings.get("index_file", DEFAULT_INDEX_FILE)
+    if path not in _indexes:
+        processing = config.get("data_processing", {})
+        _indexes[path] = BoilerplateIndex(
+            path,
+            threshold=settings.get("threshold", DEFAULT_THRESHOLD),
+            min_emails=settings.get("min_emails", DEFAULT_MIN_EMAILS),
+            min_line_chars=settings.get("min_line_chars", DEFAULT_MIN_LINE_CHARS),
+            chunk_size=processing.get("chunk_size_tokens", 512),
+            chunk_overlap=processing.get("chunk_overlap", 20),
+        )
+    return _indexes[path]
+
+
+def print_report(index):
+    rows = index.report()
+    print("\n===== BOILERPLATE SAVINGS =====")
+    print(f"{'Vendor':<24} {'Emails':>7} {'Stripped':>9} {'Tokens saved':>13} {'Chunks saved':>13}")
+    for row in rows:
+        print(f"{row['vendor']:<24} {row['emails']:>7} {row['emails_stripped']:>9} "
+              f"{row['tokens_saved']:>13} {row['chunks_saved']:>8} of {row['chunks_before']}")
+    print(f"{'Total':<24} {sum(r['emails'] for r in rows):>7} {sum(r['emails_stripped'] for r in rows):>9} "
+          f"{sum(r['tokens_saved'] for r in rows):>13} {sum(r['chunks_saved'] for r in rows):>13}")
+    print("===============================")
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from src import llm_utils
+
+    config = llm_utils.load_config()
+    index = get_boilerplate_index(config)
+    if index is None:
+        print("boilerplate.enabled is false in config; no index to report on")
+        sys.exit(1)
+    print_report(index)
@@ -0,0 +1,93 @@
+"""
+Schema of the combined classification response and its validator.
+
+In combined mode one Bedrock call returns a single JSON object:
+
+  {"types": [...], "products": [...], "event_date": "YYYY-MM-DD" | null,
+   "registration_deadline": ..., "expiration_date": ...}
+
+Each field is validated on its own, so a malformed field only costs a
+fallback call for that field instead of redoing the whole classification.
+"""
+
+import re
+import json
+from datetime import datetime
+
+DATE_FIELDS = ("event_date", "registration_deadline", "expiration_date")
+# Result fields as label_content returns them, and the per-field call that can redo each one
+FIELDS = ("type", "product") + DATE_FIELDS
+
+CODE_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+def type_labels(config):
+    """All labels of type_classification.labels, flattened"""
+    return [label for group in config["type_classification"]["labels"].values() for label in group]
+
+
+def response_schema_text():
+    return ('{"types": ["<label>", ...], "products": ["<product name>", ...], '
+            '"event_date": "YYYY-MM-DD" or null, "registration_deadline": "YYYY-MM-DD" or null, '
+            '"expiration_date": "YYYY-MM-DD" or null}')
+
+
+def parse_json_object(content):
+    """The JSON object in a model reply (code fences and surrounding text ignored), or None"""
+    if not isinstance(content, str):
+        return None
+    content = CODE_FENCE_RE.sub('', content.strip())
+    start, end = content.find('{'), content.rfind('}')
+    if start < 0 or end < start:
+        return None
+    try:
+        parsed = json.loads(content[start:end + 1])
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _valid_date(value):
+    if value is None:
+        return True
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def validate_classification(parsed, config):
+    """
+    Split a parsed combined response into (valid fields, names of invalid
+    fields). Types must be a non-empty list of configured labels (unknown
+    labels are dropped), products a list of strings, dates YYYY-MM-DD or null.
+    """
+    fields = {}
+    invalid = []
+    if not isinstance(parsed, dict):
+        return fields, list(FIELDS)
+
+    known = {label.lower(): label for label in type_labels(config)}
+    types = parsed.get("types")
+    if isinstance(types, list) and all(isinstance(label, str) for label in types):
+        labels = [known[label.strip().lower()] for label in types if label.strip().lower() in known]
+        if labels:
+            fields["type"] = list(dict.fromkeys(labels))
+    if "type" not in fields:
+        invalid.append("type")
+
+    products = parsed.get("products")
+    if isinstance(products, list) and all(isinstance(product, str) for product in products):
+        fields["product"] = [product.strip() for product in products if product.strip()]
+    else:
+        invalid.append("product")
+
+    for name in DATE_FIELDS:
+        if name in parsed and _valid_date(parsed[name]):
+            fields[name] = parsed[name]
+        else:
+            invalid.append(name)
+    return fields, invalid
@@ -1,12 +1,43 @@
 import logging
 import json
-import boto3
 import re
 
+from src import bedrock
+from src.classify_executor import get_request_gate, estimate_request_tokens
+from src.classification_schema import DATE_FIELDS, type_labels, response_schema_text, parse_json_object, validate_classification
+from src.fast_classifier import get_fast_classifier
+from src.llm_cache import get_llm_cache
+from src.mentions import get_vendor_product_matcher
+from src.prompt_budget import prompt_text
+
+# classification.mode: one Bedrock call for all fields, or one call per field
+MODE_COMBINED = "combined"
+MODE_PER_FIELD = "per_field"
+
+def invoke_bedrock(model_id, body, config):
+    """
+    invoke_model on the shared Bedrock client and return the response body
+    text. Deterministic (temperature 0) requests go through the LLM response
+    cache when enabled; the others wait for the shared rate limit.
+    """
+    cache = get_llm_cache(config)
+    cacheable = cache is not None and body.get("temperature") == 0.0
+    if cacheable:
+        cached = cache.get(model_id, body)
+        if cached is not None:
+            return cached
+    # Requests share the token budget and back off together when Bedrock throttles. The gate
+    # is the only retry layer: a client without botocore retries hands it every throttle at once
+    body_text = json.dumps(body)
+    response_body = get_request_gate(config).call(lambda: bedrock.invoke_model(model_id, body_text, config,
+                                                                               retries=bedrock.NO_RETRIES),
+                                                  estimate_request_tokens(body_text, body.get("max_tokens")))
+    if cacheable:
+        cache.put(model_id, body, response_body)
+    return response_body
+
 def classify_message_type(data,config):
     try:
-        # Initialize Bedrock client
-        client = boto3.client("bedrock-runtime", region_name=config["bedrock"]["region"])
         model_id = config["bedrock"]["classification_model"]
         label_categories = config["type_classification"]["labels"]
         all_labels = [label for group in label_categories.values() for label in group]
@@ -16,7 +47,7 @@ def classify_message_type(data,config):
             "You are a classification model for vendor emails.\n"
             f"Classify the email into one or more of the following types:\n{label_list}.\n"
             "Return only a valid JSON list of matching labels, with no explanation or extra text.\n\n"
-            f"Email content:\n{data['text']}"
+            f"Email content:\n{prompt_text(data, config, 'type')}"
         )
 
         # Send request to Claude via Bedrock
@@ -27,14 +58,7 @@ def classify_message_type(data,config):
             "messages": [{"role": "user", "content": prompt}]
         }
 
-        response = client.invoke_model(
-            modelId=model_id,
-            body=json.dumps(body),
-            contentType="application/json",
-            accept="application/json"
-        )
-
-        response_body = response["body"].read().decode()
+        response_body = invoke_bedrock(model_id, body, config)
         parsed = json.loads(response_body)
 
         labels = []
@@ -98,7 +122,6 @@ def classify_message_type(data,config):
 def extract_dates(data, config):
     import re
     try:
-        client = boto3.client("bedrock-runtime", region_name=config["bedrock"]["region"])
         model_id = config["bedrock"]["classification_model"]
         
         prompt = (
@@ -111,7 +134,7 @@ def extract_dates(data, config):
             "Convert all dates to YYYY-MM-DD format. Return only valid JSON:\n"
             '{"event_date": "YYYY-MM-DD", "registration_deadline": "YYYY-MM-DD", "expiration_date": "YYYY-MM-DD"}\n'
             "Use null for dates not found.\n\n"
-            f"Email content:\n{data['text'][:2000]}"
+            f"Email content:\n{prompt_text(data, config, 'dates', max_chars=2000)}"
         )
 
         body = {
@@ -121,14 +144,7 @@ def extract_dates(data, config):
             "messages": [{"role": "user", "content": prompt}]
         }
 
-        response = client.invoke_model(
-            modelId=model_id,
-            body=json.dumps(body),
-            contentType="application/json",
-            accept="application/json"
-        )
-
-        response_body = response["body"].read().decode()
+        response_body = invoke_bedrock(model_id, body, config)
         parsed = json.loads(response_body)
 
         if isinstance(parsed, dict) and "content" in parsed:
@@ -164,26 +180,36 @@ def extract_dates(data, config):
         logging.error(f"❌ Date extraction failed: {str(e)}")
         return {"event_date": None, "registration_deadline": None, "expiration_date": None}
 
+def mentioned_products(data, config):
+    """
+    Known product names that literally occur in the email (found in one pass), for
+    the product prompt; empty unless classification.product_mention_hint is enabled
+    """
+    if not config.get("classification", {}).get("product_mention_hint", False):
+        return []
+    return get_vendor_product_matcher(config).products_in(data['text'])
+
 def classify_message_products(data,config):
     try:
-        # Initialize Bedrock client
-        client = boto3.client("bedrock-runtime", region_name=config["bedrock"]["region"])
         model_id = config["bedrock"]["classification_model"]
         vendor = (data.get("vendor") or "unknown").lower()
         vendor_products = config["product_classification"]["vendors"].get(vendor, [])
         product_list = ", ".join(vendor_products)
+        mentioned = mentioned_products(data, config)
         # Prompt asking for clean JSON list only
         if vendor_products:
             hint_text = f"Try to identify product names discussed in this email. These might include (but are not limited to):\n{product_list}"
         else:
             hint_text = "Try to identify product names discussed in this email."
+        if mentioned:
+            hint_text += f"\nThese known product names appear in the email: {', '.join(mentioned)}"
 
         prompt = (
             "You are an AI email analyst helping categorize content.\n"
             f"The vendor mentioned is: {vendor}.\n"
             f"{hint_text}\n"
             "Return only a valid JSON list of product names mentioned in the email. No explanation, no extra formatting.\n\n"
-            f"Email content:\n{data['text']}"
+            f"Email content:\n{prompt_text(data, config, 'product')}"
         )
 
         # Send request to Claude via Bedrock
@@ -194,14 +220,7 @@ def classify_message_products(data,config):
             "messages": [{"role": "user", "content": prompt}]
         }
 
-        response = client.invoke_model(
-            modelId=model_id,
-            body=json.dumps(body),
-            contentType="application/json",
-            accept="application/json"
-        )
-
-        response_body = response["body"].read().decode()
+        response_body = invoke_bedrock(model_id, body, config)
         parsed = json.loads(response_body)
 
         labels = []
@@ -260,10 +279,153 @@ def classify_message_products(data,config):
         logging.error(f"❌ Classification failed: {str(e)}")
         return "unknown"
 
+def claude_body(prompt, max_tokens=300):
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "temperature": 0.0,
+        "messages": [{"role": "user", "content": prompt}]
+    }
+
+def reply_text(parsed):
+    """Text of a decoded Claude response body"""
+    if isinstance(parsed, dict) and "content" in parsed:
+        return parsed["content"][0]["text"]
+    if isinstance(parsed, list) and parsed and "text" in parsed[0]:
+        return parsed[0]["text"]
+    raise ValueError(f"Unsupported response format: {parsed}")
+
+def invoke_claude(prompt, config, max_tokens=300):
+    """Send one prompt to the classification model and return the reply text"""
+    body = claude_body(prompt, max_tokens)
+    return reply_text(json.loads(invoke_bedrock(config["bedrock"]["classification_model"], body, config)))
+
+def combined_request(data, config):
+    """(model id, request body) of the combined classification call for an email"""
+    vendor = (data.get("vendor") or "unknown").lower()
+    vendor_products = config["product_classification"]["vendors"].get(vendor, [])
+    mentioned = mentioned_products(data, config)
+    product_hint = ""
+    if vendor_products:
+        product_hint = f"Product names might include (but are not limited to): {', '.join(vendor_products)}\n"
+    if mentioned:
+        product_hint += f"These known product names appear in the email: {', '.join(mentioned)}\n"
+
+    prompt = (
+        "You are a classification model for vendor emails.\n"
+        f"The vendor mentioned is: {vendor}.\n"
+        f"1. types: one or more of the following types: {', '.join(type_labels(config))}.\n"
+        f"2. products: product names discussed in the email.\n{product_hint}"
+        "3. Important dates: event_date (conferences, webinars, workshops, hands-on labs, sessions), "
+        "registration_deadline (including early bird deadlines) and expiration_date (offers), as YYYY-MM-DD, "
+        "or null when not found.\n"
+        f"Return only one valid JSON object, with no explanation or extra text:\n{response_schema_text()}\n\n"
+        f"Email content:\n{prompt_text(data, config, 'combined')}"
+    )
+    return config["bedrock"]["classification_model"], claude_body(prompt, max_tokens=500)
+
+def fields_from_combined_reply(data, config, reply):
+    """
+    Validate a combined reply field by field; only fields that are missing
+    or malformed are redone with their per-field call. reply is the reply
+    text, or None when the combined call failed.
+    """
+    try:
+        fields, invalid = validate_classification(parse_json_object(reply), config)
+    except Exception as e:
+        logging.error(f"❌ Combined classification failed: {str(e)}")
+        fields, invalid = {}, ["type", "product"] + list(DATE_FIELDS)
+
+    if invalid:
+        logging.warning(f"Combined classification fell back to per-field calls for: {', '.join(invalid)}")
+    if "type" in invalid:
+        fields["type"] = classify_message_type(data, config)
+    if "product" in invalid:
+        fields["product"] = classify_message_products(data, config)
+    if any(name in invalid for name in DATE_FIELDS):
+        dates = extract_dates(data, config)
+        for name in DATE_FIELDS:
+            fields.setdefault(name, dates.get(name))
+    logging.info(f"✅ Classified types {fields['type']}, products {fields['product']}")
+    return fields
+
+# Classified fields of each part the fast path scores
+PART_FIELDS = {"type": ("type",), "product": ("product",), "dates": DATE_FIELDS}
+
+def classify_combined(data, config):
+    """Types, products and dates from a single Bedrock call, with per-field fallback"""
+    model_id, body = combined_request(data, config)
+    try:
+        reply = reply_text(json.loads(invoke_bedrock(model_id, body, config)))
+    except Exception as e:
+        logging.error(f"❌ Combined classification failed: {str(e)}")
+        reply = None
+    return fields_from_combined_reply(data, config, reply)
+
+def classify_with_llm(data, config):
+    """Types, products and dates from Bedrock in the configured mode"""
+    if config.get("classification", {}).get("mode", MODE_PER_FIELD) == MODE_COMBINED:
+        return classify_combined(data, config)
+    fields = {"type": classify_message_type(data, config), "product": classify_message_products(data, config)}
+    fields.update(extract_dates(data, config))
+    return fields
+
+def classify_parts_with_llm(data, config, parts):
+    """
+    Only the given parts ("type", "product", "dates") from Bedrock: one call per
+    part in per_field mode, or a single combined call when several are needed
+    """
+    if len(parts) > 1 and config.get("classification", {}).get("mode", MODE_PER_FIELD) == MODE_COMBINED:
+        classified = classify_combined(data, config)
+        fields = {}
+        for part in parts:
+            for name in PART_FIELDS[part]:
+                fields[name] = classified.get(name)
+        return fields, 1
+    fields = {}
+    if "type" in parts:
+        fields["type"] = classify_message_type(data, config)
+    if "product" in parts:
+        fields["product"] = classify_message_products(data, config)
+    if "dates" in parts:
+        fields.update(extract_dates(data, config))
+    return fields, len(parts)
+
 def label_content(data, config):
-    type_classification = classify_message_type(data, config)
-    product_classification = classify_message_products(data, config)
-    extracted_dates = extract_dates(data, config)
+    fields = None
+    fast_path = get_fast_classifier(config)
+    if fast_path is not None:
+        # Rules settle the parts they are confident about; only the others go to Bedrock
+        llm_calls = 1 if config.get("classification", {}).get("mode", MODE_PER_FIELD) == MODE_COMBINED else 3
+        fields, confidence = fast_path.classify(data)
+        unsure = [part for part in PART_FIELDS if confidence[part] < fast_path.threshold]
+        calls_made = 0
+        if unsure:
+            llm_fields, calls_made = classify_parts_with_llm(data, config, unsure)
+            fields.update(llm_fields)
+        settled = [part for part in PART_FIELDS if part not in unsure]
+        if settled:
+            logging.info(f"✅ Fast-path classified {', '.join(settled)}: types {fields['type']}, "
+                         f"products {fields['product']} ({calls_made} LLM calls for the rest)")
+        fast_path.stats.record(llm_calls, calls_made)
+    if fields is None:
+        fields = classify_with_llm(data, config)
+    return label_result(data, fields)
+
+def fast_path_settles(data, config):
+    """True when the fast path classifies data completely, without any Bedrock call"""
+    fast_path = get_fast_classifier(config)
+    if fast_path is None:
+        return False
+    _, confidence = fast_path.classify(data)
+    return min(confidence.values()) >= fast_path.threshold
+
+def label_result(data, fields):
+    """label_content's result for an email from its classified fields"""
+    fields = dict(fields)
+    type_classification = fields.pop("type")
+    product_classification = fields.pop("product")
+    extracted_dates = fields
     
     result = {
         "text": data.get("text"),
@@ -276,4 +438,4 @@ def label_content(data, config):
     # Add extracted dates to the result
     result.update(extracted_dates)
     
-    return result
\ No newline at end of file
+    return result
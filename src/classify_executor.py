@@ -0,0 +1,212 @@
+"""
+Concurrent, rate-limited classification.
+
+Classification is dominated by Bedrock round trips, so several emails are
+classified at once in a thread pool (classification.concurrency). Every
+classification request passes through one shared RequestGate that keeps
+the process inside the Bedrock quota:
+
+  - a token bucket refilled at classification.tokens_per_minute (prompt
+    plus max_tokens, estimated at ~4 characters per token)
+  - an adaptive concurrency limit: a ThrottlingException halves the number
+    of requests allowed in flight, and it grows back by one after a run of
+    successful requests
+  - exponential backoff with jitter before retrying a throttled request,
+    or one that failed transiently (5xx, timeout, dropped connection);
+    classification clients have botocore retries off, so this is the only
+    retry layer
+
+Each submitted email gets its own Future, so results stay attached to the
+email that produced them whatever order the calls complete in.
+"""
+
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TOKENS_PER_MINUTE = 200000
+DEFAULT_MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# Successful requests needed before the concurrency limit grows by one again
+RECOVER_AFTER_SUCCESSES = 20
+CHARS_PER_TOKEN = 4
+
+THROTTLING_CODES = ("ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException")
+TRANSIENT_CODES = ("InternalServerException", "ServiceUnavailableException", "ModelNotReadyException",
+                   "ModelTimeoutException")
+# botocore network errors (HTTPClientError covers read/connect timeouts and closed
+# connections) and the builtin ConnectionError/TimeoutError, matched by class name
+TRANSIENT_ERRORS = ("HTTPClientError", "ConnectionError", "ReadTimeoutError", "ConnectTimeoutError", "TimeoutError")
+
+
+def is_throttling(error):
+    """True for Bedrock throttling errors (botocore ClientError or modeled exception)"""
+    response = getattr(error, "response", None)
+    code = response.get("Error", {}).get("Code") if isinstance(response, dict) else None
+    return code in THROTTLING_CODES or type(error).__name__ in THROTTLING_CODES
+
+
+def is_transient(error):
+    """True for errors worth retrying as they are: 5xx responses, timeouts and dropped connections"""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        if response.get("Error", {}).get("Code") in TRANSIENT_CODES:
+            return True
+        if response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500:
+            return True
+    return any(cls.__name__ in TRANSIENT_ERRORS or cls.__name__ in TRANSIENT_CODES for cls in type(error).__mro__)
+
+
+def estimate_request_tokens(body_text, max_tokens=0):
+    return len(body_text) // CHARS_PER_TOKEN + (max_tokens or 0)
+
+
+class TokenBucket:
+    """Blocks callers until the per-minute token budget allows their request"""
+
+    def __init__(self, tokens_per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0 if tokens_per_minute else None
+        self.available = tokens_per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        if not self.rate:
+            return
+        # A request larger than the whole budget waits for a full bucket, then goes through
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                wait = (tokens - self.available) / self.rate
+            self.sleep(wait)
+
+
+class AdaptiveLimit:
+    """Concurrency limit that halves on throttling and recovers additively"""
+
+    def __init__(self, limit):
+        self.max_limit = max(1, limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def throttled(self):
+        with self._condition:
+            self.limit = max(1, self.limit // 2)
+            self.successes = 0
+
+    def succeeded(self):
+        with self._condition:
+            self.successes += 1
+            if self.successes >= RECOVER_AFTER_SUCCESSES and self.limit < self.max_limit:
+                self.limit += 1
+                self.successes = 0
+                self._condition.notify_all()
+
+
+class RequestGate:
+    """Token budget, adaptive concurrency and retry backoff around Bedrock requests"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries=DEFAULT_MAX_RETRIES, sleep=time.sleep):
+        self.bucket = TokenBucket(tokens_per_minute, sleep=sleep)
+        self.limit = AdaptiveLimit(concurrency)
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.throttles = 0
+        self.transient_errors = 0
+
+    def call(self, fn, tokens):
+        """
+        Run fn() once the budget allows it, retrying with backoff while Bedrock
+        throttles or fails transiently; only throttling lowers the concurrency
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(tokens)
+            try:
+                with self.limit:
+                    result = fn()
+            except Exception as e:
+                throttled = is_throttling(e)
+                if not (throttled or is_transient(e)) or attempt == self.max_retries:
+                    raise
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if throttled:
+                    self.throttles += 1
+                    self.limit.throttled()
+                    logging.warning(f"Bedrock throttled; retrying in {delay:.1f}s with concurrency {self.limit.limit}")
+                else:
+                    self.transient_errors += 1
+                    logging.warning(f"Bedrock request failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+                self.sleep(delay)
+                continue
+            self.limit.succeeded()
+            return result
+
+
+class ClassificationExecutor:
+    """Thread pool that classifies many emails at once; one Future per email"""
+
+    def __init__(self, config, classify_fn=None):
+        settings = config.get("classification", {})
+        self.concurrency = max(1, settings.get("concurrency", DEFAULT_CONCURRENCY))
+        if classify_fn is None:
+            from src.classify import label_content
+            classify_fn = label_content
+        self.config = config
+        self.classify_fn = classify_fn
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="classify")
+
+    @property
+    def max_in_flight(self):
+        """Emails to keep submitted ahead of the one being finished"""
+        return self.concurrency * 2
+
+    def submit(self, data):
+        return self._pool.submit(self.classify_fn, data, self.config)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+def get_request_gate(config):
+    """Return the shared request gate for the classification settings in config"""
+    settings = (config or {}).get("classification", {})
+    key = (
+        settings.get("concurrency", DEFAULT_CONCURRENCY),
+        settings.get("tokens_per_minute", DEFAULT_TOKENS_PER_MINUTE),
+        settings.get("max_retries", DEFAULT_MAX_RETRIES),
+    )
+    with _gates_lock:
+        if key not in _gates:
+            _gates[key] = RequestGate(*key)
+        return _gates[key]
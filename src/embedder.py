@@ -1,12 +1,13 @@
 import logging
-import boto3
 import json
 from typing import List
 
+from src import bedrock
+
 
 def embed_chunks(chunks: List[dict], config: dict) -> List[List[float]]:
     model_id = config["embedding"]["model"]
-    client = boto3.client("bedrock-runtime")
+    region = config["embedding"].get("region")
 
     embeddings = []
     dim_check = None
@@ -17,14 +18,7 @@ def embed_chunks(chunks: List[dict], config: dict) -> List[List[float]]:
         }
 
         try:
-            response = client.invoke_model(
-                modelId=model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(body)
-            )
-
-            result = json.loads(response["body"].read())
+            result = json.loads(bedrock.invoke_model(model_id, json.dumps(body), config, region))
             vector = result["embedding"]
 
             if dim_check is None:
@@ -1,23 +1,25 @@
 import os
 import logging
-import langdetect
 from datetime import datetime
-import tldextract
 import re
 from collections import Counter
 
+from src.language import get_language_detector
+from src.mentions import get_vendor_product_matcher
+from src.vendor_domains import get_vendor_resolver, sender_host
+
+# Common vendor names looked for in content, on top of product_classification.vendors
+CONTENT_VENDORS = ("dell", "microsoft", "aws", "google", "ibm", "vmware", "cisco", "oracle", "hashicorp")
+
 def extract_metadata(clean_text, original_email, config):
     # Fallback values
     subject = original_email.get("subject", "")
     sender = original_email.get("from", "")
     date = original_email.get("date", None)
-    vendor = infer_vendor(sender, original_email)
+    vendor = infer_vendor(sender, original_email, config)
 
-    # Detect language
-    try:
-        language = langdetect.detect(clean_text)
-    except:
-        language = "unknown"
+    # Detect language on a bounded sample of the text
+    language, detect_seconds = get_language_detector(config).detect(clean_text)
 
     # Format date
     try:
@@ -35,7 +37,7 @@ def extract_metadata(clean_text, original_email, config):
         "text": clean_text
     }
 
-    logging.info(f"Extracted metadata for sender {sender}, vendor {vendor}, language {language}")
+    logging.info(f"Extracted metadata for sender {sender}, vendor {vendor}, language {language} ({detect_seconds * 1000:.1f} ms)")
     return metadata
 
 def extract_original_sender(email_data):
@@ -57,23 +59,18 @@ def extract_original_sender(email_data):
     
     return None
 
-def extract_vendor_from_content(email_data):
+def extract_vendor_from_content(email_data, config=None):
     """Extract vendor name from email content using various heuristics."""
     body = email_data.get("body", "")
     subject = email_data.get("subject", "")
     
-    # Common vendor names to look for
-    vendors = ["dell", "microsoft", "aws", "google", "ibm", "vmware", "cisco", "oracle", "hashicorp"]
-    
-    # Check subject for vendor names
-    for vendor in vendors:
-        if vendor in subject.lower():
-            return vendor
-    
-    # Check for vendor names in the body
-    for vendor in vendors:
-        if vendor in body.lower():
-            return vendor
+    # Vendors named in the subject, then the body. Product names do not count: generic
+    # ones ("cloud storage", "lambda") would attribute newsletters to the wrong vendor
+    matcher = get_vendor_product_matcher(config, extra_vendors=CONTENT_VENDORS)
+    for text in (subject, body):
+        found = matcher.vendors_in(text, implied=False)
+        if found:
+            return found[0]
             
     # Look for domain names in URLs that might indicate vendor
     url_pattern = r'https?://(?:www\.)?([a-zA-Z0-9-]+)\.[a-zA-Z0-9-.]+'
@@ -87,36 +84,30 @@ def extract_vendor_from_content(email_data):
     
     return None
 
-def infer_vendor(sender_email, original_email=None):
-    # Handle invalid email addresses
-    if not isinstance(sender_email, str) or '@' not in sender_email:
+def infer_vendor(sender_email, original_email=None, config=None):
+    # Handle invalid email addresses; display strings ("Name <address>") are unwrapped
+    host = sender_host(sender_email)
+    if not host:
         return "unknown"
-        
-    # Extract actual email from display string
-    match = re.search(r"<(.+?)>", sender_email)
-    if match:
-        sender_email = match.group(1)
 
-    # Use tldextract for domain parsing
-    ext = tldextract.extract(sender_email)
-    domain = ext.domain
+    # Alias table, then the registered domain from the bundled suffix list (memoized per host)
+    vendor = get_vendor_resolver(config).vendor_for_host(host)
     
     # If sender is from your company, try to find the original sender
-    if domain.lower() == "terasky":
+    if vendor == "terasky":
         # 1. Check for original sender in headers
         if original_email:
             # Look for original sender in headers
             original_sender = extract_original_sender(original_email)
             if original_sender:
-                return infer_vendor(original_sender)
+                return infer_vendor(original_sender, config=config)
                 
             # 2. Look for vendor mentions in content
-            content_vendor = extract_vendor_from_content(original_email)
+            content_vendor = extract_vendor_from_content(original_email, config)
             if content_vendor:
                 return content_vendor
     
-    return domain.lower() if domain else "unknown"
-
+    return vendor
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+"""
+Deterministic rule-based classification that skips the LLM when confident.
+
+Many vendor emails are trivial to classify: "Webinar:" subjects, CVE
+identifiers, product names from product_classification. This classifier
+scores every label of type_classification.labels with keyword rules,
+finds known products with the shared mention matcher and picks dates out
+of sentences that say what they are ("register by June 3, 2025"). Each of
+the three parts gets a confidence; classify.label_content only calls
+Bedrock for the parts below classification.fast_path.threshold, and the
+stats report how many LLM calls that saved.
+"""
+
+import re
+import json
+import logging
+import threading
+from datetime import datetime
+
+from src.classification_schema import DATE_FIELDS, type_labels
+from src.mentions import get_vendor_product_matcher
+
+DEFAULT_THRESHOLD = 0.8
+# A label is assigned at this score; its keywords in the subject alone give SUBJECT_WEIGHT
+MIN_LABEL_SCORE = 0.5
+SUBJECT_WEIGHT = 0.7
+BODY_WEIGHT = 0.15
+# Only the start of long emails is scanned for keywords and products
+MAX_SCAN_CHARS = 20000
+
+# Keyword patterns per label (labels missing here match their own name)
+DEFAULT_KEYWORDS = {
+    "webinar": [r"webinar", r"webcast", r"live demo", r"virtual session"],
+    "event": [r"conference", r"summit", r"workshop", r"hands-on lab", r"meetup", r"roadshow"],
+    "invite": [r"you'?re invited", r"invitation", r"join us", r"save the date", r"rsvp"],
+    "promo": [r"\d+% off", r"discount", r"promo code", r"free trial", r"limited[- ]time offer"],
+    "announcement": [r"announc\w*", r"introducing", r"now available", r"generally available"],
+    "vulnerability": [r"vulnerabilit\w*", r"security advisory", r"exploit\w*", r"cvss"],
+    "patch": [r"patch\w*", r"hotfix", r"security update", r"fixed in"],
+    "maintenance": [r"maintenance", r"scheduled downtime", r"service window"],
+    "support": [r"support case", r"support ticket", r"end of (?:support|life)"],
+    "update": [r"release notes", r"changelog", r"new version", r"upgrade"],
+    "whitepaper": [r"white ?paper", r"e-?book", r"research report", r"download the (?:report|guide)"],
+}
+# Patterns that settle a label on their own
+STRONG_PATTERNS = {
+    "vulnerability": [r"\bCVE-\d{4}-\d{4,}\b"],
+}
+
+MONTHS = {name: number for number, names in enumerate([
+    ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",), ("june", "jun"),
+    ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"), ("october", "oct"),
+    ("november", "nov"), ("december", "dec")], start=1) for name in names}
+_MONTH = r"\b(?P<month>" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+FULL_DATE_RES = [
+    re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})\b"),
+    re.compile(_MONTH + r"\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?,?\s+(?P<year>\d{4})\b", re.IGNORECASE),
+    re.compile(r"\b(?P<day>\d{1,2})(?:st|nd|rd|th)?\s+" + _MONTH + r",?\s+(?P<year>\d{4})\b", re.IGNORECASE),
+]
+# Dates the rules cannot resolve (no year, numeric day/month order)
+PARTIAL_DATE_RE = re.compile(r"\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b|\b" + _MONTH + r"\s+\d{1,2}(?:st|nd|rd|th)?\b(?!,?\s+\d{4})",
+                             re.IGNORECASE)
+SENTENCE_RE = re.compile(r"[^.!?\n]+")
+DATE_CONTEXT = {
+    "registration_deadline": re.compile(r"regist|deadline|early bird|rsvp|sign up by", re.IGNORECASE),
+    "expiration_date": re.compile(r"expir|valid (?:until|through)|offer ends|ends on", re.IGNORECASE),
+    "event_date": re.compile(r"webinar|event|conference|summit|session|workshop|lab\b|join|live|takes place|held on",
+                             re.IGNORECASE),
+}
+
+
+def _parse_date(match):
+    month = match.group("month")
+    month = int(month) if month.isdigit() else MONTHS[month.lower().rstrip(".")]
+    try:
+        return datetime(int(match.group("year")), month, int(match.group("day"))).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def extract_dates_locally(text):
+    """
+    (dates, confidence): event/registration/expiration dates from sentences
+    whose wording says which one they are. Confidence is 1.0 when the text
+    has no dates at all, high when every full date found was assigned, and
+    low when a date is ambiguous (no year) or unexplained.
+    """
+    dates = dict.fromkeys(DATE_FIELDS)
+    found = unassigned = 0
+    for sentence in SENTENCE_RE.finditer(text):
+        sentence = sentence.group(0)
+        if PARTIAL_DATE_RE.search(sentence):
+            unassigned += 1
+        for date_re in FULL_DATE_RES:
+            for match in date_re.finditer(sentence):
+                value = _parse_date(match)
+                if value is None:
+                    continue
+                found += 1
+                field = next((name for name, context_re in DATE_CONTEXT.items()
+                              if dates[name] is None and context_re.search(sentence)), None)
+                if field is None:
+                    unassigned += 1
+                else:
+                    dates[field] = value
+    if unassigned:
+        return dates, 0.3
+    return dates, 0.9 if found else 1.0
+
+
+class FastPathClassifier:
+    """Keyword/product/date rules with a confidence per part"""
+
+    def __init__(self, config, threshold=DEFAULT_THRESHOLD, keywords=None):
+        self.config = config
+        self.threshold = threshold
+        keywords = {**DEFAULT_KEYWORDS, **(keywords or {})}
+        self.rules = {}
+        for label in type_labels(config):
+            patterns = keywords.get(label.lower(), [re.escape(label)])
+            self.rules[label] = (
+                re.compile(r"\b(?:" + "|".join(patterns) + r")\b", re.IGNORECASE),
+                [re.compile(pattern, re.IGNORECASE) for pattern in STRONG_PATTERNS.get(label.lower(), [])],
+                re.compile(r"^\W*(?:(?:re|fwd?)\s*:\s*)*(?:\[[^\]]*\]\s*)?" + re.escape(label) + r"s?\s*:", re.IGNORECASE),
+            )
+        self.matcher = get_vendor_product_matcher(config)
+        self.stats = FastPathStats()
+
+    def score_types(self, subject, body):
+        scores = {}
+        for label, (keyword_re, strong_res, prefix_re) in self.rules.items():
+            if prefix_re.search(subject) or any(strong_re.search(subject) or strong_re.search(body)
+                                                for strong_re in strong_res):
+                scores[label] = 1.0
+                continue
+            score = SUBJECT_WEIGHT if keyword_re.search(subject) else 0.0
+            score += BODY_WEIGHT * len({match.group(0).lower() for match in keyword_re.finditer(body)})
+            if score:
+                scores[label] = min(1.0, score)
+        return scores
+
+    def classify(self, data):
+        """(fields, confidence) with fields like label_content's and a confidence for type, product and dates"""
+        subject = str(data.get("subject") or "")
+        text = (data.get("text") or "")[:MAX_SCAN_CHARS]
+
+        scores = self.score_types(subject, text)
+        types = [label for label, score in scores.items() if score >= MIN_LABEL_SCORE]
+        type_confidence = min(scores[label] for label in types) if types else 0.0
+
+        vendor = (data.get("vendor") or "").lower()
+        products = self.matcher.products_in(text, vendor) if vendor in self.matcher.vendors else []
+        products = products or self.matcher.products_in(text)
+        product_confidence = 0.9 if products else 0.0
+
+        dates, date_confidence = extract_dates_locally(data.get("text") or "")
+        fields = {"type": types, "product": products, **dates}
+        return fields, {"type": type_confidence, "product": product_confidence, "dates": date_confidence}
+
+
+class FastPathStats:
+    """How many emails the rules settled and how many LLM calls that avoided"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.emails = 0
+        self.fast_path_emails = 0
+        self.llm_calls_saved = 0
+
+    def record(self, calls_without_fast_path, calls_made):
+        with self._lock:
+            self.emails += 1
+            if calls_made < calls_without_fast_path:
+                self.fast_path_emails += 1
+                self.llm_calls_saved += calls_without_fast_path - calls_made
+
+    def log_summary(self):
+        if self.emails:
+            logging.info(f"Fast-path classification saved {self.llm_calls_saved} LLM calls on "
+                         f"{self.fast_path_emails} of {self.emails} emails")
+
+
+_classifiers = {}
+
+def get_fast_classifier(config):
+    """Return the shared fast-path classifier, or None when disabled in config"""
+    settings = (config or {}).get("classification", {}).get("fast_path", {})
+    if not settings.get("enabled", False):
+        return None
+    key = json.dumps([settings, config.get("type_classification"), config.get("product_classification")],
+                     sort_keys=True)
+    if key not in _classifiers:
+        _classifiers[key] = FastPathClassifier(config, settings.get("threshold", DEFAULT_THRESHOLD),
+                                               settings.get("keywords"))
+    return _classifiers[key]
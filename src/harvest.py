@@ -1,61 +1,656 @@
 import imaplib
-import email
 from email.header import decode_header
+from email.parser import BytesHeaderParser
 import os
-import uuid
+import re
+import json
+import time
+import select
 import logging
 
-# Maintain a mapping of message IDs for later marking
-msg_id_map = {}
+from src.raw_store import get_raw_store, parse_raw_message, raw_bytes
 
-def fetch_unread_emails(config):
-    server = config['email']['imap_server']
-    user = config['email']['email_address']
-    password = config['email']['email_password']
-    folder = config['email'].get('folder', 'INBOX')
+DEFAULT_SYNC_STATE_FILE = os.path.join("data", "imap_sync_state.json")
+DEFAULT_SEEN_INDEX_FILE = os.path.join("data", "seen_message_ids.txt")
+HEADER_FIELDS = "MESSAGE-ID DATE FROM SUBJECT"
+
+
+def load_sync_state(path):
+    """Load persisted per-folder UID checkpoints"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable IMAP sync state {path}: {e}")
+        return {}
+
+
+def save_sync_state(path, state):
+    """Atomically persist per-folder UID checkpoints"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class SeenMessageIndex:
+    """
+    Persisted set of Message-IDs that have already gone through the pipeline.
+
+    Stored as an append-only text file with one Message-ID per line; new IDs
+    are buffered in memory and appended on save().
+    """
+
+    def __init__(self, path=DEFAULT_SEEN_INDEX_FILE):
+        self.path = path
+        self.ids = set()
+        self.unsaved = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                self.ids = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, message_id):
+        return message_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, message_id):
+        if message_id and message_id not in self.ids:
+            self.ids.add(message_id)
+            self.unsaved.append(message_id)
+
+    def save(self):
+        if not self.unsaved:
+            return
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{message_id}\n" for message_id in self.unsaved))
+        self.unsaved = []
+
+
+def _normalize_message_id(value):
+    """Canonical form of a Message-ID header for deduplication"""
+    if not value:
+        return None
+    value = " ".join(str(value).split())
+    return value or None
+
+
+def _uid_int(uid):
+    return int(uid.decode() if isinstance(uid, bytes) else uid)
+
+
+FETCH_ITEM_RE = re.compile(rb'([A-Z0-9.]+(?:\[[^\]]*\](?:<\d+>)?)?) (\([^()]*\)|"[^"]*"|[^\s()]+)', re.IGNORECASE)
+FETCH_LITERAL_RE = re.compile(rb'([A-Z0-9.]+(?:\[[^\]]*\])?(?:<\d+>)?) \{\d+\}$', re.IGNORECASE)
+
+
+def _parse_fetch_response(msg_data):
+    """
+    Parse imaplib FETCH data into {uid: {item: value}}.
+
+    imaplib returns a flat list where each literal arrives as a
+    (prefix, literal) tuple and the remainder of the line as bytes, so the UID
+    and other atoms may appear either before or after a literal.
+    """
+    results = {}
+    current = None
+
+    def finish():
+        if current is not None and 'UID' in current:
+            results[int(current['UID'])] = current
+
+    for item in msg_data:
+        literal = None
+        if isinstance(item, tuple):
+            line, literal = item
+        elif isinstance(item, bytes):
+            line = item
+        else:
+            continue
+
+        if re.match(rb'\d+ \(', line):
+            finish()
+            current = {}
+            line = line.split(b'(', 1)[1]
+        if current is None:
+            continue
+
+        literal_name = FETCH_LITERAL_RE.search(line) if literal is not None else None
+        if literal_name:
+            line = line[:literal_name.start()]
+        for name, value in FETCH_ITEM_RE.findall(line):
+            current[name.decode().upper()] = value.decode(errors='ignore')
+        if literal_name:
+            current[literal_name.group(1).decode().upper()] = literal
+    finish()
+    return results
+
+
+def _buffered(mail):
+    """True when imaplib's reader already holds unread server data (checked without blocking)"""
+    reader, sock = getattr(mail, 'file', None), getattr(mail, 'sock', None)
+    if reader is None or sock is None or not hasattr(reader, 'peek'):
+        return False
+    timeout = sock.gettimeout()
+    try:
+        sock.settimeout(0)
+        return bool(reader.peek(1))
+    except OSError:
+        # Nothing buffered and nothing on the socket yet (BlockingIOError, SSLWantReadError)
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+def _fetch_body(values):
+    """Pick the full message literal out of parsed FETCH values"""
+    for key in ('BODY[]', 'RFC822'):
+        if key in values:
+            return values[key]
+    return None
+
+
+class IMAPHarvester:
+    """
+    Long-lived IMAP session for a single mailbox folder.
+
+    Keeps one authenticated connection open for the whole harvest cycle,
+    reconnecting transparently if the server drops it, and queues processed
+    UIDs so they can be flagged \\Seen with batched UID STORE commands.
+
+    With ``sync_mode: incremental`` the harvester also keeps a per-folder
+    checkpoint (UIDVALIDITY, UIDNEXT, last committed UID) and only fetches
+    ``UID n:*`` since the last run, independently of the \\Seen flag.
+    """
+
+    def __init__(self, config):
+        email_config = config['email']
+        self.server = email_config['imap_server']
+        self.port = email_config.get('imap_port')
+        self.use_ssl = email_config.get('use_ssl', True)
+        self.user = email_config['email_address']
+        self.password = email_config['email_password']
+        self.folder = email_config.get('folder', 'INBOX')
+        self.mark_as_read = email_config.get('mark_as_read', True)
+        self.mark_batch_size = email_config.get('mark_batch_size', 50)
+        self.fetch_batch_size = email_config.get('fetch_batch_size', 100)
+        self.max_inflight_bytes = email_config.get('max_inflight_bytes', 20 * 1024 * 1024)
+        self.idle_enabled = email_config.get('idle', True)
+        self.idle_timeout = email_config.get('idle_timeout_seconds', 600)
+        self.noop_interval = email_config.get('noop_interval_seconds', 60)
+        self.dedup_message_ids = email_config.get('dedup_message_ids', True)
+        self.seen_index = (
+            SeenMessageIndex(email_config.get('seen_index_file', DEFAULT_SEEN_INDEX_FILE))
+            if self.dedup_message_ids else None
+        )
+        self.sync_mode = email_config.get('sync_mode', 'unseen')
+        self.initial_sync = email_config.get('initial_sync', 'unseen')
+        self.state_file = email_config.get('sync_state_file', DEFAULT_SYNC_STATE_FILE)
+        self.state_key = f"{self.user}@{self.server}/{self.folder}"
+
+        self.mail = None
+        self.pending_seen = []
+        self.uidvalidity = None
+        self.uidnext = None
+
+        # Incremental sync bookkeeping for the current run
+        self.checkpoint = None
+        self.sync_uidnext = None
+        self.fetched_uids = set()
+        self.committed_uids = set()
+
+        # Message-ID bookkeeping for header-first deduplication
+        self.uid_message_ids = {}
+        self.duplicates_skipped = 0
+
+    def __enter__(self):
+        self.connect()
+        return self
 
-    mail = imaplib.IMAP4_SSL(server)
-    mail.login(user, password)
-    mail.select(folder)
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
-    status, messages = mail.search(None, 'UNSEEN')
-    email_ids = messages[0].split()
-    logging.info(f"Found {len(email_ids)} unread emails")
+    def connect(self):
+        """Open, authenticate and select the folder"""
+        if self.use_ssl:
+            mail = imaplib.IMAP4_SSL(self.server, self.port or imaplib.IMAP4_SSL_PORT)
+        else:
+            mail = imaplib.IMAP4(self.server, self.port or imaplib.IMAP4_PORT)
+        mail.login(self.user, self.password)
+        mail.select(self.folder)
+        self.mail = mail
+        self.uidvalidity = self._select_response_int('UIDVALIDITY')
+        self.uidnext = self._select_response_int('UIDNEXT')
+        self._take_mailbox_updates()
+        logging.info(f"Connected to IMAP server {self.server} folder {self.folder}")
 
-    emails = []
-    for eid in email_ids:
-        _, msg_data = mail.fetch(eid, '(RFC822)')
-        raw_email = msg_data[0][1]
-        msg = email.message_from_bytes(raw_email)
-        emails.append((eid, msg))  # store tuple of id and email object
+    def _select_response_int(self, code):
+        """Read a numeric response code (e.g. UIDVALIDITY) left by SELECT"""
+        _, data = self.mail.response(code)
+        if data and data[-1] is not None:
+            try:
+                return int(data[-1])
+            except (TypeError, ValueError):
+                pass
+        return None
 
-    mail.logout()
-    return emails
+    def _take_mailbox_updates(self):
+        """
+        Pop the EXISTS/RECENT responses imaplib stored while running other
+        commands; True if there were any. After SELECT they only repeat the
+        counts it reported, later they mean mail arrived in the meantime.
+        """
+        responses = self.mail.untagged_responses
+        updates = [responses.pop(name, None) for name in ('EXISTS', 'RECENT')]
+        return any(updates)
+
+    def _reset(self):
+        """Drop a dead connection without raising"""
+        if self.mail is not None:
+            try:
+                self.mail.shutdown()
+            except Exception:
+                pass
+        self.mail = None
+
+    def _run(self, command, *args):
+        """
+        Run an IMAP command on the shared session, reconnecting once if the
+        connection was dropped
+        """
+        if self.mail is None:
+            self.connect()
+        try:
+            return getattr(self.mail, command)(*args)
+        except (imaplib.IMAP4.abort, OSError) as e:
+            logging.warning(f"IMAP connection lost during {command} ({e}), reconnecting")
+            self._reset()
+            self.connect()
+            return getattr(self.mail, command)(*args)
+
+    def search_unseen(self):
+        """Return the UIDs of all unread messages in the folder"""
+        return self.search_uids('UNSEEN')
+
+    def search_uids(self, *criteria):
+        """Return the UIDs matching an IMAP SEARCH criteria"""
+        status, data = self._run('uid', 'SEARCH', None, *criteria)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"UID SEARCH failed: {data}")
+        return data[0].split() if data and data[0] else []
+
+    def search_new(self):
+        """
+        Return the UIDs to process in incremental mode: everything above the
+        folder's checkpoint plus UIDs fetched earlier but never committed.
+        Falls back to a full resync when there is no checkpoint or the
+        folder's UIDVALIDITY changed.
+        """
+        if self.mail is None:
+            self.connect()
+
+        state = load_sync_state(self.state_file)
+        checkpoint = state.get(self.state_key)
+
+        if not checkpoint or checkpoint.get('uidvalidity') != self.uidvalidity:
+            if checkpoint:
+                logging.warning(
+                    f"UIDVALIDITY of {self.folder} changed "
+                    f"({checkpoint.get('uidvalidity')} -> {self.uidvalidity}), running full resync"
+                )
+            else:
+                logging.info(f"No sync checkpoint for {self.folder}, running full resync")
+            criteria = ('ALL',) if self.initial_sync == 'all' else ('UNSEEN',)
+            uids = [_uid_int(u) for u in self.search_uids(*criteria)]
+            # Everything up to the current UIDNEXT is covered by this resync;
+            # fetched UIDs stay pending until committed
+            baseline = self.uidnext - 1 if self.uidnext else max(uids, default=0)
+            self.checkpoint = {'uidvalidity': self.uidvalidity, 'uidnext': None, 'last_uid': baseline, 'pending': []}
+        else:
+            self.checkpoint = checkpoint
+            last_uid = checkpoint.get('last_uid', 0)
+            pending = checkpoint.get('pending', [])
+            if self.uidnext is not None and checkpoint.get('uidnext') == self.uidnext and not pending:
+                logging.info(f"No new emails in {self.folder} since UID {last_uid}")
+                return []
+            # "n:*" always matches the highest UID, so filter out anything already covered
+            uids = [u for u in map(_uid_int, self.search_uids('UID', f"{last_uid + 1}:*")) if u > last_uid]
+            uids = sorted(set(uids) | set(pending))
+
+        self.sync_uidnext = self.uidnext
+        self.fetched_uids = set(uids)
+        self.committed_uids = set()
+        logging.info(f"Incremental sync found {len(uids)} new emails in {self.folder}")
+        return [str(u).encode() for u in uids]
+
+    def save_checkpoint(self):
+        """Advance the folder checkpoint past all committed UIDs"""
+        if self.checkpoint is None:
+            return
+        last_uid = max(self.committed_uids | {self.checkpoint.get('last_uid', 0)})
+        pending = sorted(self.fetched_uids - self.committed_uids)
+        self.checkpoint = {
+            'uidvalidity': self.uidvalidity,
+            'uidnext': self.sync_uidnext,
+            'last_uid': last_uid,
+            'pending': pending,
+        }
+        state = load_sync_state(self.state_file)
+        state[self.state_key] = self.checkpoint
+        save_sync_state(self.state_file, state)
+        logging.debug(f"Saved sync checkpoint for {self.folder}: {self.checkpoint}")
+
+    def fetch_items(self, uids, items):
+        """
+        Run one UID FETCH for a set of UIDs and return {uid: {item: value}}.
+        Literal values (bodies, headers) are bytes, atoms are decoded strings.
+        """
+        uid_set = ",".join(u.decode() if isinstance(u, bytes) else str(u) for u in uids)
+        status, msg_data = self._run('uid', 'FETCH', uid_set, items)
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"UID FETCH {uid_set} failed: {msg_data}")
+        return _parse_fetch_response(msg_data)
+
+    def fetch_message(self, uid):
+        """Fetch one message by UID without setting \\Seen"""
+        for values in self.fetch_items([uid], '(UID BODY.PEEK[])').values():
+            body = _fetch_body(values)
+            if body is not None:
+                return parse_raw_message(body)
+        return None
+
+    def fetch_envelopes(self, uids):
+        """
+        Return {uid: (RFC822.SIZE, Message-ID)} for a batch of UIDs. When
+        deduplication is enabled the Message-ID/Date/From/Subject headers are
+        peeked in the same round trip, without downloading any bodies.
+        """
+        if self.dedup_message_ids:
+            items = f'(UID RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])'
+        else:
+            items = '(UID RFC822.SIZE)'
+
+        envelopes = {}
+        for uid, values in self.fetch_items(uids, items).items():
+            try:
+                size = int(values.get('RFC822.SIZE', 0))
+            except ValueError:
+                size = 0
+            message_id = None
+            headers = next((v for k, v in values.items() if k.startswith('BODY[HEADER')), None)
+            if isinstance(headers, bytes):
+                message_id = _normalize_message_id(BytesHeaderParser().parsebytes(headers).get('Message-ID'))
+            envelopes[uid] = (size, message_id)
+        return envelopes
+
+    def iter_messages(self, uids):
+        """
+        Stream (uid, message) tuples for the given UIDs.
+
+        UIDs are processed in batches of ``fetch_batch_size``. Each batch
+        starts with a header-only fetch: messages whose Message-ID is already
+        in the seen index are committed without downloading their body, and
+        repeats within the run are left for the next one. Remaining bodies
+        are downloaded in groups whose combined RFC822.SIZE stays under
+        ``max_inflight_bytes`` (an oversized message is fetched on its own), so
+        only one group of raw messages is held in memory at a time.
+        """
+        uids = [_uid_int(u) for u in uids]
+        in_flight_ids = set()
+        for start in range(0, len(uids), self.fetch_batch_size):
+            batch = uids[start:start + self.fetch_batch_size]
+            envelopes = self.fetch_envelopes(batch)
+
+            group, group_bytes = [], 0
+            for uid in batch:
+                if uid not in envelopes:
+                    # Expunged since it was searched or recorded as pending
+                    self.fetched_uids.discard(uid)
+                    continue
+                size, message_id = envelopes[uid]
+                if message_id:
+                    if message_id in self.seen_index:
+                        logging.info(f"Skipping UID {uid}: Message-ID {message_id} already processed")
+                        self.duplicates_skipped += 1
+                        self.commit(uid)
+                        continue
+                    if message_id in in_flight_ids:
+                        # Same Message-ID earlier in this run; retried next run if that copy fails
+                        logging.info(f"Deferring UID {uid}: Message-ID {message_id} already in this run")
+                        self.duplicates_skipped += 1
+                        continue
+                    in_flight_ids.add(message_id)
+                    self.uid_message_ids[uid] = message_id
+
+                if group and group_bytes + size > self.max_inflight_bytes:
+                    yield from self._fetch_group(group)
+                    group, group_bytes = [], 0
+                group.append(uid)
+                group_bytes += size
+            if group:
+                yield from self._fetch_group(group)
+
+    def _fetch_group(self, group):
+        """Download one group of bodies and yield them in UID order"""
+        bodies = self.fetch_items(group, '(UID BODY.PEEK[])')
+        logging.debug(f"Fetched {len(bodies)} message bodies")
+        for uid in group:
+            values = bodies.pop(uid, None)
+            body = _fetch_body(values) if values else None
+            if body is None:
+                self.fetched_uids.discard(uid)
+                continue
+            yield str(uid).encode(), parse_raw_message(body)
+
+    def iter_new_emails(self):
+        """Stream the emails to process according to the configured sync mode"""
+        if self.sync_mode == 'incremental':
+            uids = self.search_new()
+        else:
+            uids = self.search_unseen()
+            logging.info(f"Found {len(uids)} unread emails")
+        return self.iter_messages(uids)
+
+    def fetch_unread_emails(self):
+        """Fetch all unread messages as (uid, message) tuples"""
+        uids = self.search_unseen()
+        logging.info(f"Found {len(uids)} unread emails")
+        return list(self.iter_messages(uids))
+
+    def fetch_new_emails(self):
+        """Fetch the emails to process according to the configured sync mode"""
+        return list(self.iter_new_emails())
+
+    def commit(self, uid):
+        """Record a UID as fully processed"""
+        message_id = self.uid_message_ids.pop(_uid_int(uid), None)
+        if message_id and self.seen_index is not None:
+            self.seen_index.add(message_id)
+        self.mark_seen(uid)
+        if self.checkpoint is not None:
+            self.committed_uids.add(_uid_int(uid))
+            if not self.mark_as_read and len(self.committed_uids) % self.mark_batch_size == 0:
+                self.save_checkpoint()
+
+    def mark_seen(self, uid):
+        """Queue a UID to be flagged \\Seen at the next commit point"""
+        if not self.mark_as_read:
+            return
+        self.pending_seen.append(uid)
+        if len(self.pending_seen) >= self.mark_batch_size:
+            self.flush()
+
+    def flush(self):
+        """Flag all queued UIDs \\Seen with a single UID STORE and checkpoint"""
+        if self.seen_index is not None:
+            self.seen_index.save()
+        self.save_checkpoint()
+        if not self.pending_seen:
+            return
+        uids = [u.decode() if isinstance(u, bytes) else str(u) for u in self.pending_seen]
+        uid_set = ",".join(uids)
+        status, data = self._run('uid', 'STORE', uid_set, '+FLAGS', '(\\Seen)')
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"UID STORE failed: {data}")
+        self.pending_seen = []
+        logging.info(f"Marked {len(uids)} emails as read")
+
+    def refresh(self):
+        """Re-select the folder to pick up the current UIDVALIDITY/UIDNEXT"""
+        self._run('select', self.folder)
+        self.uidvalidity = self._select_response_int('UIDVALIDITY')
+        self.uidnext = self._select_response_int('UIDNEXT')
+        self._take_mailbox_updates()
+
+    def supports_idle(self):
+        if self.mail is None:
+            self.connect()
+        return 'IDLE' in self.mail.capabilities
+
+    def idle(self, timeout, stop_event=None):
+        """
+        Block in IMAP IDLE until the server reports new mail, the timeout
+        expires or stop_event is set. Returns True if an EXISTS/RECENT update
+        was received.
+        """
+        if self.mail is None:
+            self.connect()
+        # New mail announced during the last batch's FETCH/STORE was read by imaplib
+        # along with their responses; the server will not repeat it in IDLE
+        if self._take_mailbox_updates():
+            return True
+        mail = self.mail
+        tag = mail._new_tag()
+        changed = False
+        try:
+            mail.send(tag + b' IDLE\r\n')
+            line = mail.readline()
+            if not line.startswith(b'+'):
+                raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+
+            deadline = time.monotonic() + timeout
+            while not changed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (stop_event is not None and stop_event.is_set()):
+                    break
+                # imaplib reads through a buffered file: an EXISTS that came in the same
+                # packet as the continuation is already buffered and select() would not see it
+                pending = _buffered(mail) or getattr(mail.sock, 'pending', lambda: 0)()
+                if not pending:
+                    readable, _, _ = select.select([mail.sock], [], [], min(remaining, 1.0))
+                    if not readable:
+                        continue
+                line = mail.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connection closed during IDLE")
+                if line.startswith(b'*') and (b'EXISTS' in line or b'RECENT' in line):
+                    changed = True
+
+            mail.send(b'DONE\r\n')
+            while True:
+                line = mail.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connection closed ending IDLE")
+                if line.startswith(tag):
+                    break
+                if b'EXISTS' in line or b'RECENT' in line:
+                    changed = True
+        except (imaplib.IMAP4.abort, OSError) as e:
+            logging.warning(f"IMAP connection lost during IDLE ({e}), reconnecting")
+            self._reset()
+            self.connect()
+            changed = True
+        finally:
+            mail.tagged_commands.pop(tag, None)
+        return changed
+
+    def wait_for_new_mail(self, stop_event=None):
+        """
+        Wait for new mail using IDLE when the server supports it, otherwise a
+        periodic NOOP poll. Always returns after idle_timeout_seconds at most
+        so IDLE is re-issued before servers drop it.
+        """
+        if self.idle_enabled and self.supports_idle():
+            changed = self.idle(self.idle_timeout, stop_event)
+        else:
+            if stop_event is not None:
+                stop_event.wait(self.noop_interval)
+            else:
+                time.sleep(self.noop_interval)
+            self._run('noop')
+            changed = True
+        self.refresh()
+        return changed
+
+    def watch(self, handle_email, stop_event=None, after_batch=None):
+        """
+        Long-running push mode: process everything new, then block until the
+        server signals more mail and repeat until stop_event is set.
+
+        handle_email(uid, message) is expected to call commit(uid) once the
+        message has gone through the pipeline. after_batch() runs after every
+        batch that handled at least one message (persisting state, summaries).
+        """
+        logging.info(f"Watching {self.folder} for new mail")
+        while stop_event is None or not stop_event.is_set():
+            handled = 0
+            for uid, msg in self.iter_new_emails():
+                handle_email(uid, msg)
+                handled += 1
+                if stop_event is not None and stop_event.is_set():
+                    break
+            self.flush()
+            if handled and after_batch is not None:
+                after_batch()
+            if stop_event is not None and stop_event.is_set():
+                break
+            self.wait_for_new_mail(stop_event)
+
+    def close(self):
+        """Flush pending flag updates and log out"""
+        if self.duplicates_skipped:
+            logging.info(f"Skipped body download for {self.duplicates_skipped} duplicate Message-IDs")
+        try:
+            self.flush()
+        finally:
+            if self.mail is not None:
+                try:
+                    self.mail.logout()
+                except Exception:
+                    pass
+                self.mail = None
+
+
+def fetch_unread_emails(config):
+    with IMAPHarvester(config) as harvester:
+        return harvester.fetch_unread_emails()
 
 def mark_email_as_read(eid, config):
     if not config['email'].get('mark_as_read', True):
         return
 
-    server = config['email']['imap_server']
-    user = config['email']['email_address']
-    password = config['email']['email_password']  # Fixed key name to match config
-    folder = config['email'].get('folder', 'INBOX')
-
-    mail = imaplib.IMAP4_SSL(server)
-    mail.login(user, password)
-    mail.select(folder)
-    mail.store(eid, '+FLAGS', '\\Seen')
-    mail.logout()
-    logging.info(f"Marked email ID {eid.decode()} as read")
+    with IMAPHarvester(config) as harvester:
+        harvester.mark_seen(eid)
+    logging.info(f"Marked email ID {eid.decode() if isinstance(eid, bytes) else eid} as read")
 
 def save_raw_email(email_obj, config):
-    msg_id = str(uuid.uuid4())
-    folder = os.path.join("data", "raw_emails")
-    os.makedirs(folder, exist_ok=True)
-    path = os.path.join(folder, f"{msg_id}.eml")
-
-    with open(path, "wb") as f:
-        f.write(email_obj.as_bytes())
+    """
+    Store a raw email under the SHA-256 of its bytes. Saving an email that is
+    already in the store is a no-op and returns the existing id and path.
+    """
+    store = get_raw_store(config)
+    msg_id, path, created = store.put(raw_bytes(email_obj))
 
-    logging.info(f"Saved raw email to {path}")
-    return msg_id, path
\ No newline at end of file
+    if created:
+        logging.info(f"Saved raw email to {path}")
+    else:
+        logging.info(f"Raw email {msg_id} already stored at {path}")
+    return msg_id, path
@@ -0,0 +1,96 @@
+"""
+HTML to plain text conversion for email bodies.
+
+Comments and <script>/<style> blocks are dropped, each run of adjacent tags
+is replaced once (line break, space or nothing), and character entities are
+decoded in the text that is left, instead of chaining several regex passes
+that each rescan the whole HTML.
+"""
+
+import re
+from html.entities import html5
+
+# Bump when conversion output changes; invalidates cached normalization output
+HTML_TO_TEXT_VERSION = "2"
+
+_SCRIPT_OR_STYLE = r'(?:[sS][cC][rR][iI][pP][tT]|[sS][tT][yY][lL][eE])'
+
+# Comments and <script>/<style> blocks (with their bodies) are replaced by an
+# empty "<!>" declaration, so they join the surrounding run of markup below.
+# Their bodies use unrolled loops ([^<]*(?:<(?!...)[^<]*)*) instead of lazy .*?
+# so the scan stays linear.
+DROP_RE = re.compile(
+    r'<(?:!--[^-]*(?:-(?!->)[^-]*)*(?:-->|\Z)'
+    r'|' + _SCRIPT_OR_STYLE + r'\b[^>]*>[^<]*(?:<(?!/' + _SCRIPT_OR_STYLE + r')[^<]*)*(?:</[^>]*>|\Z))',
+    re.DOTALL
+)
+# A run of adjacent tags/declarations with the whitespace between them, so a
+# stretch like "</td>\n  </tr><tr>\n  <td>" is handled once. The pattern starts
+# with a literal '<' so the regex engine can skip ahead to candidate positions.
+_TAG = r'<(?:/?[a-zA-Z]|!)[^>]*>\s*'
+MARKUP_RUN_RE = re.compile(_TAG + r'(?:' + _TAG + r')*')
+# A run containing a block-level tag becomes a line break ... (address, article,
+# aside, blockquote, br, dd, div, dl, dt, footer, form, h1-h6, header, hr, li, main,
+# nav, ol, p, pre, section, table, tbody, tfoot, thead, title, tr, ul; grouped by
+# first letter, which makes the search several times faster than a flat alternation)
+BLOCK_TAG_RE = re.compile(
+    r'</?(?i:a(?:ddress|rticle|side)|b(?:lockquote|r)|d(?:[dlt]|iv)|f(?:ooter|orm)|h(?:[1-6r]|eader)'
+    r'|li|main|nav|ol|p(?:re)?|section|t(?:able|body|foot|head|itle|r)|ul)\b'
+)
+# ... one with whitespace between tags or a table cell becomes a space, anything else vanishes
+TAG_SPACE_RE = re.compile(r'>\s')
+CELL_TAG_RE = re.compile(r'<(?i:t[dh])\b')
+# Entities; the second group is ';', empty for a bare name followed by '=', or None
+ENTITY_RE = re.compile(r'&(#[xX][0-9a-fA-F]+|#[0-9]+|[a-zA-Z][a-zA-Z0-9]*)(;|(?==))?')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+def _replace_markup_run(match):
+    markup = match.group(0)
+    if BLOCK_TAG_RE.search(markup):
+        return '\n'
+    if TAG_SPACE_RE.search(markup) or CELL_TAG_RE.search(markup):
+        return ' '
+    return ''
+
+
+def _decode_entity(match):
+    """
+    Decode an entity reference, or keep it as text when unknown. Without the ';'
+    only the legacy names (html5 keys without a trailing ';') are decoded, and not
+    before '=', so query strings like "?a=1&lang=en&not=1" survive
+    """
+    name, end = match.group(1), match.group(2)
+    if name[0] == '#':
+        try:
+            codepoint = int(name[2:], 16) if name[1] in 'xX' else int(name[1:])
+            return chr(codepoint) if 0 < codepoint < 0x110000 else ''
+        except ValueError:
+            return ''
+    if end == '':
+        return match.group(0)
+    decoded = html5.get(name + ';') if end else html5.get(name)
+    return match.group(0) if decoded is None else decoded
+
+
+def html_to_text(html: str) -> str:
+    """
+    Convert HTML (or text with stray markup) to plain text:
+      - comments, <script> and <style> blocks are dropped
+      - block-level tags become line breaks, table cells become spaces
+      - other tags are removed
+      - named and numeric entities are decoded (&nbsp; becomes a plain space)
+      - whitespace within lines is collapsed and runs of blank lines limited to one
+    """
+    if not html:
+        return ''
+
+    text = DROP_RE.sub('<!>', html)
+    text = MARKUP_RUN_RE.sub(_replace_markup_run, text)
+    # Entities are decoded after the markup is gone, so "&lt;b&gt;" stays text
+    if '&' in text:
+        text = ENTITY_RE.sub(_decode_entity, text)
+
+    # str.split() also treats the decoded non-breaking spaces as whitespace
+    text = '\n'.join(' '.join(line.split()) for line in text.split('\n'))
+    return BLANK_LINES_RE.sub('\n\n', text).strip()
@@ -0,0 +1,130 @@
+"""
+Persistent cache of LLM responses in SQLite.
+
+Classification calls run at temperature 0, so the same prompt to the same
+model with the same inference parameters gives the same answer; when an
+email is reprocessed (reset-db, normalizer change, crash recovery) the
+response is read back instead of paying for the Bedrock call again.
+
+Entries are keyed by SHA-256 of (model id, prompt, inference parameters).
+Entries older than max_age_days are dropped, and past max_entries the
+least recently used ones go.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join("data", "llm_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_MAX_AGE_DAYS = 90
+# Eviction runs on open and after every this many writes
+EVICT_EVERY_PUTS = 200
+
+
+def cache_key(model_id, body):
+    """SHA-256 over the model id, the prompt and the remaining inference parameters of a request body"""
+    params = {name: value for name, value in body.items() if name != "messages"}
+    prompt_hash = hashlib.sha256(json.dumps(body.get("messages"), sort_keys=True).encode("utf-8")).hexdigest()
+    material = "\0".join([model_id, prompt_hash, json.dumps(params, sort_keys=True)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed (model, prompt, params) -> response text cache with LRU/age eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400 if max_age_days else None
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model_id TEXT, response TEXT, created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+        self.evict()
+
+    def get(self, model_id, body):
+        """Cached response text for a request, or None"""
+        key = cache_key(model_id, body)
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.max_age_seconds and row[1] < now - self.max_age_seconds:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model_id, body, response):
+        now = self.clock()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model_id, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (cache_key(model_id, body), model_id, response, now, now)
+            )
+            self._db.commit()
+            self._puts += 1
+            evict = self._puts % EVICT_EVERY_PUTS == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop entries past max_age_days, then the least recently used ones past max_entries"""
+        with self._lock:
+            if self.max_age_seconds:
+                self._db.execute("DELETE FROM responses WHERE created < ?", (self.clock() - self.max_age_seconds,))
+            if self.max_entries:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_caches = {}
+
+def get_llm_cache(config):
+    """Return the shared LLM response cache, or None when disabled in config"""
+    settings = (config or {}).get("llm_cache", {})
+    if not settings.get("enabled", False):
+        return None
+    path = settings.get("path", DEFAULT_CACHE_PATH)
+    if path not in _caches:
+        _caches[path] = LLMResponseCache(
+            path,
+            max_entries=settings.get("max_entries", DEFAULT_MAX_ENTRIES),
+            max_age_days=settings.get("max_age_days", DEFAULT_MAX_AGE_DAYS),
+        )
+        logging.info(f"LLM response cache at {path}")
+    return _caches[path]
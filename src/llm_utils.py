@@ -1,12 +1,13 @@
 import json
 import yaml
-import boto3
 import logging
 from typing import List, Optional
 from chromadb import PersistentClient
 from chromadb.api.models.Collection import Collection
 import os
 
+from src import bedrock
+
 CONFIG_PATH = "config/config.yaml"
 
 # ----------------------------------------------------------------------
@@ -54,14 +55,7 @@ def embed_text_titan(text: str) -> List[float]:
     model_id = config.get("embedding", {}).get("model", "amazon.titan-embed-text-v2:0")
 
     try:
-        bedrock_client = boto3.client("bedrock-runtime", region_name=region)
-        response = bedrock_client.invoke_model(
-            modelId=model_id,
-            body=json.dumps({"inputText": text}),
-            contentType="application/json",
-            accept="application/json"
-        )
-        response_body = json.loads(response["body"].read())
+        response_body = json.loads(bedrock.invoke_model(model_id, json.dumps({"inputText": text}), config, region))
         return response_body["embedding"]
 
     except Exception as e:
@@ -75,7 +69,6 @@ def generate_claude_answer(context_docs: list, question: str, config: dict) -> s
     """
     try:
         model_id = config["rag"]["answer_model"]
-        client = boto3.client("bedrock-runtime")
 
         context = "\n\n".join(context_docs)
         prompt = (
@@ -92,14 +85,7 @@ def generate_claude_answer(context_docs: list, question: str, config: dict) -> s
             "messages": [{"role": "user", "content": prompt}]
         }
 
-        response = client.invoke_model(
-            modelId=model_id,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(body)
-        )
-
-        result = json.loads(response["body"].read())
+        result = json.loads(bedrock.invoke_model(model_id, json.dumps(body), config))
         return result.get("content", [])[0].get("text", "").strip()
 
     except Exception as e:
@@ -1,7 +1,11 @@
 import os
-import uuid
-from email import policy
-from email.parser import BytesParser
+import mailbox
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.raw_store import content_hash, parse_raw_message
+
 
 def load_local_emails(folder_path):
     eml_files = [f for f in os.listdir(folder_path) if f.endswith(".eml")]
@@ -10,8 +14,102 @@ def load_local_emails(folder_path):
     for filename in eml_files:
         path = os.path.join(folder_path, filename)
         with open(path, "rb") as f:
-            msg = BytesParser(policy=policy.default).parse(f)  # <- actual EmailMessage
-            email_id = msg.get("Subject", str(uuid.uuid4()))  # fallback to UUID if missing
-            emails.append((email_id, msg))
+            data = f.read()
+        # Same id the raw email store assigns: the hash of the file's bytes
+        emails.append((content_hash(data), parse_raw_message(data)))
 
     return emails
+
+
+def _is_maildir(path):
+    return os.path.isdir(os.path.join(path, "cur")) and os.path.isdir(os.path.join(path, "new"))
+
+
+def _is_mbox(path):
+    if path.endswith(".mbox"):
+        return True
+    try:
+        with open(path, "rb") as f:
+            return f.read(5) == b"From "
+    except OSError:
+        return False
+
+
+def iter_message_sources(path):
+    """
+    Walk a backfill source and yield parse tasks without reading everything
+    into memory: ("file", path) for .eml files and Maildir messages, and
+    ("bytes", data) for messages inside mbox files.
+    """
+    if os.path.isfile(path):
+        if path.endswith(".eml"):
+            yield ("file", path)
+        elif _is_mbox(path):
+            box = mailbox.mbox(path, create=False)
+            try:
+                for key in box.iterkeys():
+                    yield ("bytes", box.get_bytes(key))
+            finally:
+                box.close()
+        return
+
+    if _is_maildir(path):
+        for subdir in ("new", "cur"):
+            folder = os.path.join(path, subdir)
+            for filename in sorted(os.listdir(folder)):
+                if not filename.startswith("."):
+                    yield ("file", os.path.join(folder, filename))
+        return
+
+    for dirpath, dirnames, filenames in os.walk(path):
+        # Maildirs are handled as a unit rather than walked file by file
+        for dirname in sorted(dirnames):
+            if _is_maildir(os.path.join(dirpath, dirname)):
+                yield from iter_message_sources(os.path.join(dirpath, dirname))
+        dirnames[:] = sorted(d for d in dirnames if not _is_maildir(os.path.join(dirpath, d)))
+        for filename in sorted(filenames):
+            full_path = os.path.join(dirpath, filename)
+            if filename.endswith(".eml") or filename.endswith(".mbox"):
+                yield from iter_message_sources(full_path)
+
+
+def parse_message_source(source):
+    """Parse one backfill task into (content-hash id, EmailMessage); runs in a worker process"""
+    kind, value = source
+    if kind == "file":
+        with open(value, "rb") as f:
+            data = f.read()
+    else:
+        data = value
+    return content_hash(data), parse_raw_message(data)
+
+
+def iter_backfill_emails(path, workers=None, max_pending=64):
+    """
+    Stream (email_id, message) tuples from an mbox file, a Maildir or a tree
+    of .eml files, parsing in a process pool.
+
+    At most ``max_pending`` parse tasks are in flight, so a slow pipeline
+    applies backpressure to the reader instead of letting parsed messages
+    pile up in memory. Results are yielded in source order.
+    """
+    pending = deque()
+    parsed = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        sources = iter_message_sources(path)
+        while True:
+            for source in sources:
+                pending.append(pool.submit(parse_message_source, source))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            try:
+                result = pending.popleft().result()
+            except Exception as e:
+                failed += 1
+                logging.error(f"Failed to parse backfill message: {e}")
+                continue
+            parsed += 1
+            yield result
+    logging.info(f"Backfill parsed {parsed} messages from {path} ({failed} failed)")
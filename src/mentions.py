@@ -0,0 +1,153 @@
+"""
+Vendor and product mention matching in one pass over the text.
+
+An Aho-Corasick automaton is compiled once from the vendor names and
+product names in product_classification.vendors and reports every
+occurrence of every name in a single scan of the lowercased text, instead
+of one substring search (and one .lower() of the whole text) per name.
+Matches must sit on word boundaries, so "s3" does not match inside "s3cure"
+and "vault" not inside "vaulted". Enrichment (vendor from content),
+classification hints and graph relationship scoring all use it.
+"""
+
+import re
+from bisect import bisect_right
+from collections import deque, namedtuple
+
+Mention = namedtuple("Mention", "start end term")
+
+SENTENCE_END_RE = re.compile(r"[.!?]")
+
+
+class AhoCorasick:
+    """Multi-pattern automaton over lowercased terms"""
+
+    def __init__(self, terms):
+        self.terms = sorted({term.lower() for term in terms if term and term.strip()})
+        # Trie: per-state goto dicts, failure links and the terms ending at each state
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for term in self.terms:
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] += (term,)
+
+        # Breadth-first failure links; outputs of the failure state are inherited
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """Yield a Mention for every word-bounded occurrence of every term in text (already lowercased)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term in out[state]:
+                start = i - len(term) + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (i + 1 == len(text) or not text[i + 1].isalnum()):
+                    yield Mention(start, i + 1, term)
+
+
+class MentionIndex:
+    """Positions of a set of terms in one text, found with a single scan"""
+
+    def __init__(self, text, terms=None, automaton=None):
+        self.text = (text or "").lower()
+        automaton = automaton or AhoCorasick(terms or ())
+        self.positions = {}
+        for mention in automaton.iter_matches(self.text):
+            self.positions.setdefault(mention.term, []).append(mention)
+        self._line_breaks = None
+        self._sentence_breaks = None
+
+    def find(self, term):
+        return self.positions.get(term.lower(), [])
+
+    def line_of(self, position):
+        if self._line_breaks is None:
+            self._line_breaks = [i for i, char in enumerate(self.text) if char == "\n"]
+        return bisect_right(self._line_breaks, position)
+
+    def sentence_of(self, position):
+        if self._sentence_breaks is None:
+            self._sentence_breaks = [match.start() for match in SENTENCE_END_RE.finditer(self.text)]
+        return bisect_right(self._sentence_breaks, position)
+
+
+class VendorProductMatcher:
+    """
+    Finds vendor and product mentions for the vendors -> products mapping
+    from config; a product mention implies its vendor
+    """
+
+    def __init__(self, vendors, extra_vendors=()):
+        self.vendors = {vendor.lower(): [product.lower() for product in (products or [])]
+                        for vendor, products in (vendors or {}).items()}
+        for vendor in extra_vendors:
+            self.vendors.setdefault(vendor.lower(), [])
+        # product name -> vendors listing it
+        self.product_vendors = {}
+        for vendor, products in self.vendors.items():
+            for product in products:
+                self.product_vendors.setdefault(product, set()).add(vendor)
+        self.automaton = AhoCorasick(list(self.vendors) + list(self.product_vendors))
+
+    def find(self, text):
+        """All vendor and product mentions in text, in order of position"""
+        mentions = self.automaton.iter_matches((text or "").lower())
+        return sorted(mentions, key=lambda mention: (mention.start, -mention.end))
+
+    def vendors_in(self, text, implied=True):
+        """Vendors named (or, with implied, implied by a product) in order of first mention"""
+        found = []
+        for mention in self.find(text):
+            named = {mention.term} if mention.term in self.vendors else set()
+            if implied:
+                named |= self.product_vendors.get(mention.term, set())
+            for vendor in sorted(named):
+                if vendor not in found:
+                    found.append(vendor)
+        return found
+
+    def products_in(self, text, vendor=None):
+        """Product names mentioned in text, optionally only those of one vendor"""
+        found = []
+        for mention in self.find(text):
+            vendors = self.product_vendors.get(mention.term)
+            if vendors and (vendor is None or vendor.lower() in vendors) and mention.term not in found:
+                found.append(mention.term)
+        return found
+
+    def vendors_for_product(self, product):
+        """Config vendors that list this product (exact, case-insensitive)"""
+        return self.product_vendors.get((product or "").lower(), set())
+
+
+_matchers = {}
+
+def get_vendor_product_matcher(config=None, extra_vendors=()):
+    """Return the shared matcher for the config's product_classification.vendors"""
+    vendors = (config or {}).get("product_classification", {}).get("vendors", {}) or {}
+    key = (tuple((vendor, tuple(products or ())) for vendor, products in sorted(vendors.items())), tuple(extra_vendors))
+    if key not in _matchers:
+        _matchers[key] = VendorProductMatcher(vendors, extra_vendors)
+    return _matchers[key]
@@ -2,110 +2,80 @@ import os
 import re
 import email
 import logging
-import textract
 from email import policy
+from email.message import EmailMessage
 from email.parser import BytesParser
-from email_reply_parser import EmailReplyParser
-
-# Regex patterns for medium cleanup
-FORWARD_RE = re.compile(r'(^|\n)__+ Forwarded message __+[\s\S]+', re.IGNORECASE)
-CID_RE = re.compile(r'\[cid:[^\]]+\]')
-SIGNATURE_RE = re.compile(
-    r'(^|\n)--+\s*\n'  # signature delimiter
-    r'[\s\S]+$',       # everything after the delimiter
-    re.MULTILINE
-)
-BOILERPLATE_RE = re.compile(
-    r'(©\s*\d{4}|This message was produced and distributed by|CAUTION: This email originated)[\s\S]+$',
-    re.IGNORECASE
-)
-# Strip HTML tags
-HTML_TAG_RE = re.compile(r'<[^>]+>')
-# Strip HTML comments
-HTML_COMMENT_RE = re.compile(r'<!--([\s\S]*?)-->', re.MULTILINE) # Strip <style> blocks
-STYLE_TAG_RE = re.compile(r'<style[\s\S]+?</style>', re.IGNORECASE)
+
+from src.archive import get_archive
+from src.attachments import get_attachment_extractor
+from src.boilerplate import get_boilerplate_index
+from src.html_to_text import html_to_text
+from src.normalize_cache import get_normalize_cache, normalizer_versions
+from src.raw_store import content_hash, raw_bytes, read_raw_email, ARCHIVE_REF_PREFIX
+from src.text_cleanup import clean_body, clean_attachment_text, assemble_document, DEFAULT_MAX_CLEAN_CHARS
+
+# Angle-bracket link targets and addresses in plain-text parts ("Docs <https://...>",
+# "From: Jane <jane@example.com>"); mostly tracking URLs, dropped like the old tag stripping did
+LINK_TARGET_RE = re.compile(r'<(?:[a-zA-Z][a-zA-Z0-9+.-]*:|www\.|[^<>\s@]+@)[^<>\s]*>')
 
 
 def extract_attachment_text(part, config):
     filename = part.get_filename()
     if not filename:
         return None
-
-    attachment_data = part.get_payload(decode=True)
-    temp_path = os.path.join('/tmp', filename)
-
-    with open(temp_path, 'wb') as f:
-        f.write(attachment_data)
-
-    try:
-        tesseract_path = config.get('ocr', {}).get('tesseract_path')
-        if tesseract_path:
-            os.environ['TESSERACT_PATH'] = tesseract_path
-            os.environ['PATH'] = os.pathsep.join([tesseract_path, os.environ.get('PATH', '')])
-
-        text = textract.process(temp_path).decode('utf-8', errors='ignore')
-        return text
-    except Exception as e:
-        logging.warning(f'Failed to extract attachment {filename}: {e}')
-        return None
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    return get_attachment_extractor(config).extract(filename, part.get_payload(decode=True))
 
 
-def medium_clean(text: str) -> str:
+def medium_clean(text: str, strip_html: bool = True, max_chars=DEFAULT_MAX_CLEAN_CHARS) -> str:
     """
     Perform intermediate-level cleanup:
-      1. Remove <style> blocks and HTML comments
-      2. Replace HTML entities like &nbsp; with spaces
-      3. Strip HTML tags
-      4. Strip forwarded blocks
-      5. Keep only topmost reply via EmailReplyParser
-      6. Remove CIDs, signatures, and boilerplate footers
-      7. Collapse runs of two or more blank lines into a single blank line
+      1. Convert HTML to text (style/script blocks, comments and tags removed,
+         entities decoded) unless strip_html is False
+      2. Truncate to max_chars
+      3. Cut forwarded blocks, replies, signatures and boilerplate footers
+      4. Remove quoted lines and CIDs
+      5. Collapse runs of two or more blank lines into a single blank line
+    The whole text is treated as an email body; clean_email keeps attachment
+    text out of reply/signature detection.
     """
-    # 1. Remove <style> blocks and comments
-    text = STYLE_TAG_RE.sub('', text)
-    text = HTML_COMMENT_RE.sub('', text)
+    if strip_html:
+        text = html_to_text(text)
+    return clean_body(text, max_chars)
 
-    # 2. Replace non-breaking space entities
-    text = text.replace('&nbsp;', ' ')
 
-    # 3. Strip any remaining HTML tags
-    text = HTML_TAG_RE.sub('', text)
-
-    # 4. Strip forwarded blocks
-    text = FORWARD_RE.sub('', text)
-
-    # 5. Keep only the topmost reply
-    text = EmailReplyParser.parse_reply(text) or ''
-
-    # 6. Remove CIDs
-    text = CID_RE.sub('', text)
-
-    # 7. Remove signature blocks
-    text = SIGNATURE_RE.sub('', text)
+def clean_email(raw_path, config, do_medium_clean=True):
+    """
+    Read and clean an email from .eml to plain text, with optional medium cleanup.
 
-    # 8. Remove boilerplate footers/disclaimers
-    text = BOILERPLATE_RE.sub('', text)
+    raw_path may be a file path or an "archive:<id>" reference from the raw
+    email store.
+    """
+    email_id = os.path.basename(raw_path[len(ARCHIVE_REF_PREFIX):] if raw_path.startswith(ARCHIVE_REF_PREFIX) else raw_path)
+    email_id = email_id[:-len('.eml')] if email_id.endswith('.eml') else email_id
+    return clean_message(read_raw_email(raw_path, config), config, do_medium_clean, email_id=email_id)
 
-    # 9. Collapse runs of two or more blank lines into a single blank line
-    text = re.sub(r'\n{2,}', '\n\n', text).strip()
 
-    return text
+def _as_email_message(msg):
+    if isinstance(msg, (bytes, bytearray)):
+        return BytesParser(policy=policy.default).parsebytes(msg)
+    if not isinstance(msg, EmailMessage):
+        # compat32 Message objects lack get_content(); reparse with the modern policy
+        return BytesParser(policy=policy.default).parsebytes(msg.as_bytes())
+    return msg
 
 
-def clean_email(raw_path, config, do_medium_clean=True):
+def extract_parts(msg, config):
     """
-    Read and clean an email from .eml to plain text, with optional medium cleanup.
+    Split an email into (subject, body_text, attachments_text, components):
+    plain-text and HTML parts make up the body, attachments are extracted in
+    the worker pool. components names the normalizer stages whose output the
+    parts depend on ("parser", "html", "attachments"), or is None when an
+    attachment failed or timed out, so the incomplete result is not cached.
     """
-    # Parse raw .eml
-    with open(raw_path, 'rb') as f:
-        msg = BytesParser(policy=policy.default).parse(f)
-
     subject = msg['subject'] or ''
     body_text = ''
-    attachments_text = []
+    attachments = []
+    components = {'parser'}
 
     # Extract text and html parts
     if msg.is_multipart():
@@ -124,40 +94,101 @@ def clean_email(raw_path, config, do_medium_clean=True):
                 except Exception:
                     payload = part.get_payload(decode=True)
                     text = payload.decode(charset or 'utf-8', errors='ignore') if payload else ''
-                body_text += text.strip() + '\n'
+                body_text += LINK_TARGET_RE.sub('', text).strip() + '\n'
             # HTML fallback
             elif content_type == 'text/html' and disposition != 'attachment':
-                html = part.get_content()
-                html = STYLE_TAG_RE.sub('', html)
-                html = HTML_COMMENT_RE.sub('', html)
-                body_text += HTML_TAG_RE.sub('', html).strip() + '\n'
-            # Attachments
+                body_text += html_to_text(part.get_content()) + '\n'
+                components.add('html')
+            # Attachments (extracted together below)
             elif part.get_filename():
-                text = extract_attachment_text(part, config)
-                if text:
-                    attachments_text.append(text)
+                attachments.append((part.get_filename(), part.get_payload(decode=True)))
     else:
         try:
             content = msg.get_content()
             if msg.get_content_type() == 'text/html':
-                content = STYLE_TAG_RE.sub('', content)
-                content = HTML_COMMENT_RE.sub('', content)
-                body_text = HTML_TAG_RE.sub('', content).strip()
+                body_text = html_to_text(content)
+                components.add('html')
             else:
-                body_text = content.strip()
+                body_text = LINK_TARGET_RE.sub('', content).strip()
         except Exception:
             payload = msg.get_payload(decode=True)
-            body_text = payload.decode('utf-8', errors='ignore') if payload else ''
+            body_text = LINK_TARGET_RE.sub('', payload.decode('utf-8', errors='ignore')) if payload else ''
+
+    # Extract all attachments of the email concurrently in the worker pool
+    attachments_text = []
+    complete = True
+    if attachments:
+        components.add('attachments')
+        extracted = get_attachment_extractor(config).extract_many(attachments)
+        attachments_text = [text for text in extracted if text]
+        complete = all(text is not None or not data for (_, data), text in zip(attachments, extracted))
 
-    full_text = subject + '\n' + body_text + '\n' + '\n'.join(attachments_text)
-    cleaned = medium_clean(full_text) if do_medium_clean else full_text
+    return subject, body_text, attachments_text, components if complete else None
 
-    # Save cleaned text
-    output_dir = os.path.join('data', 'clean_text')
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, os.path.basename(raw_path).replace('.eml', '.txt'))
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(cleaned)
+
+def clean_message(msg, config, do_medium_clean=True, email_id=None, vendor=None):
+    """
+    Clean an in-memory email (EmailMessage or raw bytes) to plain text without
+    touching the raw email store. The cleaned text is saved when email_id is given.
+
+    With the normalization cache enabled, the cleaned parts are reused from
+    earlier runs while the normalizer components they came from are unchanged;
+    the message is then not even parsed. Entries are keyed by the content hash
+    of the raw bytes, not email_id, which older raw files stored under uuids.
+
+    With a vendor and boilerplate learning enabled, the body's lines feed the
+    vendor's boilerplate index and lines common to most of its emails are dropped.
+    """
+    if not do_medium_clean:
+        subject, body_text, attachments_text, _ = extract_parts(_as_email_message(msg), config)
+        cleaned = subject + '\n' + body_text + '\n' + '\n'.join(attachments_text)
+        if email_id:
+            save_clean_text(email_id, cleaned, config)
+        return cleaned
+
+    cache = get_normalize_cache(config)
+    versions = normalizer_versions(config)
+    cache_key = cached = None
+    if cache is not None:
+        cache_key = content_hash(bytes(msg) if isinstance(msg, (bytes, bytearray)) else raw_bytes(msg))
+        cached = cache.get(cache_key, versions)
+    if cached is not None:
+        subject, body, attachments_text = cached
+    else:
+        # HTML parts are converted while walking; reply/signature detection only runs on the body
+        max_chars = config.get('data_processing', {}).get('max_clean_chars', DEFAULT_MAX_CLEAN_CHARS)
+        subject, body_text, attachments_text, components = extract_parts(_as_email_message(msg), config)
+        subject = subject.strip()
+        body = clean_body(body_text, max_chars)
+        attachments_text = [clean_attachment_text(text, max_chars) for text in attachments_text]
+        if cache is not None and components is not None:
+            cache.put(cache_key, versions, components | {'cleanup'}, subject, body, attachments_text)
+
+    boilerplate = get_boilerplate_index(config)
+    if boilerplate is not None and vendor and vendor != 'unknown':
+        # Cached emails were already counted when they were first cleaned
+        if cached is None:
+            boilerplate.observe(vendor, body)
+        body = boilerplate.strip(vendor, body)
+    cleaned = assemble_document(subject, body, attachments_text)
+
+    if email_id:
+        save_clean_text(email_id, cleaned, config)
+    return cleaned
+
+
+def save_clean_text(email_id, cleaned, config):
+    """Write cleaned text to the clean_text archive, or data/clean_text/<id>.txt"""
+    clean_archive = get_archive(config, 'clean_text')
+    if clean_archive is not None:
+        clean_archive.put(email_id, cleaned.encode('utf-8'), replace=True)
+        output_path = f'{clean_archive.root}#{email_id}'
+    else:
+        output_dir = os.path.join('data', 'clean_text')
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f'{email_id}.txt')
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(cleaned)
 
     logging.info(f'Cleaned email and saved text to {output_path}')
-    return cleaned
\ No newline at end of file
+    return output_path
\ No newline at end of file
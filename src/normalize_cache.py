@@ -0,0 +1,92 @@
+"""
+Cache of normalization output keyed by the raw email's content hash.
+
+Each entry stores the cleaned subject, body and attachment texts (before
+boilerplate stripping, which depends on the vendor index and is reapplied
+every time) together with the versions of the normalizer components that
+produced it. An entry is reused only while every component it used still
+has the same version, so bumping the HTML converter's version only
+invalidates emails that had HTML parts, and bumping the attachment
+extractor's version only emails with attachments.
+"""
+
+import os
+import json
+import hashlib
+
+from src.archive import SegmentArchive
+from src.attachments import EXTRACTOR_VERSION, DEFAULT_MAX_BYTES, DEFAULT_MAX_TEXT_CHARS
+from src.html_to_text import HTML_TO_TEXT_VERSION
+from src.text_cleanup import CLEANUP_VERSION, DEFAULT_MAX_CLEAN_CHARS
+
+DEFAULT_CACHE_DIR = os.path.join("data", "normalize_cache")
+# Bump when clean_message's MIME walk changes (which parts count as body, how they are decoded)
+PARSER_VERSION = "2"
+
+
+def _version_hash(*parts):
+    return hashlib.sha256(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def normalizer_versions(config):
+    """
+    Version hash of each normalizer component for this config; settings that
+    change a component's output are folded into its hash
+    """
+    config = config or {}
+    attachments = config.get("attachments", {})
+    max_clean_chars = config.get("data_processing", {}).get("max_clean_chars", DEFAULT_MAX_CLEAN_CHARS)
+    return {
+        "parser": _version_hash(PARSER_VERSION),
+        "cleanup": _version_hash(CLEANUP_VERSION, max_clean_chars),
+        "html": _version_hash(HTML_TO_TEXT_VERSION),
+        "attachments": _version_hash(EXTRACTOR_VERSION,
+                                     attachments.get("max_bytes", DEFAULT_MAX_BYTES),
+                                     attachments.get("max_text_chars", DEFAULT_MAX_TEXT_CHARS)),
+    }
+
+
+class NormalizeCache:
+    """Persistent content hash -> normalized parts, kept in a compressed segment archive"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.archive = SegmentArchive(root)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email_id, versions):
+        """
+        (subject, body, attachments_text) for an email, or None if missing or
+        if any component it used has a different version now
+        """
+        record = self.archive.get(email_id)
+        if record is not None:
+            entry = json.loads(record)
+            if all(versions.get(name) == version for name, version in entry["versions"].items()):
+                self.hits += 1
+                return entry["subject"], entry["body"], entry["attachments"]
+        self.misses += 1
+        return None
+
+    def put(self, email_id, versions, components, subject, body, attachments_text):
+        """Store the normalized parts with the versions of the components that produced them"""
+        entry = {
+            "versions": {name: versions[name] for name in components},
+            "subject": subject,
+            "body": body,
+            "attachments": list(attachments_text),
+        }
+        self.archive.put(email_id, json.dumps(entry).encode("utf-8"), replace=True)
+
+
+_caches = {}
+
+def get_normalize_cache(config):
+    """Return the shared normalization cache, or None when disabled in config"""
+    settings = (config or {}).get("data_processing", {})
+    if not settings.get("normalize_cache", False):
+        return None
+    root = settings.get("normalize_cache_dir", DEFAULT_CACHE_DIR)
+    if root not in _caches:
+        _caches[root] = NormalizeCache(root)
+    return _caches[root]
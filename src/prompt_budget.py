@@ -0,0 +1,178 @@
+"""
+Token-budgeted email text for classification prompts.
+
+Long newsletters would otherwise be sent whole with every classification
+call. Each task (type, product, dates, combined) gets a token budget from
+classification.prompt_budget.tokens; an email that fits is sent unchanged,
+a longer one is cut down to, in order of priority:
+
+  - the subject
+  - the first lead_paragraphs paragraphs
+  - later sentences with high signal: mentions of known vendors/products
+    (the shared mention matcher) or dates
+
+Kept parts stay in document order, with "[...]" where text was left out.
+Tokens are estimated at ~4 characters per token, like the request gate,
+and the original and sent counts are logged so savings can be measured.
+"""
+
+import re
+import json
+import logging
+import threading
+from bisect import bisect_left
+
+from src.classify_executor import CHARS_PER_TOKEN
+from src.fast_classifier import FULL_DATE_RES, PARTIAL_DATE_RE
+from src.mentions import get_vendor_product_matcher
+
+DEFAULT_LEAD_PARAGRAPHS = 3
+# Budgets per task in estimated tokens; dates used to get the first 2000 characters
+DEFAULT_BUDGETS = {"type": 1500, "product": 2000, "dates": 600, "combined": 2500}
+OMITTED = "[...]"
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+# Sentences end at ./!/? followed by whitespace, so "1.9" or "e.g." stay inside one
+SENTENCE_RE = re.compile(r"(?:[^.!?\n]|[.!?](?=\S))+[.!?]*")
+
+
+def estimate_tokens(text):
+    return len(text or "") // CHARS_PER_TOKEN
+
+
+class PromptBudgetStats:
+    """Estimated tokens of the email texts before and after budgeting, per task"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tasks = {}  # task -> [prompts, trimmed, original tokens, sent tokens]
+
+    def record(self, task, original_tokens, sent_tokens):
+        with self._lock:
+            entry = self.tasks.setdefault(task, [0, 0, 0, 0])
+            entry[0] += 1
+            entry[1] += sent_tokens < original_tokens
+            entry[2] += original_tokens
+            entry[3] += sent_tokens
+
+    def log_summary(self):
+        with self._lock:
+            tasks = dict(self.tasks)
+        for task, (prompts, trimmed, original_tokens, sent_tokens) in sorted(tasks.items()):
+            logging.info(f"Prompt budget {task}: {trimmed} of {prompts} emails trimmed, "
+                         f"~{sent_tokens} of ~{original_tokens} email tokens sent")
+
+
+class PromptBudget:
+    """Cuts email text down to the token budget of a classification task"""
+
+    def __init__(self, config, budgets=None, lead_paragraphs=DEFAULT_LEAD_PARAGRAPHS):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.lead_paragraphs = lead_paragraphs
+        self.matcher = get_vendor_product_matcher(config)
+        self.stats = PromptBudgetStats()
+
+    def signal_positions(self, text):
+        """Sorted start positions of known vendor/product mentions and dates in text"""
+        positions = [mention.start for mention in self.matcher.find(text)]
+        for date_re in FULL_DATE_RES + [PARTIAL_DATE_RE]:
+            positions.extend(match.start() for match in date_re.finditer(text))
+        return sorted(positions)
+
+    def select(self, subject, text, budget):
+        """Subject, lead paragraphs and high-signal sentences of text within budget tokens"""
+        max_chars = budget * CHARS_PER_TOKEN
+        parts = []  # (position in text, part); the subject sorts first
+        used = 0
+
+        def add(position, part):
+            nonlocal used
+            part = part.strip()
+            room = max_chars - used
+            if not part or room <= 0:
+                return False
+            if len(part) > room:
+                part = part[:room].rstrip()
+            parts.append((position, part))
+            used += len(part) + 1
+            return True
+
+        subject = (subject or "").strip()
+        if subject and not text.startswith(subject):
+            add(-1, subject)
+
+        paragraphs = []
+        start = 0
+        for separator in PARAGRAPH_RE.finditer(text):
+            paragraphs.append((start, text[start:separator.start()]))
+            start = separator.end()
+        paragraphs.append((start, text[start:]))
+        # Cleaned bodies often have no blank lines; then lines count as paragraphs
+        if len(paragraphs) == 1:
+            paragraphs = []
+            start = 0
+            for line in text.split("\n"):
+                paragraphs.append((start, line))
+                start += len(line) + 1
+        paragraphs = [(position, paragraph) for position, paragraph in paragraphs if paragraph.strip()]
+
+        for position, paragraph in paragraphs[:self.lead_paragraphs]:
+            add(position, paragraph)
+
+        if len(paragraphs) > self.lead_paragraphs:
+            rest_start = paragraphs[self.lead_paragraphs][0]
+            signals = self.signal_positions(text)
+            for sentence in SENTENCE_RE.finditer(text, rest_start):
+                index = bisect_left(signals, sentence.start())
+                if index < len(signals) and signals[index] < sentence.end():
+                    if not add(sentence.start(), sentence.group(0)):
+                        break
+
+        parts.sort(key=lambda part: part[0])
+        kept = []
+        end = 0
+        for position, part in parts:
+            if position >= 0:
+                # Kept parts are stripped, so only non-whitespace text between them was left out
+                if text[end:position].strip():
+                    kept.append(OMITTED)
+                end = text.index(part, position) + len(part)
+            kept.append(part)
+        if text[end:].strip():
+            kept.append(OMITTED)
+        return "\n".join(kept)
+
+    def email_text(self, data, task):
+        """data['text'] for the prompt of a task, cut to the task's token budget"""
+        text = data.get("text") or ""
+        budget = self.budgets.get(task)
+        original_tokens = estimate_tokens(text)
+        if budget and original_tokens > budget:
+            text = self.select(str(data.get("subject") or ""), text, budget)
+        sent_tokens = estimate_tokens(text)
+        self.stats.record(task, original_tokens, sent_tokens)
+        if sent_tokens < original_tokens:
+            logging.info(f"Prompt for {task}: ~{sent_tokens} of ~{original_tokens} email tokens kept")
+        return text
+
+
+_budgets = {}
+
+def get_prompt_budget(config):
+    """Return the shared prompt budget, or None when disabled in config"""
+    settings = (config or {}).get("classification", {}).get("prompt_budget", {})
+    if not settings.get("enabled", False):
+        return None
+    key = json.dumps([settings, config.get("product_classification")], sort_keys=True)
+    if key not in _budgets:
+        _budgets[key] = PromptBudget(config, settings.get("tokens"),
+                                     settings.get("lead_paragraphs", DEFAULT_LEAD_PARAGRAPHS))
+    return _budgets[key]
+
+
+def prompt_text(data, config, task, max_chars=None):
+    """The email text to embed in the prompt of a classification task (cut to max_chars when budgeting is off)"""
+    budget = get_prompt_budget(config)
+    if budget is not None:
+        return budget.email_text(data, task)
+    return data["text"][:max_chars] if max_chars else data["text"]
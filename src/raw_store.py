@@ -0,0 +1,207 @@
+"""
+Content-addressed store for raw emails.
+
+Messages are stored under the SHA-256 of their bytes in a sharded layout
+(data/raw_emails/ab/cd/<sha256>.eml) with an append-only JSONL index, so
+identical emails are stored once and can be recognized as already processed.
+When storage.archive is enabled the bytes go into a compressed segment
+archive instead of loose files.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from email import policy
+from email.parser import BytesParser
+from concurrent.futures import ThreadPoolExecutor
+
+from src.archive import get_archive
+
+DEFAULT_RAW_EMAIL_DIR = os.path.join("data", "raw_emails")
+INDEX_FILENAME = "index.jsonl"
+ARCHIVE_REF_PREFIX = "archive:"
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest used as the email id across the pipeline"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def parse_raw_message(data: bytes):
+    """
+    Parse raw message bytes, keeping them on the message: policy.default
+    refolds long headers, so as_bytes() is not the bytes that were fetched
+    """
+    msg = BytesParser(policy=policy.default).parsebytes(data)
+    msg.raw_bytes = data
+    return msg
+
+
+def raw_bytes(msg) -> bytes:
+    """The bytes a message was parsed from (see parse_raw_message), else its serialization"""
+    data = getattr(msg, "raw_bytes", None)
+    return data if data is not None else msg.as_bytes()
+
+
+class RawEmailStore:
+    """Sharded, content-addressed raw email store with a JSONL index"""
+
+    def __init__(self, root=DEFAULT_RAW_EMAIL_DIR, archive=None):
+        self.root = root
+        self.archive = archive
+        self.index_path = os.path.join(root, INDEX_FILENAME)
+        self.entries = {}
+        self._index_lock = threading.Lock()
+        # Background writer for put_async; one thread keeps writes ordered
+        self._writer = None
+        self._pending = {}
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                entry = self.entries.setdefault(record["email_id"], {})
+                entry.update(record)
+
+    def _append_index(self, record):
+        with self._index_lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            entry = self.entries.setdefault(record["email_id"], {})
+            entry.update(record)
+
+    def path_for(self, email_id):
+        """Sharded path for a content hash"""
+        return os.path.join(self.root, email_id[:2], email_id[2:4], f"{email_id}.eml")
+
+    def __contains__(self, email_id):
+        return email_id in self.entries
+
+    def ref_for(self, email_id):
+        """Where an email is (or will be) stored: an archive reference or a sharded path"""
+        return ARCHIVE_REF_PREFIX + email_id if self.archive is not None else self.path_for(email_id)
+
+    def put(self, data: bytes, email_id=None):
+        """
+        Store raw message bytes. Returns (email_id, path, created); storing
+        content that is already present is a no-op.
+        """
+        email_id = email_id or content_hash(data)
+        if self.archive is not None:
+            path = ARCHIVE_REF_PREFIX + email_id
+            if email_id in self.entries and email_id in self.archive:
+                return email_id, path, False
+            self.archive.put(email_id, data)
+        else:
+            path = self.path_for(email_id)
+            if email_id in self.entries and os.path.exists(path):
+                return email_id, path, False
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        self._append_index({
+            "email_id": email_id,
+            "path": path,
+            "size": len(data),
+            "stored_at": datetime.now().isoformat(),
+        })
+        return email_id, path, True
+
+    def put_async(self, data: bytes):
+        """
+        Hash the bytes now and write them in the background, so callers can
+        keep processing the in-memory message. Returns (email_id, path).
+        """
+        email_id = content_hash(data)
+        if email_id not in self._pending:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="raw-store")
+            self._pending[email_id] = self._writer.submit(self._write, data, email_id)
+        return email_id, self.ref_for(email_id)
+
+    def _write(self, data, email_id):
+        _, path, created = self.put(data, email_id)
+        if created:
+            logging.info(f"Saved raw email to {path}")
+
+    def wait_for(self, email_id):
+        """Block until a pending background write of this email has finished"""
+        future = self._pending.pop(email_id, None)
+        if future is not None:
+            future.result()
+
+    def flush(self):
+        """Wait for all pending background writes"""
+        for email_id in list(self._pending):
+            self.wait_for(email_id)
+
+    def get(self, email_id) -> bytes:
+        self.wait_for(email_id)
+        if self.archive is not None and email_id in self.archive:
+            return self.archive.get(email_id)
+        with open(self.path_for(email_id), "rb") as f:
+            return f.read()
+
+    def is_processed(self, email_id):
+        return bool(self.entries.get(email_id, {}).get("processed_at"))
+
+    def mark_processed(self, email_id):
+        """Record that an email made it through the whole pipeline"""
+        # Never mark an email processed before its raw bytes are on disk
+        self.wait_for(email_id)
+        self._append_index({"email_id": email_id, "processed_at": datetime.now().isoformat()})
+
+    def clear_processed(self):
+        """Forget processed marks (e.g. after the vector/graph stores were reset)"""
+        for entry in self.entries.values():
+            entry.pop("processed_at", None)
+        if not self.entries:
+            return
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.index_path)
+        logging.info(f"Cleared processed marks for {len(self.entries)} raw emails")
+
+
+_raw_stores = {}
+
+def get_raw_store(config):
+    """Return the shared raw email store for this config"""
+    root = (config or {}).get("storage", {}).get("raw_email_dir", DEFAULT_RAW_EMAIL_DIR)
+    if root not in _raw_stores:
+        _raw_stores[root] = RawEmailStore(root, archive=get_archive(config, "raw"))
+    return _raw_stores[root]
+
+
+def read_raw_email(ref, config=None) -> bytes:
+    """
+    Read raw email bytes from a file path, an "archive:<id>" reference or a
+    bare email id, wherever the store keeps it
+    """
+    if os.path.exists(ref):
+        with open(ref, "rb") as f:
+            return f.read()
+    email_id = ref[len(ARCHIVE_REF_PREFIX):] if ref.startswith(ARCHIVE_REF_PREFIX) else os.path.basename(ref)
+    if email_id.endswith(".eml"):
+        email_id = email_id[:-len(".eml")]
+    archive = get_archive(config, "raw")
+    if archive is not None and email_id in archive:
+        return archive.get(email_id)
+    store = get_raw_store(config)
+    return store.get(email_id)
@@ -0,0 +1,91 @@
+"""
+Linear-time cleanup of email text.
+
+The body is cut at the first forwarded block, quoted reply header,
+signature delimiter or boilerplate footer found by a single line-anchored
+scan, quoted '>' lines are dropped, and CIDs and blank-line runs are
+tidied up. Reply and signature detection only looks at the body;
+attachment text just gets the CID/blank-line tidy-up. Every pattern has
+bounded backtracking, and inputs above max_chars are truncated before
+scanning, so multi-megabyte emails cost time proportional to their size.
+"""
+
+import re
+import logging
+
+DEFAULT_MAX_CLEAN_CHARS = 1000000
+# Bump when the cleanup rules change; invalidates cached normalization output
+CLEANUP_VERSION = "1"
+
+# Line starts at which the rest of the body is dropped
+BODY_CUT_RE = re.compile(
+    r'^(?:'
+    r'[ \t]*(?:-{2,}|_{2,})[ \t]*Forwarded message[ \t]*(?:-{2,}|_{2,})'  # forwarded block
+    r'|[ \t]*-{2,}[ \t]*Original Message[ \t]*-{2,}'                      # Outlook reply
+    r'|From:[^\n]*\n(?:Sent|Date):'                                          # Outlook reply headers
+    r'|On [^\n]{0,300}(?:\n[^\n]{0,300})?wrote:[ \t]*$'                      # "On <date>, <name> wrote:"
+    r'|-{2,}[ \t]*$'                                                         # signature delimiter
+    r'|Sent from my '                                                        # mobile signature
+    r')',
+    re.MULTILINE | re.IGNORECASE
+)
+# Footers/disclaimers that end the useful text, wherever they start
+BOILERPLATE_RE = re.compile(
+    r'©[ \t]*\d{4}|This message was produced and distributed by|CAUTION: This email originated',
+    re.IGNORECASE
+)
+QUOTED_LINE_RE = re.compile(r'^>[^\n]*\n?', re.MULTILINE)
+CID_RE = re.compile(r'\[cid:[^\]]+\]')
+BLANK_LINES_RE = re.compile(r'\n{2,}')
+
+
+def _guard(text, max_chars, what):
+    if max_chars and len(text) > max_chars:
+        logging.warning(f'Truncating {what} from {len(text)} to {max_chars} characters before cleaning')
+        return text[:max_chars]
+    return text
+
+
+def clean_body(text: str, max_chars=DEFAULT_MAX_CLEAN_CHARS) -> str:
+    """
+    Clean an email body in linear time:
+      1. Truncate to max_chars
+      2. Cut at the first forwarded block, reply header, signature or boilerplate footer
+      3. Drop quoted '>' lines
+      4. Remove CIDs
+      5. Collapse runs of two or more blank lines into a single blank line
+    """
+    text = _guard(text, max_chars, 'email body')
+
+    cut = len(text)
+    match = BODY_CUT_RE.search(text)
+    if match:
+        cut = match.start()
+    match = BOILERPLATE_RE.search(text, 0, cut)
+    if match:
+        cut = match.start()
+    text = text[:cut]
+
+    text = QUOTED_LINE_RE.sub('', text)
+    text = CID_RE.sub('', text)
+    return BLANK_LINES_RE.sub('\n\n', text).strip()
+
+
+def clean_attachment_text(text: str, max_chars=DEFAULT_MAX_CLEAN_CHARS) -> str:
+    """Attachment text only gets CIDs removed and blank lines collapsed"""
+    text = _guard(text, max_chars, 'attachment text')
+    text = CID_RE.sub('', text)
+    return BLANK_LINES_RE.sub('\n\n', text).strip()
+
+
+def assemble_document(subject, body, attachments_text=()) -> str:
+    """Join subject, cleaned body and cleaned attachment texts, skipping empty parts"""
+    parts = [(subject or '').strip(), body]
+    parts.extend(attachments_text)
+    return '\n'.join(part for part in parts if part)
+
+
+def clean_document(subject, body, attachments_text=(), max_chars=DEFAULT_MAX_CLEAN_CHARS) -> str:
+    """Subject, cleaned body and cleaned attachment texts as one document"""
+    return assemble_document(subject, clean_body(body, max_chars),
+                             [clean_attachment_text(text, max_chars) for text in attachments_text])
@@ -0,0 +1,100 @@
+"""
+Offline sender-domain -> vendor resolution.
+
+The registered domain of a sender (e.g. "hashicorp" for
+reply.hashicorp.com, "google" for mail.google.co.uk) is found with a
+bundled, versioned Public Suffix List snapshot in
+config/public_suffix_list.dat, so no download is ever attempted. A
+configurable alias table maps hosts or registered domains straight to a
+vendor, and resolved hosts are memoized in an LRU cache since the same
+senders come back in every batch.
+"""
+
+import os
+import logging
+from functools import lru_cache
+
+SUFFIX_LIST_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "config", "public_suffix_list.dat")
+DEFAULT_MEMO_SIZE = 4096
+
+
+class PublicSuffixList:
+    """Public Suffix List rules (plain, wildcard "*." and exception "!") loaded from a .dat file"""
+
+    def __init__(self, path=SUFFIX_LIST_FILE):
+        self.path = path
+        self.version = "unknown"
+        self.rules = set()
+        self.exceptions = set()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("// VERSION:"):
+                    self.version = line.split(":", 1)[1].strip()
+                elif not line or line.startswith("//"):
+                    continue
+                elif line.startswith("!"):
+                    self.exceptions.add(line[1:])
+                else:
+                    self.rules.add(line)
+
+    def split(self, host):
+        """
+        Split a host into (subdomain, domain, suffix) using the longest
+        matching rule; hosts whose TLD is not listed get an empty suffix
+        """
+        labels = host.lower().strip(".").split(".")
+        start = len(labels)
+        for i in range(len(labels)):
+            candidate = ".".join(labels[i:])
+            if candidate in self.exceptions:
+                start = i + 1
+                break
+            if candidate in self.rules or (i + 1 < len(labels) and "*." + ".".join(labels[i + 1:]) in self.rules):
+                start = i
+                break
+        if start == 0:
+            return "", "", ".".join(labels)
+        return ".".join(labels[:start - 1]), labels[start - 1], ".".join(labels[start:])
+
+
+def sender_host(sender_email):
+    """Host part of an address or "Name <address>" string, or None"""
+    if not isinstance(sender_email, str) or "@" not in sender_email:
+        return None
+    if "<" in sender_email and ">" in sender_email:
+        sender_email = sender_email[sender_email.rfind("<") + 1:sender_email.rfind(">")]
+    host = sender_email.rsplit("@", 1)[1].strip().strip(">").lower()
+    return host.split()[0] if host else None
+
+
+class VendorResolver:
+    """Maps sender hosts to vendor names: alias table first, then the registered domain"""
+
+    def __init__(self, aliases=None, suffix_list=None, memo_size=DEFAULT_MEMO_SIZE):
+        self.aliases = {domain.lower(): vendor.lower() for domain, vendor in (aliases or {}).items()}
+        self.suffix_list = suffix_list or PublicSuffixList()
+        self.vendor_for_host = lru_cache(maxsize=memo_size)(self._resolve)
+
+    def _resolve(self, host):
+        if host in self.aliases:
+            return self.aliases[host]
+        _, domain, suffix = self.suffix_list.split(host)
+        registered = f"{domain}.{suffix}" if suffix else domain
+        if registered in self.aliases:
+            return self.aliases[registered]
+        return domain or "unknown"
+
+
+_resolvers = {}
+
+def get_vendor_resolver(config=None):
+    """Return the shared vendor resolver for this config's alias table"""
+    settings = (config or {}).get("vendor_inference", {})
+    aliases = settings.get("aliases") or {}
+    key = (tuple(sorted(aliases.items())), settings.get("memo_size", DEFAULT_MEMO_SIZE))
+    if key not in _resolvers:
+        _resolvers[key] = VendorResolver(aliases, memo_size=key[1])
+        logging.info(f"Vendor inference using bundled public suffix list version {_resolvers[key].suffix_list.version}")
+    return _resolvers[key]